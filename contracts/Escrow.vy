@@ -75,7 +75,20 @@ interface IConditionVerifier:
 # What happens when the contract is created 
 @deploy
 def __init__(_seller: address, _timeout: uint256, _condition_verifier: address, _external_condition_id: uint256, _beneficiary: address):
-    self.buyer = msg.sender # The person starting/deploying the contract is the buyer
+    self._setup(msg.sender, _seller, _timeout, _condition_verifier, _external_condition_id, _beneficiary) # The person starting/deploying the contract is the buyer
+
+# Same setup for a minimal proxy created by EscrowFactory: the proxy has no constructor,
+# so the factory calls this in the transaction that creates it, passing on its caller as buyer.
+# Only works once, and never on a contract set up by __init__ (the buyer is already set).
+@external
+def initialize(_buyer: address, _seller: address, _timeout: uint256, _condition_verifier: address, _external_condition_id: uint256, _beneficiary: address):
+    assert self.buyer == empty(address), "already initialized"
+    assert _buyer != empty(address), "Invalid buyer address"
+    self._setup(_buyer, _seller, _timeout, _condition_verifier, _external_condition_id, _beneficiary)
+
+@internal
+def _setup(_buyer: address, _seller: address, _timeout: uint256, _condition_verifier: address, _external_condition_id: uint256, _beneficiary: address):
+    self.buyer = _buyer # The person paying into the escrow
     self.seller = _seller # The seller's address
     self.timeout = _timeout # How long before refund is possible
     self.start = block.timestamp # Remember when we started
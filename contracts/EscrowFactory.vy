@@ -0,0 +1,64 @@
+# pragma version 0.4.3
+'''
+@license MIT
+@title Escrow Factory
+@notice Deploys Escrow instances as EIP-1167 minimal proxies of one deployed Escrow
+@dev Each proxy is ~45 bytes of code that delegates every call to the
+     implementation, so creating an escrow costs the proxy plus the storage
+     written by Escrow.initialize() instead of the full Escrow bytecode.
+     The proxy is created and initialized in the same transaction; its
+     caller becomes the escrow's buyer, as with a direct deployment.
+'''
+
+interface IEscrow:
+    def initialize(
+        _buyer: address,
+        _seller: address,
+        _timeout: uint256,
+        _condition_verifier: address,
+        _external_condition_id: uint256,
+        _beneficiary: address
+    ): nonpayable
+
+event EscrowCreated:
+    escrow: indexed(address)
+    buyer: indexed(address)
+    seller: indexed(address)
+    condition_verifier: address
+    external_condition_id: uint256
+
+implementation: public(immutable(address))   # Escrow every proxy delegates to
+escrow_count: public(uint256)                # Escrows created so far
+
+
+@deploy
+def __init__(_implementation: address):
+    assert _implementation.is_contract, "Implementation is not a contract"
+    implementation = _implementation
+
+
+@external
+def create_escrow(
+    _seller: address,
+    _timeout: uint256,
+    _condition_verifier: address,
+    _external_condition_id: uint256,
+    _beneficiary: address
+) -> address:
+    """
+    @notice Create and initialize an Escrow proxy with msg.sender as buyer
+    @return Address of the new escrow
+    """
+    escrow: address = create_minimal_proxy_to(implementation)
+    extcall IEscrow(escrow).initialize(
+        msg.sender, _seller, _timeout, _condition_verifier, _external_condition_id, _beneficiary
+    )
+    self.escrow_count += 1
+    log EscrowCreated(
+        escrow=escrow,
+        buyer=msg.sender,
+        seller=_seller,
+        condition_verifier=_condition_verifier,
+        external_condition_id=_external_condition_id
+    )
+    return escrow
@@ -0,0 +1,129 @@
+# pragma version 0.4.3
+'''
+@license MIT
+@title Escrow Multicall
+@notice Batches read-only calls so off-chain tools can inspect many escrows in one eth_call
+@dev Stateless: every function is a view, nothing is ever written
+'''
+
+MAX_CALLS: constant(uint256) = 256
+MAX_ESCROWS: constant(uint256) = 500
+MAX_CALLDATA_SIZE: constant(uint256) = 1024
+MAX_RETURN_SIZE: constant(uint256) = 1024
+
+# Interfaces for the contracts being read
+interface IEscrow:
+    def state() -> uint8: view
+    def buyer() -> address: view
+    def seller() -> address: view
+    def get_num_conditions() -> uint256: view
+    def get_condition(idx: uint256) -> (String[100], bool): view
+    def condition_verifier() -> address: view
+    def external_condition_id() -> uint256: view
+    def beneficiary() -> address: view
+
+interface IConditionVerifier:
+    def verify_condition_for_parties(
+        condition_id: uint256,
+        expected_creator: address,
+        expected_beneficiary: address
+    ) -> bool: view
+
+# Generic call batching
+struct Call:
+    target: address
+    call_data: Bytes[MAX_CALLDATA_SIZE]
+
+struct Result:
+    success: bool
+    return_data: Bytes[MAX_RETURN_SIZE]
+
+# Release readiness of a single escrow
+struct ReleaseStatus:
+    escrow: address
+    seller: address
+    state: uint8                            # 0 = not funded, 1 = funded
+    internal_fulfilled: bool                # every Escrow.conditions[i] fulfilled
+    external_fulfilled: bool                # ConditionVerifier check passes for this escrow's parties
+    ready: bool                             # release() by the seller would succeed
+
+@external
+@view
+def aggregate(calls: DynArray[Call, MAX_CALLS]) -> DynArray[Result, MAX_CALLS]:
+    """
+    Static-call every target in order. A failing call does not revert the
+    batch; its Result has success=False and the revert data.
+    """
+    results: DynArray[Result, MAX_CALLS] = []
+    for c: Call in calls:
+        success: bool = False
+        response: Bytes[MAX_RETURN_SIZE] = b""
+        success, response = raw_call(
+            c.target,
+            c.call_data,
+            max_outsize=MAX_RETURN_SIZE,
+            is_static_call=True,
+            revert_on_failure=False
+        )
+        results.append(Result(success=success, return_data=response))
+    return results
+
+@internal
+@view
+def _internal_conditions_fulfilled(escrow: IEscrow) -> bool:
+    num: uint256 = staticcall escrow.get_num_conditions()
+    for i: uint256 in range(num, bound=10):
+        description: String[100] = ""
+        fulfilled: bool = False
+        description, fulfilled = staticcall escrow.get_condition(i)
+        if not fulfilled:
+            return False
+    return True
+
+@internal
+@view
+def _external_condition_fulfilled(escrow: IEscrow) -> bool:
+    # Mirrors Escrow._check_external_condition()
+    verifier: address = staticcall escrow.condition_verifier()
+    if verifier == empty(address):
+        return True
+    return staticcall IConditionVerifier(verifier).verify_condition_for_parties(
+        staticcall escrow.external_condition_id(),
+        staticcall escrow.buyer(),
+        staticcall escrow.beneficiary()
+    )
+
+@external
+@view
+def check_release_ready(escrows: DynArray[address, MAX_ESCROWS]) -> DynArray[ReleaseStatus, MAX_ESCROWS]:
+    """
+    Release readiness for each escrow: funded, all internal conditions
+    fulfilled and the external condition verified. Addresses without code
+    are reported as not ready instead of reverting the whole batch.
+    """
+    statuses: DynArray[ReleaseStatus, MAX_ESCROWS] = []
+    for addr: address in escrows:
+        if not addr.is_contract:
+            statuses.append(ReleaseStatus(
+                escrow=addr,
+                seller=empty(address),
+                state=0,
+                internal_fulfilled=False,
+                external_fulfilled=False,
+                ready=False
+            ))
+            continue
+
+        escrow: IEscrow = IEscrow(addr)
+        state: uint8 = staticcall escrow.state()
+        internal_ok: bool = self._internal_conditions_fulfilled(escrow)
+        external_ok: bool = self._external_condition_fulfilled(escrow)
+        statuses.append(ReleaseStatus(
+            escrow=addr,
+            seller=staticcall escrow.seller(),
+            state=state,
+            internal_fulfilled=internal_ok,
+            external_fulfilled=external_ok,
+            ready=state == 1 and internal_ok and external_ok
+        ))
+    return statuses
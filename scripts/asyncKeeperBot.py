@@ -0,0 +1,518 @@
+"""
+Asyncio Keeper Bot for Escrow Automation
+Same job as keeperBot.py, built on AsyncWeb3 so that many fulfilled
+conditions are released concurrently instead of one receipt at a time.
+
+It shares the state file and the retry scheduler with keeperBot.py but not
+the rest of its engine: it releases for a single seller, acts on events at
+the unconfirmed head (no --confirmations, no reorg retraction), and keeps
+no readiness records, so every release is pre-checked on chain. It has
+no --refunds either; run keeperBot.py where any of these are needed.
+"""
+
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import getpass
+from web3 import AsyncWeb3, WebSocketProvider
+from web3.exceptions import TransactionNotFound
+
+from keeperBot import (
+    GANACHE_URL,
+    POLL_INTERVAL,
+    STATE_PATH,
+    BACKFILL_INITIAL_RANGE,
+    BACKFILL_MIN_RANGE,
+    CV_ABI_PATH,
+    format_fees,
+    load_deployments,
+    find_escrows,
+    find_escrow,
+    resize_log_range,
+)
+from keeperStore import KeeperCheckpointStore
+from feeStrategy import AsyncFeeStrategy
+from keeperMetrics import KeeperMetrics, METRICS_HOST
+from contractCache import ContractCache, load_abi
+from multicall import MULTICALL_ABI_PATH, check_release_ready_async, not_ready_reason
+from receiptTracker import decode_revert_reason_async
+from retryScheduler import RetryScheduler, revert_reason
+from structuredLogging import setup_logging
+
+log = logging.getLogger("asyncKeeperBot")
+
+# Maximum number of releases in progress at once (pre-check → receipt)
+DEFAULT_CONCURRENCY = 64
+
+# Gas limit of a release: its eth_estimateGas result plus this many percent
+RELEASE_GAS_HEADROOM = 20
+
+# Push mode: newHeads subscription over WebSocket (Ganache serves WS on the HTTP port)
+GANACHE_WS_URL = "ws://127.0.0.1:8545"
+RECONNECT_MIN_DELAY = 1  # seconds, doubled after every failed reconnect
+RECONNECT_MAX_DELAY = 30
+
+class AsyncEscrowKeeperBot:
+    def __init__(self, seller_private_key, concurrency=DEFAULT_CONCURRENCY,
+                 start_block=None, state_path=STATE_PATH, metrics=None):
+        """Initialize the async keeper (call setup() before run())"""
+        self.metrics = metrics or KeeperMetrics()
+        self.w3 = AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(GANACHE_URL))
+        self.w3.middleware_onion.add(self.metrics.middleware(), name='metrics')
+
+        # Set up seller account (who will call release())
+        self.seller_account = self.w3.eth.account.from_key(seller_private_key)
+        self.seller_address = self.seller_account.address
+        log.info("Async keeper bot initialized", extra={'seller': self.seller_address})
+
+        self.deployments = load_deployments()
+
+        # At most `concurrency` releases in flight
+        self.concurrency = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.queued = 0  # releases waiting for the semaphore
+
+        # Local nonce counter so concurrent releases don't collide
+        self.nonce_lock = asyncio.Lock()
+        self.next_nonce = None
+
+        # Durable progress shared with the sync keeper
+        self.store = KeeperCheckpointStore(state_path)
+        self.processed_conditions = self.store.processed_conditions()
+        self.inflight_escrows = {}
+        # (verifier address lowercase, condition_id) -> (block, timestamp) of its ConditionFulfilled event
+        self.fulfilled_at = {}
+        self.metrics.queue_depth.set_function(lambda: self.queued)
+        self.metrics.inflight.set_function(lambda: len(self.inflight_escrows))
+
+        # Failed releases, retried with backoff on a thread of their own that
+        # hands each attempt back to the event loop (see run_retry())
+        self.retries = RetryScheduler(self.store, self.run_retry, self.metrics)
+        self.loop = None
+
+        checkpoint = self.store.last_block()
+        if start_block is None and checkpoint is not None:
+            start_block = checkpoint + 1
+            log.info("Resuming from checkpoint", extra={'block': checkpoint})
+        self.start_block = start_block
+        self.last_block = None if start_block is None else start_block - 1
+        self.backfill_range = BACKFILL_INITIAL_RANGE
+
+    def attach(self):
+        """
+        Bind the contracts and the fee strategy to the current Web3 instance,
+        so after a WebSocket (re)connect releases are priced over the same
+        connection they are sent on
+        """
+        self.contracts = ContractCache(self.w3)
+        self.fees = AsyncFeeStrategy(self.w3)
+        # Decodes the ConditionFulfilled logs of any verifier
+        self.fulfilled_event = self.w3.eth.contract(abi=load_abi(CV_ABI_PATH)).events.ConditionFulfilled()
+
+    async def setup(self):
+        """Check the connection and attach to the ConditionVerifiers"""
+        assert await self.w3.is_connected(), "Failed to connect to Ganache!"
+
+        self.attach()
+
+        if self.last_block is None:
+            self.last_block = await self.w3.eth.block_number
+
+        await self.recover_inflight_releases()
+
+        self.loop = asyncio.get_running_loop()
+        self.retries.start()
+
+        log.info("Monitoring ConditionFulfilled events", extra={
+            'condition_verifiers': list(self.deployments['verifiers'].values()), 'concurrency': self.concurrency
+        })
+
+    async def recover_inflight_releases(self):
+        """Wait out release transactions left unconfirmed by a previous run"""
+        async def settle(tx_hash, escrow_address):
+            try:
+                await self.w3.eth.get_transaction(tx_hash)
+            except TransactionNotFound:
+                log.warning("In-flight release was dropped, will be retried", extra={
+                    'tx_hash': tx_hash, 'escrow': escrow_address
+                })
+            else:
+                receipt = await self.w3.eth.wait_for_transaction_receipt(tx_hash)
+                log.info("In-flight release mined", extra={'tx_hash': tx_hash, 'status': receipt.status})
+            self.store.clear_inflight(tx_hash)
+
+        pending = self.store.inflight()
+        if pending:
+            log.info("Checking in-flight releases from the last run", extra={'releases': len(pending)})
+            await asyncio.gather(*(settle(tx_hash, escrow) for tx_hash, escrow, _ in pending))
+            self.store.flush()
+
+    def run_retry(self, escrow_address, condition_id):
+        """Attempt a failed release again (called by the retry thread)"""
+        escrow = find_escrow(self.deployments, escrow_address)
+        if escrow is None:
+            log.warning("Retry for an escrow not in the deployments", extra={'escrow': escrow_address})
+            self.retries.failed(escrow_address, condition_id, "escrow not in the deployments")
+            return
+        log.info("Retrying release", extra={'escrow': escrow['address']})
+        asyncio.run_coroutine_threadsafe(self.attempt_release(escrow, condition_id), self.loop).result()
+
+    async def reserve_nonce(self):
+        """Hand out the next nonce for the seller account"""
+        async with self.nonce_lock:
+            if self.next_nonce is None:
+                self.next_nonce = await self.w3.eth.get_transaction_count(self.seller_address, 'pending')
+            nonce = self.next_nonce
+            self.next_nonce += 1
+            return nonce
+
+    async def resync_nonce(self):
+        """Drop the local counter; the next reservation re-reads it from the node"""
+        async with self.nonce_lock:
+            self.next_nonce = None
+
+    async def fetch_fulfilled_logs(self, from_block, to_block):
+        """ConditionFulfilled events of every known verifier in [from_block, to_block] over adaptive ranges"""
+        events = []
+        verifiers = self.deployments['verifiers']
+        if not verifiers:
+            return events
+        start = from_block
+        while start <= to_block:
+            end = min(start + self.backfill_range - 1, to_block)
+            began = time.monotonic()
+            try:
+                # Filtered by topic only, as in keeperBot.py: logs of
+                # unknown contracts are dropped below
+                logs = await self.w3.eth.get_logs({
+                    'topics': [self.fulfilled_event.topic],
+                    'fromBlock': start,
+                    'toBlock': end
+                })
+            except Exception as e:
+                if self.backfill_range <= BACKFILL_MIN_RANGE:
+                    raise
+                self.backfill_range = resize_log_range(self.backfill_range)
+                log.warning("eth_getLogs failed, shrinking the block range", extra={
+                    'from_block': start, 'to_block': end, 'error': str(e), 'range': self.backfill_range
+                })
+                continue
+
+            self.backfill_range = resize_log_range(self.backfill_range, time.monotonic() - began)
+            events.extend(self.fulfilled_event.process_log(entry) for entry in logs
+                          if entry['address'].lower() in verifiers)
+            start = end + 1
+        return events
+
+    async def poll_once(self, head=None):
+        """Handle every ConditionFulfilled event up to head (default: the current head)"""
+        began = time.monotonic()
+        try:
+            return await self._poll(head)
+        finally:
+            self.metrics.poll_duration.observe(time.monotonic() - began)
+
+    async def _poll(self, head):
+        if head is None:
+            head = await self.w3.eth.block_number
+        if head <= self.last_block:
+            return 0
+
+        # Pick up escrows deployed since the last cycle
+        self.deployments = load_deployments(self.deployments)
+
+        events = await self.fetch_fulfilled_logs(self.last_block + 1, head)
+        jobs = []
+        # Logs marked processed only once their releases have mined, been
+        # rejected for good or been handed to the retry scheduler
+        handled = []
+        seen = set()
+        for event in events:
+            condition_id = event['args']['condition_id']
+            condition = (event['address'], condition_id)
+            if condition in self.processed_conditions or condition in seen:
+                continue
+            if self.store.is_processed(event['transactionHash'], event['logIndex']):
+                self.processed_conditions.add(*condition)
+                self.store.mark_processed(event['transactionHash'], event['logIndex'], condition)
+                continue
+
+            self.metrics.events.inc()
+            self.fulfilled_at[(event['address'].lower(), condition_id)] = (event['blockNumber'], event['args']['timestamp'])
+            log.info("ConditionFulfilled", extra={
+                'condition_id': condition_id, 'block': event['blockNumber'], 'tx_hash': event['transactionHash']
+            })
+            matching_escrows = find_escrows(self.deployments, event['address'], condition_id)
+            if not matching_escrows:
+                log.warning("No matching escrow", extra={'condition_id': condition_id})
+            jobs.extend((escrow, condition_id) for escrow in matching_escrows)
+
+            seen.add(condition)
+            handled.append((event['transactionHash'], event['logIndex'], condition))
+
+        # Screen the whole range in one eth_call, then run every release
+        # concurrently, bounded by the semaphore
+        statuses = await self.prescreen([escrow['address'] for escrow, _ in jobs])
+        releases = []
+        for escrow, condition_id in jobs:
+            if statuses is None:
+                releases.append(self.attempt_release(escrow, condition_id))
+                continue
+            status = statuses.get(escrow['address'].lower())
+            if status and status['ready']:
+                releases.append(self.attempt_release(escrow, condition_id, prescreened=True))
+            else:
+                self.reject_prescreened(escrow, condition_id, status)
+        try:
+            await asyncio.gather(*releases)
+        finally:
+            self.fulfilled_at.clear()
+
+        for tx_hash, log_index, condition in handled:
+            self.processed_conditions.add(*condition)
+            self.store.mark_processed(tx_hash, log_index, condition)
+        self.last_block = head
+        self.store.set_last_block(head)
+        self.store.flush()
+        self.metrics.last_block.set(head)
+        return len(events)
+
+    async def prescreen(self, escrow_addresses):
+        """Multicall readiness keyed by lowercase address, or None to check one by one"""
+        if not escrow_addresses or not self.deployments['multicall']:
+            return None
+        try:
+            multicall = self.contracts.get(self.deployments['multicall'], load_abi(MULTICALL_ABI_PATH))
+            statuses = await check_release_ready_async(multicall, escrow_addresses)
+        except Exception as e:
+            log.warning("Multicall pre-screen failed, checking escrows one by one", extra={'error': str(e)})
+            return None
+        return {address.lower(): status for address, status in statuses.items()}
+
+    def reject_prescreened(self, escrow_data, condition_id, status):
+        """
+        A release the multicall pre-screen found not ready: nothing to do if
+        the escrow is no longer funded, otherwise retried like a failed pre-check
+        """
+        escrow_address = escrow_data['address']
+        if status is not None and status['state'] != 1:
+            log.info("Escrow not funded", extra={'escrow': escrow_address, 'state': status['state']})
+            self.retries.resolved(escrow_address)
+            return
+        if self.seller_address.lower() != escrow_data['seller'].lower():
+            log.info("Skipping escrow of another seller", extra={'escrow': escrow_address})
+            return
+        reason = not_ready_reason(status)
+        log.warning("Pre-screen failed", extra={'escrow': escrow_address, 'reason': reason})
+        self.retries.failed(escrow_address, condition_id, reason)
+
+    async def attempt_release(self, escrow_data, condition_id, prescreened=False):
+        """Pre-check (unless prescreened), sign, send and confirm release() on one escrow"""
+        escrow_address = escrow_data['address']
+
+        if self.seller_address.lower() != escrow_data['seller'].lower():
+            log.error("Bot account mismatch", extra={'escrow': escrow_address, 'required': escrow_data['seller']})
+            return
+        if escrow_address.lower() in self.inflight_escrows:
+            log.info("Release already in flight", extra={'escrow': escrow_address})
+            return
+
+        self.queued += 1
+        async with self.semaphore:
+            self.queued -= 1
+            escrow_contract = self.contracts.get(escrow_address, escrow_data['abi'])
+            try:
+                if not prescreened:
+                    state = await escrow_contract.functions.state().call()
+                    if state != 1:
+                        log.info("Escrow not funded", extra={'escrow': escrow_address, 'state': state})
+                        self.retries.resolved(escrow_address)
+                        return
+
+                    try:
+                        await escrow_contract.functions.release().call({'from': self.seller_address})
+                    except Exception as sim_error:
+                        log.warning("Pre-check failed", extra={'escrow': escrow_address, 'error': str(sim_error)})
+                        self.retries.failed(escrow_address, condition_id, revert_reason(sim_error))
+                        return
+
+                release = escrow_contract.functions.release()
+                gas = await release.estimate_gas({'from': self.seller_address})
+                fees = await self.fees.current()
+
+                nonce = await self.reserve_nonce()
+                try:
+                    release_tx = await release.build_transaction({
+                        'from': self.seller_address,
+                        'nonce': nonce,
+                        'gas': gas * (100 + RELEASE_GAS_HEADROOM) // 100,
+                        **fees
+                    })
+                    signed_tx = self.w3.eth.account.sign_transaction(
+                        release_tx,
+                        private_key=self.seller_account.key
+                    )
+                    tx_hash = await self.w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+                except Exception:
+                    # The reserved nonce was not used; later ones would stall behind the gap
+                    await self.resync_nonce()
+                    raise
+
+                log.info("Release sent", extra={
+                    'escrow': escrow_address, 'tx_hash': tx_hash, 'nonce': nonce, 'fees': format_fees(fees)
+                })
+                self.inflight_escrows[escrow_address.lower()] = tx_hash.hex()
+                self.store.add_inflight(tx_hash, escrow_address, nonce)
+
+                receipt = await self.w3.eth.wait_for_transaction_receipt(tx_hash)
+                self.store.clear_inflight(tx_hash)
+                self.inflight_escrows.pop(escrow_address.lower(), None)
+
+                self.record_release((escrow_data['condition_verifier'].lower(), condition_id), receipt)
+                if receipt.status == 1:
+                    log.info("Release successful", extra={
+                        'escrow': escrow_address, 'tx_hash': tx_hash, 'gas_used': receipt.gasUsed
+                    })
+                    self.retries.resolved(escrow_address)
+                else:
+                    reason = await decode_revert_reason_async(self.w3, receipt) or "reverted (status=0)"
+                    log.error("Release reverted", extra={'escrow': escrow_address, 'tx_hash': tx_hash, 'reason': reason})
+                    self.retries.failed(escrow_address, condition_id, reason)
+
+            except Exception as e:
+                self.metrics.releases.inc(result='error')
+                log.error("Error during release", extra={'escrow': escrow_address, 'error': str(e)})
+                self.retries.failed(escrow_address, condition_id, revert_reason(e))
+
+    def record_release(self, condition, receipt):
+        """Outcome, gas and event-to-receipt latency of a mined release"""
+        self.metrics.releases.inc(result='success' if receipt.status == 1 else 'reverted')
+        self.metrics.release_gas.observe(receipt.gasUsed)
+        fulfilled = self.fulfilled_at.get(condition)
+        if fulfilled is not None:
+            fulfilled_block, fulfilled_timestamp = fulfilled
+            self.metrics.release_latency_blocks.observe(receipt.blockNumber - fulfilled_block)
+            self.metrics.release_latency.observe(max(0, time.time() - fulfilled_timestamp))
+
+    async def run(self):
+        """Main async loop"""
+        log.info("Async keeper bot started", extra={'poll_interval': POLL_INTERVAL})
+
+        await self.setup()
+        try:
+            while True:
+                try:
+                    await self.poll_once()
+                except Exception:
+                    log.error("Error checking events", exc_info=True)
+                await asyncio.sleep(POLL_INTERVAL)
+        finally:
+            await asyncio.to_thread(self.retries.stop)
+            self.store.close()
+            self.metrics.close()
+
+
+    async def run_subscribed(self, ws_url=GANACHE_WS_URL):
+        """
+        Push-based loop: react to every newHeads notification instead of
+        sleeping POLL_INTERVAL. If the socket drops, reconnect with backoff;
+        the first poll after reconnecting covers every block missed meanwhile.
+        """
+        log.info("Async keeper bot started (newHeads subscription)", extra={'ws_url': ws_url})
+
+        delay = RECONNECT_MIN_DELAY
+        ready = False
+        try:
+            while True:
+                try:
+                    async with AsyncWeb3(WebSocketProvider(ws_url)) as w3:
+                        w3.middleware_onion.add(self.metrics.middleware(), name='metrics')
+                        self.w3 = w3
+                        if ready:
+                            self.attach()
+                        else:
+                            await self.setup()
+                            ready = True
+
+                        await w3.eth.subscribe('newHeads')
+                        log.info("Subscribed to newHeads")
+                        delay = RECONNECT_MIN_DELAY
+
+                        # Catch up on anything mined while disconnected
+                        await self.poll_once()
+
+                        async for message in w3.socket.process_subscriptions():
+                            head = message['result']['number']
+                            try:
+                                await self.poll_once(head)
+                            except Exception:
+                                log.error("Error checking events", exc_info=True)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    log.warning("WebSocket connection lost, reconnecting", extra={
+                        'error': str(e), 'delay_seconds': delay
+                    })
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, RECONNECT_MAX_DELAY)
+        finally:
+            await asyncio.to_thread(self.retries.stop)
+            self.store.close()
+            self.metrics.close()
+
+
+def main():
+    """Entry point for the async keeper bot"""
+    parser = argparse.ArgumentParser(description="Asyncio escrow keeper bot")
+    parser.add_argument(
+        "--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+        help=f"maximum releases in progress at once (default: {DEFAULT_CONCURRENCY})"
+    )
+    parser.add_argument(
+        "--from-block", type=int, default=None,
+        help="backfill ConditionFulfilled events from this block "
+             "(default: resume from the saved checkpoint)"
+    )
+    parser.add_argument(
+        "--state-db", default=STATE_PATH,
+        help=f"SQLite checkpoint file (default: {STATE_PATH})"
+    )
+    parser.add_argument(
+        "--ws", nargs="?", const=GANACHE_WS_URL, default=None, metavar="URL",
+        help=f"react to newHeads over a WebSocket instead of polling (default URL: {GANACHE_WS_URL})"
+    )
+    parser.add_argument(
+        "--metrics-port", type=int, default=None,
+        help="serve Prometheus metrics on this port at /metrics (default: off)"
+    )
+    parser.add_argument(
+        "--log-level", default=None,
+        help="level, optionally per logger, e.g. INFO,asyncKeeperBot=DEBUG (default: $LOG_LEVEL or INFO)"
+    )
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+
+    seller_key = getpass.getpass(prompt="Enter seller private key: ")
+    if not seller_key:
+        log.error("Private key required")
+        sys.exit(1)
+
+    bot = AsyncEscrowKeeperBot(
+        seller_key,
+        concurrency=args.concurrency,
+        start_block=args.from_block,
+        state_path=args.state_db
+    )
+    if args.metrics_port is not None:
+        bot.metrics.serve(args.metrics_port)
+        log.info("Serving metrics", extra={'url': f"http://{METRICS_HOST}:{args.metrics_port}/metrics"})
+    try:
+        asyncio.run(bot.run_subscribed(args.ws) if args.ws else bot.run())
+    except KeyboardInterrupt:
+        log.info("Bot stopped by user")
+
+
+if __name__ == "__main__":
+    main()
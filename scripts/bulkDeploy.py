@@ -0,0 +1,396 @@
+"""
+Bulk escrow deployment from a manifest
+Deploys one ConditionVerifier plus an ETH deposit condition and an Escrow
+for every row of a CSV or JSON manifest:
+
+    seller,timeout,beneficiary,required_amount
+    0x3b958F4E8489b3540c56d87121aB597D6ECef05d,3600,0x946A84AD0C7952D5D03BB8D43e894cc069DC5157,1000000000000000000
+
+(JSON: a list of objects with the same keys, or {"escrows": [...]})
+
+    python scripts/deploy.py --manifest escrows.csv [--sign-workers <n>]
+
+Every transaction is built with a reserved nonce and signed up front (in a
+process pool for large manifests), then all of them are broadcast
+back-to-back and their receipts collected in one batched pass. Condition ids
+of the fresh verifier are handed out in nonce order (0, 1, 2, ...), so each
+Escrow can be built before anything is mined; the ConditionCreated events
+are checked against them afterwards. Rows that fail validation are reported
+and skipped; if a broadcast fails, the rows after it are not sent (their
+nonces would sit behind the gap) and are reported for a rerun.
+
+With an EscrowFactory recorded (see escrowFactory.py) every Escrow is a
+create_escrow() call for a minimal proxy instead of a full bytecode
+deployment; proxy addresses come from the EscrowCreated events once the
+receipts are in. --no-factory deploys the full bytecode.
+
+With --shared-verifier no verifier is deployed: the conditions are created on
+the network's shared ConditionVerifier (see sharedVerifier.py). Anyone can add
+conditions to it, so there the conditions are sent and confirmed first and
+each escrow is built from the id in its ConditionCreated event: two receipt
+passes instead of one, but an escrow is never bound to someone else's
+condition.
+"""
+
+import os
+import csv
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from eth_account import Account
+from web3 import Web3
+from web3.utils import get_create_address
+
+from nonceManager import NonceManager
+from receiptTracker import ReceiptTracker
+from escrowFactory import CREATE_ESCROW_GAS, latest_factory_address, load_factory, create_escrow_call, escrow_from_receipt
+from sharedVerifier import shared_verifier
+from deploymentRegistry import append_deployments
+
+MANIFEST_FIELDS = ("seller", "timeout", "beneficiary", "required_amount")
+
+DEPLOY_GAS = 4000000
+CONDITION_GAS = 500000
+GAS_PRICE_GWEI = 20
+
+# Below this many transactions signing inline beats starting a process pool
+SIGN_POOL_MIN = 64
+
+_signing_key = None  # set in each signing process by _init_signer
+
+
+def load_manifest(path):
+    """
+    Rows of a CSV or JSON manifest, numbered from 1, validated:
+    [{'row', 'seller', 'timeout', 'beneficiary', 'required_amount',
+      'condition_id', 'escrow', 'tx_hash', 'block', 'error'}]
+    error is None for rows that can be deployed; the rest is filled in by
+    deploy_manifest().
+    """
+    with open(path, newline='') as f:
+        if path.lower().endswith('.json'):
+            entries = json.load(f)
+            if isinstance(entries, dict):
+                entries = entries.get('escrows', [])
+        else:
+            entries = list(csv.DictReader(f))
+    return [parse_row(number, entry) for number, entry in enumerate(entries, 1)]
+
+
+def parse_row(number, entry):
+    """Validate one manifest entry against what the contracts would reject"""
+    entry = {str(key).strip(): value for key, value in entry.items() if key is not None}
+    row = {'row': number, **{field: entry.get(field) for field in MANIFEST_FIELDS},
+           'condition_id': None, 'escrow': None, 'tx_hash': None, 'block': None, 'error': None}
+
+    missing = [field for field in MANIFEST_FIELDS if row[field] in (None, '')]
+    if missing:
+        row['error'] = f"Missing {', '.join(missing)}"
+        return row
+    for field in ('seller', 'beneficiary'):
+        value = str(row[field]).strip()
+        if not Web3.is_address(value):
+            row['error'] = f"Invalid {field} address: {value}"
+            return row
+        row[field] = Web3.to_checksum_address(value)
+    if int(row['beneficiary'], 16) == 0:
+        row['error'] = "Invalid beneficiary address"
+        return row
+    for field in ('timeout', 'required_amount'):
+        try:
+            row[field] = int(str(row[field]).strip())
+        except ValueError:
+            row['error'] = f"Invalid {field}: {row[field]}"
+            return row
+    if row['timeout'] < 0:
+        row['error'] = "Timeout must not be negative"
+    elif row['required_amount'] <= 0:
+        row['error'] = "Required amount must be positive"
+    return row
+
+
+# ----- signing -----
+def _init_signer(private_key):
+    global _signing_key
+    _signing_key = private_key
+
+
+def _sign(tx):
+    signed = Account.sign_transaction(tx, _signing_key)
+    return bytes(signed.raw_transaction), bytes(signed.hash)
+
+
+def sign_all(txs, private_key, workers=None):
+    """
+    [(raw transaction, tx hash)] for fully built transactions, in order.
+    Large batches are signed in a process pool (workers=None: one per CPU;
+    workers=0: always inline).
+    """
+    if workers == 0 or len(txs) < SIGN_POOL_MIN:
+        _init_signer(private_key)
+        try:
+            return [_sign(tx) for tx in txs]
+        finally:
+            _init_signer(None)
+
+    workers = workers or os.cpu_count() or 1
+    # deploy.py runs at import time, so workers must be forked rather than
+    # spawned (a spawned worker would import it again and prompt for a key)
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    with ProcessPoolExecutor(workers, mp_context=context,
+                             initializer=_init_signer, initargs=(private_key,)) as pool:
+        return list(pool.map(_sign, txs, chunksize=max(1, len(txs) // (workers * 4))))
+
+
+# ----- deployment -----
+def deploy_manifest(w3, private_key, rows, sign_workers=None, nonces=None, factory_address=None, cv_address=None):
+    """
+    Deploy a ConditionVerifier (unless cv_address names an existing one)
+    and, for every valid row, its condition and Escrow (a minimal proxy if
+    factory_address is given). Fills in condition_id, escrow, tx_hash, block
+    and error on each row.
+    Returns: (verifier address or None, cv tx hash or None if none was deployed)
+    """
+    deployer = w3.eth.account.from_key(private_key).address
+    nonces = nonces or NonceManager(w3)
+    valid = [row for row in rows if row['error'] is None]
+    if not valid:
+        return None, None
+
+    with open('contracts/ConditionVerifier.abi') as f:
+        cv_abi = json.load(f)
+    with open('contracts/ConditionVerifier.bin') as f:
+        cv_bytecode = f.read().strip()
+    with open('contracts/Escrow.abi') as f:
+        escrow_abi = json.load(f)
+    with open('contracts/Escrow.bin') as f:
+        escrow_bytecode = f.read().strip()
+
+    # Chain id and gas are fixed, so building makes no RPC calls
+    chain_id = w3.eth.chain_id
+    gas_price = w3.to_wei(GAS_PRICE_GWEI, "gwei")
+    def params(nonce, gas):
+        return {"from": deployer, "nonce": nonce, "gas": gas, "gasPrice": gas_price, "chainId": chain_id}
+
+    Escrow = w3.eth.contract(abi=escrow_abi, bytecode=escrow_bytecode)
+    factory = load_factory(w3, factory_address) if factory_address else None
+    def escrow_tx(row, nonce):
+        """Escrow (or create_escrow call) for a row whose condition_id is set"""
+        if factory is not None:
+            return create_escrow_call(
+                factory, row['seller'], row['timeout'], cv_address, row['condition_id'], row['beneficiary']
+            ).build_transaction(params(nonce, CREATE_ESCROW_GAS))
+        row['escrow'] = get_create_address(deployer, nonce)
+        return Escrow.constructor(
+            row['seller'], row['timeout'], cv_address, row['condition_id'], row['beneficiary']
+        ).build_transaction(params(nonce, DEPLOY_GAS))
+
+    def check_escrow(row, result):
+        """Fill in the row from the (receipt, error) of its escrow transaction"""
+        (escrow_receipt, error), tx_hash = result
+        if error is None and factory is not None:
+            row['escrow'] = escrow_from_receipt(factory, escrow_receipt)
+            if row['escrow'] is None:
+                error = "No EscrowCreated event"
+        if error is not None:
+            row['escrow'] = None
+            row['error'] = f"Escrow: {error}"
+            return
+        row['tx_hash'] = tx_hash.hex()
+        row['block'] = escrow_receipt.blockNumber
+
+    def condition_id_of(receipt):
+        created = cv_contract.events.ConditionCreated().process_receipt(receipt)
+        return created[0]['args']['condition_id'] if created else None
+
+    if cv_address is not None:
+        # Existing (shared) verifier: anyone can create conditions on it, so
+        # an id cannot be predicted. The conditions go out first and each
+        # escrow is built from the id its ConditionCreated event reports.
+        cv_contract = w3.eth.contract(address=cv_address, abi=cv_abi)
+        results = _broadcast(w3, nonces, deployer, sign_all([
+            cv_contract.functions.create_eth_deposit_condition(
+                row['beneficiary'], row['required_amount']
+            ).build_transaction(params(nonces.reserve(deployer), CONDITION_GAS))
+            for row in valid
+        ], private_key, sign_workers))
+        created = []
+        for row, ((receipt, error), _) in zip(valid, results):
+            if error is None:
+                row['condition_id'] = condition_id_of(receipt)
+                if row['condition_id'] is None:
+                    error = "No ConditionCreated event"
+            if error is not None:
+                row['error'] = f"Condition: {error}"
+            else:
+                created.append(row)
+        if created:
+            results = _broadcast(w3, nonces, deployer, sign_all(
+                [escrow_tx(row, nonces.reserve(deployer)) for row in created], private_key, sign_workers
+            ))
+            for row, result in zip(created, results):
+                check_escrow(row, result)
+        return cv_address, None
+
+    # Fresh verifier, layout: [verifier, condition 0, escrow 0, condition 1, escrow 1, ...].
+    # Its condition ids are handed out in nonce order (0, 1, 2, ...), so every
+    # escrow can be built before anything is mined.
+    cv_nonce = nonces.reserve(deployer)
+    cv_address = get_create_address(deployer, cv_nonce)
+    cv_contract = w3.eth.contract(address=cv_address, abi=cv_abi)
+    txs = [w3.eth.contract(abi=cv_abi, bytecode=cv_bytecode).constructor().build_transaction(
+        params(cv_nonce, DEPLOY_GAS)
+    )]
+    for condition_id, row in enumerate(valid):
+        txs.append(cv_contract.functions.create_eth_deposit_condition(
+            row['beneficiary'], row['required_amount']
+        ).build_transaction(params(nonces.reserve(deployer), CONDITION_GAS)))
+        row['condition_id'] = condition_id
+        txs.append(escrow_tx(row, nonces.reserve(deployer)))
+
+    results = _broadcast(w3, nonces, deployer, sign_all(txs, private_key, sign_workers))
+    (_, cv_error), cv_tx_hash = results[0]
+    for i, row in enumerate(valid):
+        if cv_error is not None:
+            row['error'] = f"ConditionVerifier: {cv_error}"
+            continue
+        (condition_receipt, error), _ = results[1 + 2 * i]
+        if error is None and condition_id_of(condition_receipt) != row['condition_id']:
+            error = "Condition id mismatch (an earlier condition was not created)"
+        if error is not None:
+            row['error'] = f"Condition: {error}"
+            continue
+        check_escrow(row, results[2 + 2 * i])
+
+    if cv_error is not None:
+        return None, None
+    return cv_address, cv_tx_hash.hex()
+
+
+def _broadcast(w3, nonces, deployer, signed):
+    """
+    Send signed transactions back-to-back and collect their receipts in one
+    batched polling pass. Sending stops at the first failure so that nothing
+    else queues up behind the nonce gap.
+    Returns [((receipt, None) or (None, error), tx hash)] in order.
+    """
+    hashes = []
+    send_error = None
+    for raw, tx_hash in signed:
+        try:
+            w3.eth.send_raw_transaction(raw)
+        except Exception as e:
+            send_error = e
+            break
+        hashes.append(tx_hash)
+    if send_error is not None:
+        nonces.resync(deployer)
+
+    receipts = {}
+    if hashes:
+        tracker = ReceiptTracker(w3)
+        try:
+            futures = [tracker.track(tx_hash) for tx_hash in hashes]
+            for tx_hash, future in zip(hashes, futures):
+                try:
+                    receipts[tx_hash] = future.result()
+                except Exception as e:
+                    receipts[tx_hash] = e
+        finally:
+            tracker.stop()
+
+    results = []
+    for index, (_, tx_hash) in enumerate(signed):
+        if index >= len(hashes):
+            if index == len(hashes):
+                results.append(((None, f"Send failed: {send_error}"), tx_hash))
+            else:
+                results.append(((None, "Not sent: an earlier transaction failed to send"), tx_hash))
+            continue
+        receipt = receipts[tx_hash]
+        if isinstance(receipt, Exception):
+            results.append(((None, f"No receipt: {receipt}"), tx_hash))
+        elif receipt.status != 1:
+            results.append(((None, f"Reverted: {receipt.get('revertReason') or 'no reason'}"), tx_hash))
+        else:
+            results.append(((receipt, None), tx_hash))
+    return results
+
+
+def record_deployments(cv_address, cv_tx_hash, rows, deployer, factory_address=None):
+    """Record the verifier (if one was deployed) and the deployed escrows in one append"""
+    records = []
+    timestamp = datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+    if cv_tx_hash is not None:
+        records.append({
+            "contract": "ConditionVerifier",
+            "address": cv_address,
+            "txHash": cv_tx_hash,
+            "deployer": deployer,
+            "timestamp": timestamp,
+            "constructorArgs": []
+        })
+    for row in rows:
+        if row['error'] is not None:
+            continue
+        records.append({
+            "contract": "Escrow",
+            "address": row['escrow'],
+            "txHash": row['tx_hash'],
+            "blockNumber": row['block'],
+            "deployer": deployer,
+            "seller": row['seller'],
+            "timestamp": timestamp,
+            "constructorArgs": [row['seller'], row['timeout'], cv_address, row['condition_id'], row['beneficiary']],
+            "factory": factory_address,
+            "linkedContracts": {
+                "conditionVerifier": cv_address,
+                "externalConditionId": row['condition_id'],
+                "beneficiary": row['beneficiary'],
+                "requiredAmount": row['required_amount']
+            }
+        })
+    append_deployments(records)
+
+
+def write_report(rows, cv_address, path=None):
+    """Per-row results as JSON; returns the path"""
+    if path is None:
+        path = f"deployments/bulk_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(path, "w") as f:
+        json.dump({"conditionVerifier": cv_address, "rows": rows}, f, indent=2)
+    return path
+
+
+def run(w3, private_key, manifest_path, sign_workers=None, use_factory=True, use_shared_verifier=False):
+    """deploy.py --manifest: deploy, record, print and save the per-row report"""
+    rows = load_manifest(manifest_path)
+    factory_address = latest_factory_address(w3) if use_factory else None
+    print(f"\n=== Bulk deployment: {len(rows)} row(s) from {manifest_path} ===")
+    if factory_address:
+        print(f"Creating escrows through EscrowFactory {factory_address}")
+    deployer = w3.eth.account.from_key(private_key).address
+    nonces = NonceManager(w3)
+    shared_address = None
+    if use_shared_verifier and any(row['error'] is None for row in rows):
+        shared_address, deployed = shared_verifier(w3, private_key, nonces)
+        print(f"{'Deployed' if deployed else 'Using'} shared ConditionVerifier {shared_address}")
+    cv_address, cv_tx_hash = deploy_manifest(w3, private_key, rows, sign_workers, nonces,
+                                             factory_address=factory_address, cv_address=shared_address)
+
+    for row in rows:
+        if row['error'] is None:
+            print(f"✅ Row {row['row']}: Escrow {row['escrow']} (condition {row['condition_id']}, seller {row['seller']})")
+        else:
+            print(f"❌ Row {row['row']}: {row['error']}")
+
+    deployed = sum(1 for row in rows if row['error'] is None)
+    if cv_address is not None:
+        record_deployments(cv_address, cv_tx_hash, rows, deployer, factory_address)
+        print(f"\nConditionVerifier: {cv_address}")
+        print("Deployment recorded")
+    print(f"Deployed {deployed} of {len(rows)} escrow(s)")
+    print(f"Report saved to {write_report(rows, cv_address)}")
+    return rows
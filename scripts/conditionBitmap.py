@@ -0,0 +1,95 @@
+"""
+Compact record of processed condition ids
+ConditionVerifier hands out condition ids sequentially from 0
+(condition_count), so the ids a keeper has handled form a dense range of
+small integers. A bitmap per verifier keeps each of them in one bit: a
+million processed conditions cost 125 KB instead of the tens of MB a set
+of Python ints takes, and each bitmap is saved and loaded as raw bytes.
+"""
+
+
+class ConditionBitmap:
+    """Set of condition ids of one verifier; id i is bit i % 8 of byte i // 8"""
+
+    def __init__(self, data=b''):
+        self.bits = bytearray(data)
+        self.count = bin(int.from_bytes(self.bits, 'little')).count('1')
+
+    def __contains__(self, condition_id):
+        byte = condition_id >> 3
+        return byte < len(self.bits) and bool(self.bits[byte] >> (condition_id & 7) & 1)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for byte, value in enumerate(self.bits):
+            while value:
+                low = value & -value
+                yield byte * 8 + low.bit_length() - 1
+                value ^= low
+
+    def add(self, condition_id):
+        if condition_id < 0:
+            raise ValueError(f"condition id must not be negative: {condition_id}")
+        byte = condition_id >> 3
+        if byte >= len(self.bits):
+            self.bits.extend(bytes(byte + 1 - len(self.bits)))
+        mask = 1 << (condition_id & 7)
+        if not self.bits[byte] & mask:
+            self.bits[byte] |= mask
+            self.count += 1
+
+    def discard(self, condition_id):
+        byte = condition_id >> 3
+        mask = 1 << (condition_id & 7)
+        if 0 <= byte < len(self.bits) and self.bits[byte] & mask:
+            self.bits[byte] &= ~mask
+            self.count -= 1
+
+    def to_bytes(self):
+        """Raw bitmap, without the trailing zero bytes"""
+        return bytes(self.bits).rstrip(b'\0')
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(data)
+
+
+class ProcessedConditions:
+    """
+    Processed conditions of every verifier, keyed by (verifier, condition_id):
+        (verifier_address, condition_id) in processed
+    Verifier addresses are compared case-insensitively.
+    """
+
+    def __init__(self, bitmaps=None):
+        self.bitmaps = {}  # verifier (lowercase) -> ConditionBitmap
+        for verifier, data in (bitmaps or {}).items():
+            self.bitmaps[verifier.lower()] = ConditionBitmap.from_bytes(data)
+
+    def __contains__(self, condition):
+        verifier, condition_id = condition
+        bitmap = self.bitmaps.get(verifier.lower())
+        return bitmap is not None and condition_id in bitmap
+
+    def __len__(self):
+        return sum(len(bitmap) for bitmap in self.bitmaps.values())
+
+    def add(self, verifier, condition_id):
+        verifier = verifier.lower()
+        if verifier not in self.bitmaps:
+            self.bitmaps[verifier] = ConditionBitmap()
+        self.bitmaps[verifier].add(condition_id)
+
+    def discard(self, verifier, condition_id):
+        bitmap = self.bitmaps.get(verifier.lower())
+        if bitmap is not None:
+            bitmap.discard(condition_id)
+
+    def clear(self):
+        self.bitmaps.clear()
+
+    def to_bytes(self):
+        """{verifier: raw bitmap} for every verifier with a processed condition"""
+        return {verifier: bitmap.to_bytes() for verifier, bitmap in self.bitmaps.items() if bitmap}
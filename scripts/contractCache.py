@@ -0,0 +1,64 @@
+"""
+Shared ABI registry and contract instance cache
+Every artifact's ABI is parsed once per process and the same list is handed
+to every caller, and web3 contract objects are kept in a bounded LRU keyed by
+address instead of being rebuilt from the ABI for every call
+"""
+
+import json
+import threading
+from collections import OrderedDict
+
+CONTRACT_CACHE_SIZE = 1024  # contract instances kept per ContractCache
+
+_abis = {}
+_abis_lock = threading.Lock()
+
+
+def load_abi(path):
+    """
+    Parsed ABI of an artifact, read from disk on first use only.
+    The returned list is shared: do not modify it.
+    """
+    abi = _abis.get(path)
+    if abi is None:
+        with _abis_lock:
+            abi = _abis.get(path)
+            if abi is None:
+                with open(path, 'r') as f:
+                    abi = json.load(f)
+                _abis[path] = abi
+    return abi
+
+
+class ContractCache:
+    """
+    Least-recently-used cache of contract instances for one Web3/AsyncWeb3
+    object. Building a contract walks its whole ABI, so a keeper touching
+    thousands of escrows keeps the hot ones here and rebuilds the rest.
+    """
+
+    def __init__(self, w3, maxsize=CONTRACT_CACHE_SIZE):
+        self.w3 = w3
+        self.maxsize = maxsize
+        self._contracts = OrderedDict()  # lowercase address -> contract
+        self._lock = threading.Lock()
+
+    def get(self, address, abi):
+        """Contract instance at address (abi is only used on a cache miss)"""
+        key = address.lower()
+        with self._lock:
+            contract = self._contracts.get(key)
+            if contract is not None:
+                self._contracts.move_to_end(key)
+                return contract
+
+        contract = self.w3.eth.contract(address=address, abi=abi)
+        with self._lock:
+            self._contracts[key] = contract
+            if len(self._contracts) > self.maxsize:
+                self._contracts.popitem(last=False)
+        return contract
+
+    def __len__(self):
+        return len(self._contracts)
@@ -1,13 +1,26 @@
 # python3 scripts/deploy.py <seller_address> <timeout> <beneficiary_address> <required_eth_amount_in_wei>
 # sample: python3 scripts/deploy.py 0x3b958F4E8489b3540c56d87121aB597D6ECef05d 3600 0x946A84AD0C7952D5D03BB8D43e894cc069DC5157 3654279658035655000
+# bulk: python3 scripts/deploy.py --manifest escrows.csv (rows of seller,timeout,beneficiary,required_amount)
+# Escrows are created through the latest recorded EscrowFactory (python3 scripts/escrowFactory.py deploy)
+# if there is one; add --no-factory to deploy the full Escrow bytecode instead
+# Add --shared-verifier to create the condition on the network's shared ConditionVerifier
+# (deployed on first use, see sharedVerifier.py) instead of deploying a new verifier
 
 import os
 import sys
 import json
 from web3 import Web3
+from web3.utils import get_create_address
 from datetime import datetime, timezone
 import getpass
 
+from nonceManager import NonceManager
+from receiptTracker import ReceiptTracker
+from bulkDeploy import run as run_bulk
+from escrowFactory import CREATE_ESCROW_GAS, latest_factory_address, load_factory, create_escrow_call, escrow_from_receipt
+from sharedVerifier import shared_verifier
+from deploymentRegistry import append_deployments
+
 # NEW - for logging: Event signatures for printing escrow logs 
 EVENT_SIGNATURES = {
     'EscrowStatus': Web3.keccak(text="EscrowStatus(address,address,uint8,uint256)").hex(),
@@ -57,9 +70,27 @@ print("Verified: deployment authorized for address", deployer_address)
 # Network configuration
 NETWORK_NAME = "ganache"
 
+# Minimal proxies through the recorded EscrowFactory, unless --no-factory
+use_factory = "--no-factory" not in sys.argv
+# One ConditionVerifier per network instead of one per escrow, with --shared-verifier
+use_shared_verifier = "--shared-verifier" in sys.argv
+sys.argv = [arg for arg in sys.argv if arg not in ("--no-factory", "--shared-verifier")]
+
+# Bulk mode: one escrow per manifest row (see bulkDeploy.py)
+if len(sys.argv) > 1 and sys.argv[1] == "--manifest":
+    if len(sys.argv) not in (3, 5) or (len(sys.argv) == 5 and sys.argv[3] != "--sign-workers"):
+        print("Usage: python scripts/deploy.py --manifest <escrows.csv|escrows.json> [--sign-workers <n>]")
+        sys.exit(1)
+    assert w3.is_connected(), "Web3 not connected to Ganache!"
+    bulk_rows = run_bulk(w3, DEPLOYER_PRIVATE_KEY, sys.argv[2],
+                         sign_workers=int(sys.argv[4]) if len(sys.argv) == 5 else None,
+                         use_factory=use_factory, use_shared_verifier=use_shared_verifier)
+    sys.exit(0 if all(row['error'] is None for row in bulk_rows) else 1)
+
 # Check command-line arguments
 if len(sys.argv) < 5:
-    print("Usage: python scripts/deploy.py <seller_address> <timeout> <beneficiary_address> <required_eth_amount_in_wei>")
+    print("Usage: python scripts/deploy.py <seller_address> <timeout> <beneficiary_address> <required_eth_amount_in_wei> [--no-factory] [--shared-verifier]")
+    print("       python scripts/deploy.py --manifest <escrows.csv|escrows.json> [--sign-workers <n>] [--no-factory] [--shared-verifier]")
     print("Example: python scripts/deploy.py 0x123... 3600 0x456... 1000000000000000000")
     sys.exit(1)
 
@@ -76,144 +107,153 @@ deployer_private_key = os.environ.get('DEPLOYER_PRIVATE_KEY')
 if not deployer_private_key:
     raise Exception("DEPLOYER_PRIVATE_KEY not set in environment")
 
-# ===== STEP 1: Deploy ConditionVerifier =====
-# Note: ConditionVerifier is deployed before Escrow 
-print("\n=== Step 1: Deploying ConditionVerifier ===")
-
-# Load ConditionVerifier ABI and bytecode
+# ===== STEPS 1-3: ConditionVerifier, condition, Escrow =====
+# Note: ConditionVerifier is deployed before Escrow. The three transactions
+# are signed with consecutive nonces and sent back-to-back; the verifier
+# address is derived from (deployer, nonce) and a fresh verifier's first
+# condition is always ID 0, so nothing has to wait for a receipt in between.
+# With --shared-verifier, step 1 looks the verifier up instead (deploying it
+# only the first time). Anyone can create conditions on the shared verifier,
+# so there the condition receipt is awaited and the Escrow is built from the
+# ID its ConditionCreated event reports.
+
+# Load ABIs and bytecode
 with open('contracts/ConditionVerifier.abi') as f:
     cv_abi = json.load(f)
 with open('contracts/ConditionVerifier.bin') as f:
     cv_bytecode = f.read().strip()
+with open('contracts/Escrow.abi') as f:
+    escrow_abi = json.load(f)
+with open('contracts/Escrow.bin') as f:
+    escrow_bytecode = f.read().strip()
 
 # Connect to Ganache
 assert w3.is_connected(), "Web3 not connected to Ganache!"
 
 deployer_account = w3.eth.account.from_key(deployer_private_key)
 deployer_address = deployer_account.address
+nonces = NonceManager(w3, receipts=ReceiptTracker(w3))  # the three receipts arrive in one batch
+
+if use_shared_verifier:
+    print("\n=== Step 1: Looking up the shared ConditionVerifier ===")
+    cv_address, cv_deployed = shared_verifier(w3, deployer_private_key, nonces)
+    cv_tx_hash = None  # recorded by sharedVerifier.py if it was deployed just now
+    print(f"Shared ConditionVerifier {'deployed' if cv_deployed else 'found'} at: {cv_address}")
+else:
+    print("\n=== Step 1: Deploying ConditionVerifier ===")
+    ConditionVerifier = w3.eth.contract(abi=cv_abi, bytecode=cv_bytecode)
+    cv_tx_hash, cv_nonce = nonces.send(ConditionVerifier.constructor(), {
+        "from": deployer_address,
+        "gas": 4000000,
+        "gasPrice": w3.to_wei("20", "gwei"),
+    }, deployer_private_key)
+    cv_address = get_create_address(deployer_address, cv_nonce)
+    print(f"ConditionVerifier deployment TX hash: {cv_tx_hash.hex()}")
 
-# Deploy ConditionVerifier
-ConditionVerifier = w3.eth.contract(abi=cv_abi, bytecode=cv_bytecode)
-nonce = w3.eth.get_transaction_count(deployer_address)
-
-cv_tx = ConditionVerifier.constructor().build_transaction({
-    "from": deployer_address,
-    "nonce": nonce,
-    "gas": 4000000,
-    "gasPrice": w3.to_wei("20", "gwei"),
-})
-
-signed_cv_tx = w3.eth.account.sign_transaction(cv_tx, private_key=deployer_private_key)
-cv_tx_hash = w3.eth.send_raw_transaction(signed_cv_tx.raw_transaction)
-print(f"ConditionVerifier deployment TX hash: {cv_tx_hash.hex()}")
-
-cv_receipt = w3.eth.wait_for_transaction_receipt(cv_tx_hash)
-cv_address = cv_receipt.contractAddress
-print(f"ConditionVerifier deployed at: {cv_address}")
-
-# ===== STEP 2: Create ETH deposit condition =====
 print("\n=== Step 2: Creating ETH deposit condition ===")
-
-# Attach to deployed ConditionVerifier
 cv_contract = w3.eth.contract(address=cv_address, abi=cv_abi)
-
-# Create condition (seller calls this)
-nonce = w3.eth.get_transaction_count(deployer_address)
-
-create_condition_tx = cv_contract.functions.create_eth_deposit_condition(
+condition_tx_hash, _ = nonces.send(cv_contract.functions.create_eth_deposit_condition(
     beneficiary_address,
     required_amount
-).build_transaction({
+), {
     "from": deployer_address,
-    "nonce": nonce,
     "gas": 500000,
     "gasPrice": w3.to_wei("20", "gwei"),
-})
-
-signed_condition_tx = w3.eth.account.sign_transaction(create_condition_tx, private_key=deployer_private_key)
-condition_tx_hash = w3.eth.send_raw_transaction(signed_condition_tx.raw_transaction)
+}, deployer_private_key)
 print(f"Create condition TX hash: {condition_tx_hash.hex()}")
 
-condition_receipt = w3.eth.wait_for_transaction_receipt(condition_tx_hash)
-
-# Get the condition_id from the transaction receipt (from ConditionCreated event)
-condition_created_event = cv_contract.events.ConditionCreated().process_receipt(condition_receipt)
-condition_id = condition_created_event[0]['args']['condition_id']
-print(f"Condition created with ID: {condition_id}")
-
-# ===== STEP 3: Deploy Escrow =====
-print("\n=== Step 3: Deploying Escrow ===")
-
-# Load Escrow ABI and bytecode
-with open('contracts/Escrow.abi') as f:
-    escrow_abi = json.load(f)
-
-with open('contracts/Escrow.bin') as f:
-    escrow_bytecode = f.read().strip()
-
-Escrow = w3.eth.contract(abi=escrow_abi, bytecode=escrow_bytecode)
-nonce = w3.eth.get_transaction_count(deployer_address)
+def confirm_condition():
+    """Wait for the condition and return the ID from its ConditionCreated event"""
+    condition_receipt = nonces.wait(condition_tx_hash)
+    assert condition_receipt.status == 1, "Condition creation failed"
+    condition_created_event = cv_contract.events.ConditionCreated().process_receipt(condition_receipt)
+    assert condition_created_event, "No ConditionCreated event"
+    return condition_created_event[0]['args']['condition_id']
+
+if use_shared_verifier:
+    condition_id = confirm_condition()
+    print(f"Condition created with ID: {condition_id}")
+else:
+    condition_id = 0  # first condition of a freshly deployed verifier
+
+factory_address = latest_factory_address(w3) if use_factory else None
+if factory_address:
+    # Minimal proxy: a few hundred bytes of calldata instead of the full bytecode
+    print(f"\n=== Step 3: Creating Escrow through EscrowFactory {factory_address} ===")
+    factory = load_factory(w3, factory_address)
+    escrow_tx_hash, _ = nonces.send(create_escrow_call(
+        factory,
+        seller_address,
+        timeout,
+        cv_address,  # ConditionVerifier address
+        condition_id,  # External condition ID
+        beneficiary_address
+    ), {
+        "from": deployer_address,
+        "gas": CREATE_ESCROW_GAS,
+        "gasPrice": w3.to_wei("20", "gwei"),
+    }, deployer_private_key)
+else:
+    print("\n=== Step 3: Deploying Escrow ===")
+    Escrow = w3.eth.contract(abi=escrow_abi, bytecode=escrow_bytecode)
+    escrow_tx_hash, _ = nonces.send(Escrow.constructor(
+        seller_address,
+        timeout,
+        cv_address,  # ConditionVerifier address
+        condition_id,  # External condition ID
+        beneficiary_address
+    ), {
+        "from": deployer_address,
+        "gas": 4000000,
+        "gasPrice": w3.to_wei("20", "gwei"),
+    }, deployer_private_key)
+print(f"Escrow deployment TX hash: {escrow_tx_hash.hex()}")
 
-escrow_tx = Escrow.constructor(
-    seller_address,
-    timeout,
-    cv_address,  # ConditionVerifier address
-    condition_id,  # External condition ID
-    beneficiary_address
-).build_transaction({
-    "from": deployer_address,
-    "nonce": nonce,
-    "gas": 4000000,
-    "gasPrice": w3.to_wei("20", "gwei"),
-})
+# Confirm all three
+if cv_tx_hash is not None:
+    cv_receipt = nonces.wait(cv_tx_hash)
+    assert cv_receipt.status == 1 and cv_receipt.contractAddress == cv_address, "ConditionVerifier deployment failed"
+    print(f"ConditionVerifier deployed at: {cv_address}")
 
-signed_escrow_tx = w3.eth.account.sign_transaction(escrow_tx, private_key=deployer_private_key)
-escrow_tx_hash = w3.eth.send_raw_transaction(signed_escrow_tx.raw_transaction)
-print(f"Escrow deployment TX hash: {escrow_tx_hash.hex()}")
+if not use_shared_verifier:
+    assert confirm_condition() == condition_id, "Unexpected condition ID"
+    print(f"Condition created with ID: {condition_id}")
 
-escrow_receipt = w3.eth.wait_for_transaction_receipt(escrow_tx_hash)
-escrow_address = escrow_receipt.contractAddress
+escrow_receipt = nonces.wait(escrow_tx_hash)
+assert escrow_receipt.status == 1, "Escrow deployment failed"
+escrow_address = escrow_from_receipt(factory, escrow_receipt) if factory_address else escrow_receipt.contractAddress
+assert escrow_address is not None, "No EscrowCreated event in the create_escrow receipt"
 print(f"Escrow deployed at: {escrow_address}")
 print_escrow_events(escrow_address, escrow_receipt, escrow_abi, w3) # NEW: Print escrow deployment events 
 
 # ===== STEP 4: Save deployment records =====
 print("\n=== Step 4: Saving deployment records ===")
 
-data = {}
-json_path = "deployments/testnet.json"
-
-if os.path.exists(json_path):
-    with open(json_path, "r") as fjson:
-        try:
-            data = json.load(fjson)
-        except json.JSONDecodeError:
-            data = {}
-
-if "deployments" not in data:
-    data["network"] = NETWORK_NAME
-    data["deployments"] = []
-
+records = []
 timestamp = datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
 
-# Record ConditionVerifier deployment
-cv_record = {
-    "contract": "ConditionVerifier",
-    "address": cv_address,
-    "txHash": cv_tx_hash.hex(),
-    "deployer": deployer_address,
-    "timestamp": timestamp,
-    "constructorArgs": []
-}
+# Record ConditionVerifier deployment (the shared verifier has its own record)
+if cv_tx_hash is not None:
+    records.append({
+        "contract": "ConditionVerifier",
+        "address": cv_address,
+        "txHash": cv_tx_hash.hex(),
+        "deployer": deployer_address,
+        "timestamp": timestamp,
+        "constructorArgs": []
+    })
 
 # Record Escrow deployment
 escrow_record = {
     "contract": "Escrow",
     "address": escrow_address,
     "txHash": escrow_tx_hash.hex(),
+    "blockNumber": escrow_receipt.blockNumber,
     "deployer": deployer_address,
     "seller": seller_address,
     "timestamp": timestamp,
     "constructorArgs": [seller_address, timeout, cv_address, condition_id, beneficiary_address],
+    "factory": factory_address,
     "linkedContracts": {
         "conditionVerifier": cv_address,
         "externalConditionId": condition_id,
@@ -222,13 +262,12 @@ escrow_record = {
     }
 }
 
-data["deployments"].append(cv_record)
-data["deployments"].append(escrow_record)
+records.append(escrow_record)
 
-with open(json_path, "w") as fout:
-    json.dump(data, fout, indent=2)
+# Appended to testnet.json, or to deployments/registry.db once it has been imported (deploymentRegistry.py)
+append_deployments(records)
 
-print("Deployment recorded in testnet.json")
+print("Deployment recorded")
 
 print("\n=== Deployment Summary ===")
 print(f"ConditionVerifier: {cv_address}")
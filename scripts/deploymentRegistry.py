@@ -0,0 +1,367 @@
+"""
+SQLite deployment registry
+deployments/testnet.json holds every deployment record in one JSON document,
+so each deployment rewrites the whole file and every reader parses all of
+it. Once it grows, move it into the registry:
+
+    python scripts/deploymentRegistry.py import [deployments/testnet.json]
+    python scripts/deploymentRegistry.py export [deployments/testnet.json]
+    python scripts/deploymentRegistry.py show <address>
+    python scripts/deploymentRegistry.py seller <seller_address>
+    python scripts/deploymentRegistry.py condition <verifier_address> <condition_id>
+    python scripts/deploymentRegistry.py between <from_timestamp> <to_timestamp>
+
+While deployments/registry.db exists, the deploy scripts append to it and
+the keeper and interact.py read from it instead of testnet.json. Each append
+is one short write transaction (concurrent deployers queue on SQLite's lock
+instead of overwriting each other's records), and lookups by address,
+seller, verifier + condition id, timestamp and latest-of-a-contract use
+indexes. Records keep the testnet.json layout, so export gives back the
+file import read.
+"""
+
+import os
+import sys
+import json
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: the testnet.json fallback is not locked
+    fcntl = None
+
+DEPLOYMENTS_PATH = "deployments/testnet.json"
+DEPLOYMENTS_LOCK_PATH = "deployments/testnet.json.lock"
+REGISTRY_PATH = "deployments/registry.db"
+NETWORK_NAME = "ganache"
+
+FETCH_SIZE = 1000  # rows per fetch when iterating over many records
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS deployments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    contract TEXT NOT NULL,
+    address TEXT,
+    seller TEXT,
+    verifier TEXT,
+    condition_id INTEGER,
+    timestamp TEXT,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS deployments_address ON deployments (address);
+CREATE INDEX IF NOT EXISTS deployments_seller ON deployments (seller);
+CREATE INDEX IF NOT EXISTS deployments_condition ON deployments (verifier, condition_id);
+CREATE INDEX IF NOT EXISTS deployments_timestamp ON deployments (timestamp);
+CREATE INDEX IF NOT EXISTS deployments_contract ON deployments (contract, id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _lower(address):
+    return address.lower() if isinstance(address, str) else None
+
+
+def _row(record):
+    """Indexed columns of a testnet.json record (addresses lowercase)"""
+    linked = record.get('linkedContracts') or {}
+    return (
+        record['contract'],
+        _lower(record.get('address')),
+        _lower(record.get('seller')),
+        _lower(linked.get('conditionVerifier')),
+        linked.get('externalConditionId'),
+        record.get('timestamp'),
+        json.dumps(record),
+    )
+
+
+class DeploymentRegistry:
+    """
+    Deployment records in SQLite, in the order they were appended.
+
+    Appends take SQLite's write lock for one transaction (BEGIN IMMEDIATE,
+    waiting up to `timeout` seconds for another writer); WAL mode lets
+    readers carry on meanwhile. Records are returned as the dicts they were
+    appended as.
+    """
+
+    def __init__(self, path=REGISTRY_PATH, timeout=30):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    # ----- writes -----
+    def append(self, records):
+        """Append records in one transaction; returns the id of the last one"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.executemany(
+                "INSERT INTO deployments (contract, address, seller, verifier, condition_id, timestamp, record)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (_row(record) for record in records)
+            )
+            last_id = self.last_id()
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return last_id
+
+    def set_network(self, network):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('network', ?)", (network,))
+
+    # ----- reads -----
+    def network(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'network'").fetchone()
+        return row[0] if row else None
+
+    def last_id(self):
+        """Id of the newest record, 0 if there is none"""
+        return self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM deployments").fetchone()[0]
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM deployments").fetchone()[0]
+
+    def _records(self, query, params=()):
+        cursor = self.conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                return
+            for (record,) in rows:
+                yield json.loads(record)
+
+    def since(self, last_id):
+        """[(id, record)] appended after last_id, oldest first"""
+        return [(row_id, json.loads(record)) for row_id, record in self.conn.execute(
+            "SELECT id, record FROM deployments WHERE id > ? ORDER BY id", (last_id,)
+        )]
+
+    def latest(self, contract):
+        """Records of one contract type, newest first (a generator)"""
+        return self._records("SELECT record FROM deployments WHERE contract = ? ORDER BY id DESC", (contract,))
+
+    def find_address(self, address):
+        return list(self._records("SELECT record FROM deployments WHERE address = ? ORDER BY id", (_lower(address),)))
+
+    def find_seller(self, seller):
+        return list(self._records("SELECT record FROM deployments WHERE seller = ? ORDER BY id", (_lower(seller),)))
+
+    def find_condition(self, verifier, condition_id):
+        """Escrow records linked to condition_id on the given ConditionVerifier"""
+        return list(self._records(
+            "SELECT record FROM deployments WHERE verifier = ? AND condition_id = ? ORDER BY id",
+            (_lower(verifier), condition_id)
+        ))
+
+    def between(self, start, end):
+        """Records with start <= timestamp <= end (ISO 8601 strings, as recorded)"""
+        return list(self._records(
+            "SELECT record FROM deployments WHERE timestamp BETWEEN ? AND ? ORDER BY timestamp, id", (start, end)
+        ))
+
+    # ----- testnet.json -----
+    def import_json(self, path=DEPLOYMENTS_PATH):
+        """
+        Append every record of a testnet.json file; returns how many.
+        Raises OSError if the file cannot be read and ValueError if it is
+        not a deployments file.
+        """
+        with open(path) as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or not isinstance(data.get("deployments"), list):
+            raise ValueError(f"{path} has no \"deployments\" list")
+        records = data["deployments"]
+        self.set_network(data.get("network", NETWORK_NAME))
+        self.append(records)
+        return len(records)
+
+    def export_json(self, path=DEPLOYMENTS_PATH):
+        """
+        Write every record as a testnet.json file, streamed so that the
+        registry is never held in memory. Returns how many were written.
+        """
+        count = 0
+        with open(path + ".tmp", "w") as f:
+            f.write('{\n  "network": %s,\n  "deployments": [' % json.dumps(self.network() or NETWORK_NAME))
+            for record in self._records("SELECT record FROM deployments ORDER BY id"):
+                f.write(("," if count else "") + "\n    " + json.dumps(record, indent=2).replace("\n", "\n    "))
+                count += 1
+            f.write("\n  ]\n}" if count else "]\n}")
+        os.replace(path + ".tmp", path)
+        return count
+
+
+def import_registry(json_path=DEPLOYMENTS_PATH, path=REGISTRY_PATH):
+    """
+    Create the registry from a testnet.json file; returns how many records
+    were imported. The database is built under a temporary name next to
+    `path` and renamed into place only once the import has succeeded, so a
+    failed import leaves no registry behind and the scripts stay on
+    testnet.json.
+    """
+    fd, tmp_path = tempfile.mkstemp(prefix=".registry-", suffix=".db", dir=os.path.dirname(path) or ".")
+    os.close(fd)
+    try:
+        registry = DeploymentRegistry(tmp_path)
+        try:
+            count = registry.import_json(json_path)
+        finally:
+            registry.close()
+        os.replace(tmp_path, path)
+    except BaseException:
+        for leftover in (tmp_path, tmp_path + "-wal", tmp_path + "-shm"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        raise
+    return count
+
+
+# ----- backend choice for the scripts -----
+def read_json(path=DEPLOYMENTS_PATH):
+    """Contents of a testnet.json file, {} if it is missing or unreadable"""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        try:
+            return json.load(f)
+        except json.JSONDecodeError:
+            return {}
+
+
+def registry_enabled():
+    """Whether deployments live in the SQLite registry rather than testnet.json"""
+    return os.path.exists(REGISTRY_PATH)
+
+
+@contextmanager
+def _deployments_lock():
+    """Exclusive lock for rewriting testnet.json (POSIX only, a no-op elsewhere)"""
+    if fcntl is None:
+        yield
+        return
+    with open(DEPLOYMENTS_LOCK_PATH, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def append_deployments(records):
+    """
+    Record deployments in the registry, or append them to testnet.json.
+
+    The testnet.json fallback rewrites the whole file. On POSIX writers take
+    a lock file first; on Windows concurrent deployers can still overwrite
+    each other's records there, so import the registry before deploying from
+    several processes at once.
+    """
+    if registry_enabled():
+        registry = DeploymentRegistry()
+        try:
+            registry.append(records)
+        finally:
+            registry.close()
+        return
+
+    with _deployments_lock():
+        data = read_json(DEPLOYMENTS_PATH)
+        if "deployments" not in data:
+            data["network"] = NETWORK_NAME
+            data["deployments"] = []
+        data["deployments"].extend(records)
+        # Written aside under a name of its own and swapped in, so a reader
+        # never sees half a file
+        fd, tmp_path = tempfile.mkstemp(prefix=".testnet-", suffix=".json",
+                                        dir=os.path.dirname(DEPLOYMENTS_PATH))
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, indent=2)
+            os.chmod(tmp_path, 0o644)  # mkstemp creates it owner-only
+            os.replace(tmp_path, DEPLOYMENTS_PATH)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def latest_deployments(contract):
+    """Records of one contract type, newest first (a generator)"""
+    if registry_enabled():
+        registry = DeploymentRegistry()
+        try:
+            yield from registry.latest(contract)
+        finally:
+            registry.close()
+        return
+    for deployment in reversed(read_json(DEPLOYMENTS_PATH).get("deployments", [])):
+        if deployment["contract"] == contract:
+            yield deployment
+
+
+def latest_deployment(contract):
+    """Newest record of one contract type, or None"""
+    return next(latest_deployments(contract), None)
+
+
+def main():
+    commands = {"import": (1, 2), "export": (1, 2), "show": (2, 2), "seller": (2, 2),
+                "condition": (3, 3), "between": (3, 3)}
+    if len(sys.argv) < 2 or sys.argv[1] not in commands \
+            or not commands[sys.argv[1]][0] <= len(sys.argv) - 1 <= commands[sys.argv[1]][1]:
+        print(__doc__.split("\n\n")[1])
+        sys.exit(1)
+    command, args = sys.argv[1], sys.argv[2:]
+
+    if command == "import" and registry_enabled():
+        print(f"❌ {REGISTRY_PATH} already exists; remove it first to import again")
+        sys.exit(1)
+    if command != "import" and not registry_enabled():
+        print(f"❌ No registry at {REGISTRY_PATH} (run: python scripts/deploymentRegistry.py import)")
+        sys.exit(1)
+
+    if command == "import":
+        path = args[0] if args else DEPLOYMENTS_PATH
+        try:
+            count = import_registry(path)
+        except (OSError, ValueError) as e:
+            print(f"❌ Cannot import {path}: {e}")
+            sys.exit(1)
+        print(f"✅ Imported {count} deployment(s) from {path} into {REGISTRY_PATH}")
+        print("Deployments are now recorded in the registry; export to get testnet.json back")
+        return
+
+    registry = DeploymentRegistry()
+    try:
+        if command == "export":
+            path = args[0] if args else DEPLOYMENTS_PATH
+            print(f"✅ Exported {registry.export_json(path)} deployment(s) to {path}")
+            return
+        if command == "show":
+            records = registry.find_address(args[0])
+        elif command == "seller":
+            records = registry.find_seller(args[0])
+        elif command == "condition":
+            records = registry.find_condition(args[0], int(args[1]))
+        else:
+            records = registry.between(args[0], args[1])
+        print(f"📋 {len(records)} deployment(s)")
+        for record in records:
+            print(json.dumps(record, indent=2))
+    finally:
+        registry.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Python helpers for contracts/EscrowFactory.vy
+Escrows created by the factory are EIP-1167 minimal proxies of one deployed
+Escrow: each creation sends a few hundred bytes of calldata instead of the
+full Escrow bytecode, and costs a fraction of the gas.
+
+Deploy once per network and record it (in testnet.json, or the registry):
+    python scripts/escrowFactory.py deploy
+deploy.py (single and --manifest) then creates escrows through the latest
+recorded factory; pass --no-factory to deploy the full bytecode instead.
+"""
+
+import sys
+import getpass
+from datetime import datetime, timezone
+from web3 import Web3
+from web3.logs import DISCARD
+
+from nonceManager import NonceManager
+from contractCache import load_abi
+from deploymentRegistry import append_deployments, latest_deployments
+
+GANACHE_URL = "http://127.0.0.1:8545"
+ESCROW_ABI_PATH = "contracts/Escrow.abi"
+ESCROW_BIN_PATH = "contracts/Escrow.bin"
+FACTORY_ABI_PATH = "contracts/EscrowFactory.abi"
+FACTORY_BIN_PATH = "contracts/EscrowFactory.bin"
+
+CREATE_ESCROW_GAS = 400000  # proxy + Escrow.initialize() storage writes, with headroom
+
+
+def load_factory(w3, address):
+    """Contract instance for a deployed EscrowFactory"""
+    return w3.eth.contract(address=address, abi=load_abi(FACTORY_ABI_PATH))
+
+
+def deploy_factory(w3, private_key):
+    """
+    Deploy the Escrow implementation every proxy delegates to, then the
+    factory pointing at it. The implementation is an ordinary Escrow set up
+    by its constructor (so it can never be initialized as a proxy would be)
+    and is not used as an escrow itself.
+
+    Returns: (factory address, implementation address, factory tx hash)
+    """
+    deployer = w3.eth.account.from_key(private_key).address
+    with open(ESCROW_BIN_PATH) as f:
+        escrow_bytecode = f.read().strip()
+    with open(FACTORY_BIN_PATH) as f:
+        factory_bytecode = f.read().strip()
+
+    nonces = NonceManager(w3)
+    tx_params = {"from": deployer, "gas": 4000000, "gasPrice": w3.to_wei("20", "gwei")}
+    escrow = w3.eth.contract(abi=load_abi(ESCROW_ABI_PATH), bytecode=escrow_bytecode)
+    tx_hash, _ = nonces.send(escrow.constructor(deployer, 0, Web3.to_checksum_address("0x" + "00" * 20), 0, deployer),
+                             tx_params, private_key)
+    receipt = nonces.wait(tx_hash)
+    assert receipt.status == 1, "Escrow implementation deployment failed"
+    implementation = receipt.contractAddress
+
+    factory = w3.eth.contract(abi=load_abi(FACTORY_ABI_PATH), bytecode=factory_bytecode)
+    tx_hash, _ = nonces.send(factory.constructor(implementation), tx_params, private_key)
+    receipt = nonces.wait(tx_hash)
+    assert receipt.status == 1, "EscrowFactory deployment failed"
+    return receipt.contractAddress, implementation, tx_hash
+
+
+def create_escrow_call(factory, seller, timeout, condition_verifier, condition_id, beneficiary):
+    """create_escrow() call for NonceManager.send / build_transaction; the sender becomes the buyer"""
+    return factory.functions.create_escrow(seller, timeout, condition_verifier, condition_id, beneficiary)
+
+
+def escrow_from_receipt(factory, receipt):
+    """Address of the escrow created in a create_escrow() receipt, or None"""
+    created = factory.events.EscrowCreated().process_receipt(receipt, errors=DISCARD)  # skip the proxy's own logs
+    return created[0]['args']['escrow'] if created else None
+
+
+def record_deployment(address, implementation, tx_hash, deployer):
+    """Record the EscrowFactory deployment"""
+    timestamp = datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+    append_deployments([{
+        "contract": "EscrowFactory",
+        "address": address,
+        "implementation": implementation,
+        "txHash": tx_hash.hex(),
+        "deployer": deployer,
+        "timestamp": timestamp,
+        "constructorArgs": [implementation]
+    }])
+
+
+def latest_factory_address(w3):
+    """
+    Address of the most recently recorded EscrowFactory that still has code
+    on this chain, or None. A record whose contract is gone (a restarted
+    local chain) is ignored: create_escrow() sent there would succeed
+    without creating anything.
+    """
+    for deployment in latest_deployments("EscrowFactory"):
+        if w3.eth.get_code(deployment["address"]):
+            return deployment["address"]
+    return None
+
+
+def main():
+    if len(sys.argv) != 2 or sys.argv[1] != "deploy":
+        print("Usage: python scripts/escrowFactory.py deploy")
+        sys.exit(1)
+
+    w3 = Web3(Web3.HTTPProvider(GANACHE_URL))
+    assert w3.is_connected(), "Web3 not connected to Ganache!"
+
+    private_key = getpass.getpass(prompt="Enter deployer private key: ")
+    address, implementation, tx_hash = deploy_factory(w3, private_key)
+    record_deployment(address, implementation, tx_hash, w3.eth.account.from_key(private_key).address)
+    print(f"Escrow implementation deployed at: {implementation}")
+    print(f"EscrowFactory deployed at: {address}")
+    print("Deployment recorded")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+EIP-1559 fee strategy for keeper transactions
+Fees come from eth_feeHistory (cached for a few seconds, so a burst of
+releases costs one request) and can be bumped for same-nonce replacement of
+a transaction that is not getting mined. Chains without a base fee fall back
+to legacy gasPrice. AsyncFeeStrategy does the same for AsyncWeb3.
+"""
+
+import time
+
+FEE_HISTORY_BLOCKS = 10  # blocks of history per eth_feeHistory request
+REWARD_PERCENTILE = 50  # priority fee percentile paid by recent transactions
+FEE_CACHE_SECONDS = 3
+MIN_PRIORITY_FEE = 10**9  # 1 gwei
+MAX_FEE_PER_GAS = 500 * 10**9  # never bid above 500 gwei, however often a tx is bumped
+BUMP_PERCENT = 125  # nodes want >= +10% on both fees to accept a replacement
+
+
+class FeeStrategy:
+    def __init__(self, w3, max_fee_per_gas=MAX_FEE_PER_GAS):
+        self.w3 = w3
+        self.max_fee_per_gas = max_fee_per_gas
+        self._cached = None
+        self._cached_at = 0
+
+    def current(self):
+        """
+        Fee fields for a new transaction: maxFeePerGas/maxPriorityFeePerGas,
+        or gasPrice on a pre-London chain
+        """
+        if self._stale():
+            history = self.w3.eth.fee_history(FEE_HISTORY_BLOCKS, 'latest', [REWARD_PERCENTILE])
+            fees = self._from_fee_history(history)
+            if fees is None:
+                fees = {'gasPrice': min(self.w3.eth.gas_price, self.max_fee_per_gas)}
+            self._store(fees)
+        return dict(self._cached)
+
+    def bump(self, fees):
+        """
+        Fees for replacing a transaction sent with `fees`: the larger of a
+        BUMP_PERCENT increase and the current market, capped at max_fee_per_gas.
+        Returns None if the cap leaves any field short of the BUMP_PERCENT
+        increase, since nodes reject such a replacement as underpriced.
+        """
+        return self._bumped(fees, self.current())
+
+    def _stale(self):
+        return self._cached is None or time.monotonic() - self._cached_at > FEE_CACHE_SECONDS
+
+    def _store(self, fees):
+        self._cached = fees
+        self._cached_at = time.monotonic()
+
+    def _bumped(self, fees, market):
+        required = {field: value * BUMP_PERCENT // 100 + 1 for field, value in fees.items()}
+        bumped = {
+            field: min(max(required[field], market.get(field, 0)), self.max_fee_per_gas)
+            for field in fees
+        }
+        if 'maxPriorityFeePerGas' in bumped:
+            bumped['maxPriorityFeePerGas'] = min(bumped['maxPriorityFeePerGas'], bumped['maxFeePerGas'])
+        if any(bumped[field] < required[field] for field in fees):
+            return None
+        return bumped
+
+    def _from_fee_history(self, history):
+        """EIP-1559 fee fields from an eth_feeHistory result, or None without a base fee"""
+        base_fees = history.get('baseFeePerGas') or []
+        if not base_fees or not base_fees[-1]:
+            return None
+
+        rewards = sorted(reward[0] for reward in history.get('reward', []) if reward)
+        tip = rewards[len(rewards) // 2] if rewards else 0
+        tip = max(tip, MIN_PRIORITY_FEE)
+
+        # Room for the base fee to double before the transaction is priced out
+        next_base_fee = base_fees[-1]
+        max_fee = min(2 * next_base_fee + tip, self.max_fee_per_gas)
+        return {'maxFeePerGas': max_fee, 'maxPriorityFeePerGas': min(tip, max_fee)}
+
+
+class AsyncFeeStrategy(FeeStrategy):
+    """FeeStrategy for an AsyncWeb3 instance: current() and bump() are coroutines"""
+
+    async def current(self):
+        if self._stale():
+            history = await self.w3.eth.fee_history(FEE_HISTORY_BLOCKS, 'latest', [REWARD_PERCENTILE])
+            fees = self._from_fee_history(history)
+            if fees is None:
+                fees = {'gasPrice': min(await self.w3.eth.gas_price, self.max_fee_per_gas)}
+            self._store(fees)
+        return dict(self._cached)
+
+    async def bump(self, fees):
+        return self._bumped(fees, await self.current())
@@ -1,10 +1,16 @@
 import os
 import json
+import logging
 from web3 import Web3
 from web3.exceptions import ContractLogicError
 from datetime import datetime
 import sys
 
+from nonceManager import NonceManager
+from receiptTracker import ReceiptTracker
+from structuredLogging import setup_logging
+from deploymentRegistry import latest_deployment
+
 import warnings
 from web3.exceptions import MismatchedABI
 
@@ -14,22 +20,17 @@ warnings.filterwarnings(
     message=".*MismatchedABI.*"
 )
 
-# Load deployment info from testnet.json 
-with open("deployments/testnet.json") as f:
-    data = json.load(f)
-
-# Get the last two deployments (ConditionVerifier + Escrow)
-deployments = data["deployments"]
-escrow_info = None
+log = logging.getLogger("interact")
+setup_logging()
 
 # Find the most recent Escrow and its linked ConditionVerifier
-for deployment in reversed(deployments):
-    if deployment['contract'] == 'Escrow' and escrow_info is None:
-        escrow_info = deployment
-        cv_address = deployment['linkedContracts']['conditionVerifier']
-        condition_id = deployment['linkedContracts']['externalConditionId']
-        required_amount = deployment['linkedContracts']['requiredAmount']
-        beneficiary = deployment['linkedContracts']['beneficiary']
+# (in testnet.json, or the deployment registry once it has been imported)
+escrow_info = latest_deployment('Escrow')
+assert escrow_info is not None, "No Escrow deployment recorded (run scripts/deploy.py first)"
+cv_address = escrow_info['linkedContracts']['conditionVerifier']
+condition_id = escrow_info['linkedContracts']['externalConditionId']
+required_amount = escrow_info['linkedContracts']['requiredAmount']
+beneficiary = escrow_info['linkedContracts']['beneficiary']
 
 escrow_address = escrow_info['address']
 
@@ -44,9 +45,12 @@ with open('contracts/ConditionVerifier.abi') as f:
 w3 = Web3(Web3.HTTPProvider("http://127.0.0.1:8545"))
 assert w3.is_connected(), "Web3 connection failed!"
 
+# Nonces are reserved locally instead of asking the node before every tx
+receipts = ReceiptTracker(w3)
+nonces = NonceManager(w3, receipts=receipts)
+
 # Pick accounts 
 buyer_priv = os.environ.get("BUYER_PRIVATE_KEY") 
-print(buyer_priv)
 seller_priv = os.environ.get("SELLER_PRIVATE_KEY")
 
 buyer = w3.eth.account.from_key(buyer_priv)
@@ -56,9 +60,9 @@ seller = w3.eth.account.from_key(seller_priv)
 escrow = w3.eth.contract(address=escrow_address, abi=escrow_abi)
 condition_verifier = w3.eth.contract(address=cv_address, abi=cv_abi)
 
-print(f"Connected to Escrow: {escrow_address}")
-print(f"Connected to ConditionVerifier: {cv_address}")
-print(f"External Condition ID: {condition_id}")
+log.info("Connected", extra={
+    'escrow': escrow_address, 'condition_verifier': cv_address, 'condition_id': condition_id
+})
 
 ## 🎯 SMART PRE-CHECK (No Ganache bugs!)
 def smart_precheck(contract, function_name, *args, from_addr=None, value=0):
@@ -125,21 +129,18 @@ def decode_revert_reason_raw(revert_data: str) -> str:
 def safe_send_tx(tx_fn, from_key, from_addr, value=0, expect_event=None, gas=500000, **kwargs):
     """Send tx + VALIDATE it actually worked"""
     try:
-        tx = tx_fn().build_transaction({
+        tx_hash, _ = nonces.send(tx_fn(), {
             'from': from_addr,
             'value': value,
-            'nonce': w3.eth.get_transaction_count(from_addr),
             'gas': gas,
             'gasPrice': w3.to_wei('1', 'gwei'),
             **kwargs
-        })
-        
-        signed_tx = w3.eth.account.sign_transaction(tx, from_key)
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+        }, from_key)
+        receipt = nonces.wait(tx_hash)
         
         if receipt.status == 0:
-            return False, "TX REVERTED (status=0)"
+            reason = receipt.get('revertReason')
+            return False, f"TX REVERTED: {reason}" if reason else "TX REVERTED (status=0)"
         
         if expect_event:
             try:
@@ -178,29 +179,24 @@ def get_state():
 def print_state(state_dict=None):
     if state_dict is None:
         state_dict = get_state()
-    print("\n🔍 Current Contract State")
-    print(f"State  (0=Init, 1=Funded): {state_dict['state']}")
-    print(f"Buyer:   {state_dict['buyer']} | Balance: {state_dict['buyer_balance']}")
-    print(f"Seller:  {state_dict['seller']} | Balance: {state_dict['seller_balance']}")
-    print(f"Contract balance: {state_dict['contract_balance']}")
-    print(f"Amount locked: {state_dict['amount_locked']}\n")
+    log.info("Contract state", extra=state_dict)  # state: 0=Init, 1=Funded
 
 def print_all_conditions():
     num = escrow.functions.get_num_conditions().call()
-    print(f"📋 Total Conditions: {num}")
+    conditions = []
     for i in range(num):
         desc, fulfilled = escrow.functions.get_condition(i).call()
-        status = "✅" if fulfilled else "❌"
-        print(f"  {status} [{i}] {desc}")
+        conditions.append({'index': i, 'description': desc, 'fulfilled': fulfilled})
+    log.info("Conditions", extra={'count': num, 'conditions': conditions})
 
 def all_conditions_fulfilled():
     all_fulfilled = escrow.functions.all_conditions_fulfilled().call({
         "from": seller.address
     })
     if all_fulfilled:
-        print("✅ All conditions are fulfilled")
+        log.info("All conditions are fulfilled")
     else:
-        print("❌ Not all conditions are fulfilled. Please check with print_all_conditions()")
+        log.warning("Not all conditions are fulfilled. Please check with print_all_conditions")
 
 def get_events(event_name, tx_hash, contract=None):
     receipt = w3.eth.get_transaction_receipt(tx_hash)
@@ -217,10 +213,10 @@ def get_events(event_name, tx_hash, contract=None):
 """ 🎯 PERFECT WORKFLOWS """
 
 def run_deposit():
-    print("💰 DEPOSIT WORKFLOW")
+    log.info("Deposit workflow")
     success, reason = smart_precheck(escrow, "deposit")
     if not success:
-        print(f"❌ PRE-SIM FAIL deposit: {reason}")
+        log.error("Pre-check failed", extra={'function': "deposit", 'reason': reason})
         print_state()
         return
     
@@ -232,18 +228,19 @@ def run_deposit():
     )
     
     if success:
-        print("✅ DEPOSIT SUCCEEDED!")
+        log.info("Deposit succeeded", extra={
+            'tx_hash': result.transactionHash, 'events': get_events("Deposited", result.transactionHash)
+        })
         print_state()
-        print("Deposited event:", get_events("Deposited", result.transactionHash))
     else:
-        print(f"❌ DEPOSIT FAILED: {result}")
+        log.error("Deposit failed", extra={'error': str(result)})
         print_state()
 
 def add_conditions(description):
-    print("📝 ADD CONDITIONS WORKFLOW")
+    log.info("Add conditions workflow")
     success, reason = smart_precheck(escrow, "add_conditions", description)
     if not success:
-        print(f"❌ PRE-SIM FAIL add_conditions: {reason}")
+        log.error("Pre-check failed", extra={'function': "add_conditions", 'reason': reason})
         print_state()
         return
     
@@ -255,20 +252,22 @@ def add_conditions(description):
     )
     
     if success:
-        print(f"✅ Condition ADDED: '{description}'")
-        print("ConditionAdded event:", get_events("ConditionAdded", result.transactionHash))
+        log.info("Condition added", extra={
+            'description': description, 'tx_hash': result.transactionHash,
+            'events': get_events("ConditionAdded", result.transactionHash)
+        })
     else:
-        print(f"❌ add_conditions FAILED: {result}")
+        log.error("add_conditions failed", extra={'error': str(result)})
         print_state()
 
 def fulfill_conditions(indices):
-    print("✅ FULFILL CONDITIONS WORKFLOW")
+    log.info("Fulfill conditions workflow")
     unique_indices = list(dict.fromkeys(indices))
     
     for idx in unique_indices:
         success, reason = smart_precheck(escrow, "fulfill_condition", idx)
         if not success:
-            print(f"❌ PRE-SIM FAIL fulfill_condition({idx}): {reason}")
+            log.error("Pre-check failed", extra={'function': "fulfill_condition", 'index': idx, 'reason': reason})
             continue
         
         success, result = safe_send_tx(
@@ -278,18 +277,18 @@ def fulfill_conditions(indices):
         )
         
         if success:
-            print(f"✅ Condition {idx} FULFILLED ✓")
+            log.info("Condition fulfilled", extra={'index': idx, 'tx_hash': result.transactionHash})
         else:
-            print(f"❌ fulfill_condition({idx}) FAILED: {result}")
+            log.error("fulfill_condition failed", extra={'index': idx, 'error': str(result)})
     
     print_state()
     print_all_conditions()
 
 def run_release():
-    print("🔓 RELEASE WORKFLOW")
+    log.info("Release workflow")
     success, reason = smart_precheck(escrow, "release")
     if not success:
-        print(f"❌ PRE-SIM FAIL release: {reason}")
+        log.error("Pre-check failed", extra={'function': "release", 'reason': reason})
         print_state()
         return
     
@@ -300,25 +299,26 @@ def run_release():
     )
     
     if success:
-        print("✅ RELEASE SUCCEEDED! 🎉")
+        log.info("Release succeeded", extra={
+            'tx_hash': result.transactionHash, 'events': get_events("Released", result.transactionHash)
+        })
         print_state()
-        print("Released event:", get_events("Released", result.transactionHash))
     else:
-        print(f"❌ RELEASE FAILED: {result}")
+        log.error("Release failed", extra={'error': str(result)})
         print_state()
         print_all_conditions()
 
 def run_incomplete_and_refund():
-    print("💸 REFUND WORKFLOW")
+    log.info("Refund workflow")
     
     # Fast-forward timeout
     w3.provider.make_request("evm_increaseTime", [3601])
     w3.provider.make_request("evm_mine", [])
-    print("⏩ Time advanced past timeout")
+    log.info("Time advanced past timeout")
     
     success, reason = smart_precheck(escrow, "refund")
     if not success:
-        print(f"❌ PRE-SIM FAIL refund: {reason}")
+        log.error("Pre-check failed", extra={'function': "refund", 'reason': reason})
         print_state()
         print_all_conditions()
         return
@@ -330,21 +330,21 @@ def run_incomplete_and_refund():
     )
     
     if success:
-        print("✅ REFUND SUCCEEDED!")
+        log.info("Refund succeeded", extra={'tx_hash': result.transactionHash})
         print_state()
     else:
-        print(f"❌ REFUND FAILED: {result}")
+        log.error("Refund failed", extra={'error': str(result)})
         print_state()
         print_all_conditions()
 
 def deposit_to_verifier():
-    print("🌐 EXTERNAL CONDITION WORKFLOW")
-    print(f"Condition ID: {condition_id}")
-    print(f"Required: Ξ {w3.from_wei(required_amount, 'ether')}")
+    log.info("External condition workflow", extra={
+        'condition_id': condition_id, 'required_ether': str(w3.from_wei(required_amount, 'ether'))
+    })
     
     success, reason = smart_precheck(condition_verifier, "deposit_eth", condition_id)
     if not success:
-        print(f"❌ PRE-SIM FAIL deposit_to_verifier: {reason}")
+        log.error("Pre-check failed", extra={'function': "deposit_to_verifier", 'reason': reason})
         return
     
     success, result = safe_send_tx(
@@ -355,29 +355,26 @@ def deposit_to_verifier():
     )
     
     if success:
-        print("✅ Deposit to verifier SUCCEEDED!")
-        print(f"TX: {result.transactionHash.hex()}")
+        log.info("Deposit to verifier succeeded", extra={'tx_hash': result.transactionHash})
         try:
             events = get_events("ConditionFulfilled", result.transactionHash, condition_verifier)
             if events:
-                print("✅ External condition FULFILLED!")
+                log.info("External condition fulfilled", extra={'condition_id': condition_id})
         except:
             pass
     else:
-        print(f"❌ deposit_to_verifier FAILED: {result}")
+        log.error("deposit_to_verifier failed", extra={'error': str(result)})
 
 def verify_external_condition():
-    print("🔍 EXTERNAL CONDITION CHECK")
-    print(f"Condition ID: {condition_id}")
-    
     fulfilled = condition_verifier.functions.is_condition_fulfilled(condition_id).call()
-    print(f"Direct fulfilled: {fulfilled}")
     
     buyer_addr = escrow.functions.buyer().call()
     verified = condition_verifier.functions.verify_condition_for_parties(
         condition_id, buyer_addr, beneficiary
     ).call()
-    print(f"Verified for escrow parties: {verified}")
+    log.info("External condition check", extra={
+        'condition_id': condition_id, 'fulfilled': fulfilled, 'verified_for_parties': verified
+    })
     
     return verified
 
@@ -426,9 +423,9 @@ def print_complete_audit_trail(escrow_address):
     
     print(f"\nFound {len(logs)} logs:")
     
-    for i, log in enumerate(logs):
+    for i, entry in enumerate(logs):
         try:
-            topics = log['topics']
+            topics = entry['topics']
             if not topics:
                 print(f"[{i:2d}] ❓ NO TOPICS")
                 continue
@@ -437,7 +434,7 @@ def print_complete_audit_trail(escrow_address):
             sig = topics[0].hex()
             event_name = event_sigs.get(sig, "UNKNOWN")
             
-            print(f"[{i:2d}] ✅ {event_name:<20} | Block {log['blockNumber']}")
+            print(f"[{i:2d}] ✅ {event_name:<20} | Block {entry['blockNumber']}")
             print(f"     Sig: {sig[:20]}...")
             
             # Show indexed params
@@ -455,7 +452,7 @@ if __name__ == "__main__":
     tests_to_run = sys.argv[1:] if len(sys.argv) > 1 else []
 
     if not tests_to_run:
-        print("🧪 Running DEFAULT flow: deposit → add → fulfill → release")
+        log.info("Running default flow: deposit, add, fulfill, release")
         run_deposit()
         add_conditions("Delivery confirmed")
         fulfill_conditions([0])
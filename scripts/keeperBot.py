@@ -8,10 +8,31 @@ import os
 import sys
 import json
 import time
+import queue
+import argparse
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, wait as wait_for_futures
 from web3 import Web3
-from datetime import datetime
+from web3.exceptions import BlockNotFound, TransactionNotFound
 import getpass
 
+from keeperStore import KeeperCheckpointStore
+from nonceManager import NonceManager
+from receiptTracker import ReceiptTracker, decode_revert_reason
+from feeStrategy import FeeStrategy
+from contractCache import ContractCache, load_abi
+from keeperMetrics import KeeperMetrics, METRICS_HOST
+from reorgTracker import ReorgTracker
+from refundScheduler import RefundScheduler
+from retryScheduler import RetryScheduler, revert_reason
+from readinessTracker import ReadinessTracker
+from sellerKeystore import prompt_sellers
+from structuredLogging import setup_logging
+from multicall import MULTICALL_ABI_PATH, check_release_ready, not_ready_reason
+from deploymentRegistry import DeploymentRegistry, REGISTRY_PATH, registry_enabled
+
 import warnings
 from web3.exceptions import MismatchedABI
 
@@ -21,241 +42,1024 @@ warnings.filterwarnings(
     message=".*MismatchedABI.*"
 )
 
+log = logging.getLogger("keeperBot")
+
 # Configuration
 GANACHE_URL = "http://127.0.0.1:8545"
 POLL_INTERVAL = 5  # seconds between checks
 DEPLOYMENTS_PATH = "deployments/testnet.json"
+CV_ABI_PATH = "contracts/ConditionVerifier.abi"
+STATE_PATH = "deployments/keeper_state.db"  # SQLite checkpoint store
+CONFIRMATIONS = 0  # blocks an event must be buried under before the keeper acts on it
 
-class EscrowKeeperBot:
-    def __init__(self, seller_private_key):
-        """Initialize the keeper bot with Web3 connection and contract interfaces"""
-        self.w3 = Web3(Web3.HTTPProvider(GANACHE_URL))
-        assert self.w3.is_connected(), "Failed to connect to Ganache!"
-        
-        # Set up seller account (who will call release())
-        self.seller_account = self.w3.eth.account.from_key(seller_private_key)
-        self.seller_address = self.seller_account.address
-        print(f"Keeper bot initialized for seller: {self.seller_address}")
-        
-        # Load deployment data
-        self.deployments = self._load_deployments()
-        
-        # Track which conditions we've already processed
-        self.processed_conditions = set()
-        
-        # Event filters
-        self.filters = {}
-        
-    def _load_deployments(self):
-        """Load deployment data from testnet.json"""
+# Historical backfill (eth_getLogs in adaptive block ranges)
+BACKFILL_INITIAL_RANGE = 2000  # blocks per eth_getLogs request to start with
+BACKFILL_MIN_RANGE = 1
+BACKFILL_MAX_RANGE = 50000
+BACKFILL_SLOW_SECONDS = 2.0  # halve the range when a request takes longer than this
+HISTORY_ADDRESS_BATCH = 500  # escrow addresses per eth_getLogs when reading escrow history
+
+# Release transactions
+RELEASE_GAS = 500000
+RELEASE_BUMP_BLOCKS = 3  # replace a release with higher fees after this many blocks unmined
+RELEASE_WORKERS = 4  # threads sending releases and waiting for their receipts (0: inline)
+RELEASE_QUEUE_SIZE = 256  # releases waiting for a worker; event ingestion blocks when full
+
+
+def load_deployments(deployments=None):
+    """
+    Load deployment data from testnet.json, or from the deployment registry
+    (deployments/registry.db) once it has been imported
+    
+    Pass the result of a previous call to refresh it in place: nothing is
+    done if the file is unchanged, and otherwise only records appended since
+    the last load are indexed (a shorter file triggers a full rebuild). With
+    the registry, only the rows after the last one seen are read.
+    """
+    if registry_enabled():
+        registry = DeploymentRegistry(REGISTRY_PATH)
+        try:
+            last_id = registry.last_id()
+            if deployments is not None and deployments['file_stamp'] == ('registry', last_id):
+                return deployments
+            seen = 0 if deployments is None or last_id < deployments['records_seen'] else deployments['records_seen']
+            new_records = [record for _, record in registry.since(seen)]
+        finally:
+            registry.close()
+        stamp, total = ('registry', last_id), last_id
+    else:
         if not os.path.exists(DEPLOYMENTS_PATH):
             raise FileNotFoundError(f"Deployment file not found: {DEPLOYMENTS_PATH}")
         
+        stat = os.stat(DEPLOYMENTS_PATH)
+        if deployments is not None and deployments['file_stamp'] == (stat.st_mtime_ns, stat.st_size):
+            return deployments
+        
         with open(DEPLOYMENTS_PATH, 'r') as f:
             data = json.load(f)
-        
+        records = data.get('deployments', [])
+        seen = 0 if deployments is None or len(records) < deployments['records_seen'] else deployments['records_seen']
+        new_records = records[seen:]
+        stamp, total = (stat.st_mtime_ns, stat.st_size), len(records)
+    
+    if deployments is None or seen == 0:
         # Extract contract addresses and ABIs
         deployments = {
             'escrow_contracts': [],
-            'condition_verifier': None
+            'condition_verifier': None,  # the most recently recorded one
+            # every verifier recorded or linked to an escrow: address lowercase -> address
+            'verifiers': {},
+            'multicall': None,  # EscrowMulticall address, if deployed
+            # (verifier address lowercase, condition_id) -> [escrow records]
+            'by_condition': {},
+            # escrow address lowercase -> escrow record (the latest, if recorded twice)
+            'by_address': {},
+            'records_seen': 0,
         }
+    deployments['file_stamp'] = stamp
+    
+    new_escrows = 0
+    for deployment in new_records:
+        if deployment['contract'] == 'ConditionVerifier':
+            deployments['condition_verifier'] = {
+                'address': deployment['address'],
+                'abi': load_abi(CV_ABI_PATH)
+            }
+            deployments['verifiers'][deployment['address'].lower()] = deployment['address']
+        elif deployment['contract'] == 'EscrowMulticall':
+            deployments['multicall'] = deployment['address']
+        elif deployment['contract'] == 'Escrow':
+            escrow = {
+                'address': deployment['address'],
+                'buyer': deployment.get('deployer'),  # the deployer funds the escrow
+                'seller': deployment['seller'],
+                'condition_id': deployment['linkedContracts']['externalConditionId'],
+                'condition_verifier': deployment['linkedContracts']['conditionVerifier'],
+                'block': deployment.get('blockNumber'),  # deployment block (None in older records)
+                'abi': load_abi('contracts/Escrow.abi')
+            }
+            deployments['escrow_contracts'].append(escrow)
+            key = (escrow['condition_verifier'].lower(), escrow['condition_id'])
+            deployments['by_condition'].setdefault(key, []).append(escrow)
+            deployments['by_address'][escrow['address'].lower()] = escrow
+            if int(escrow['condition_verifier'], 16) != 0:
+                deployments['verifiers'][key[0]] = escrow['condition_verifier']
+            new_escrows += 1
+    deployments['records_seen'] = total
+    
+    log.info("Loaded deployments", extra={
+        'new_escrows': new_escrows,
+        'escrows': len(deployments['escrow_contracts']),
+        'verifiers': len(deployments['verifiers'])
+    })
+    
+    return deployments
+
+
+def find_escrows(deployments, verifier_address, condition_id):
+    """Escrow records linked to condition_id on the given ConditionVerifier"""
+    return deployments['by_condition'].get((verifier_address.lower(), condition_id), [])
+
+
+def find_escrow(deployments, escrow_address):
+    """Escrow record of escrow_address, or None if it is not in the deployments"""
+    return deployments['by_address'].get(escrow_address.lower())
+
+
+def format_fees(fees):
+    """Human-readable fee fields in gwei"""
+    return ", ".join(f"{field}={Web3.from_wei(value, 'gwei')} gwei" for field, value in fees.items())
+
+
+def resize_log_range(size, elapsed=None):
+    """
+    Next eth_getLogs block range after a request that took `elapsed` seconds
+    (None if the node rejected it). Halves on errors and slow answers,
+    doubles while answers are fast.
+    """
+    if elapsed is None or elapsed > BACKFILL_SLOW_SECONDS:
+        return max(BACKFILL_MIN_RANGE, size // 2)
+    if elapsed < BACKFILL_SLOW_SECONDS / 4:
+        return min(BACKFILL_MAX_RANGE, size * 2)
+    return size
+
+
+class EscrowKeeperBot:
+    def __init__(self, seller_private_key, start_block=None, state_path=STATE_PATH, metrics=None,
+                 confirmations=CONFIRMATIONS, buyer_private_key=None, release_workers=RELEASE_WORKERS,
+                 provider=None):
+        """Initialize the keeper bot with Web3 connection and contract interfaces
+
+        seller_private_key: the seller's private key, or a list of keys or
+        accounts (see sellerKeystore.load_keystore) to release the escrows of
+        several sellers; each seller signs on its own nonce lane
+        start_block: if set, ConditionFulfilled events from this block onwards
+        are backfilled before live tailing starts. Otherwise the bot resumes
+        from the checkpoint in state_path, if there is one.
+        confirmations: only act on events at least this many blocks deep;
+        events from blocks later orphaned by a reorg are retracted either way
+        buyer_private_key: if set, also refund this buyer's escrows once their
+        timeout passes with conditions unmet
+        release_workers: threads executing releases off the release queue;
+        0 runs each release inline during ingestion
+        metrics: KeeperMetrics to record into (default: a private one);
+        serve it with metrics.serve(port)
+        provider: web3 provider to talk to (default: HTTP at GANACHE_URL)
+        """
+        self.metrics = metrics or KeeperMetrics()
+        self.w3 = Web3(provider or Web3.HTTPProvider(GANACHE_URL))
+        self.w3.middleware_onion.add(self.metrics.middleware(), name='metrics')
+        assert self.w3.is_connected(), "Failed to connect to Ganache!"
         
-        for deployment in data.get('deployments', []):
-            if deployment['contract'] == 'ConditionVerifier':
-                deployments['condition_verifier'] = {
-                    'address': deployment['address'],
-                    'abi': self._load_abi('contracts/ConditionVerifier.abi')
-                }
-            elif deployment['contract'] == 'Escrow':
-                deployments['escrow_contracts'].append({
-                    'address': deployment['address'],
-                    'seller': deployment['seller'],
-                    'condition_id': deployment['linkedContracts']['externalConditionId'],
-                    'condition_verifier': deployment['linkedContracts']['conditionVerifier'],
-                    'abi': self._load_abi('contracts/Escrow.abi')
-                })
+        # Set up seller accounts (who will call release()): one signing lane
+        # each, so sellers send in parallel while each one's nonces stay in order
+        keys = seller_private_key if isinstance(seller_private_key, (list, tuple)) else [seller_private_key]
+        self.lanes = {}  # seller address lowercase -> {'account', 'lock'}
+        for key in keys:
+            account = key if hasattr(key, 'key') else self.w3.eth.account.from_key(key)
+            self.lanes[account.address.lower()] = {'account': account, 'lock': threading.Lock()}
+        self.receipts = ReceiptTracker(self.w3)
+        self.nonces = NonceManager(self.w3, receipts=self.receipts)
+        self.fees = FeeStrategy(self.w3)
+        self.contracts = ContractCache(self.w3)
+        sellers = [lane['account'].address for lane in self.lanes.values()]
+        log.info("Keeper bot initialized", extra={'sellers': sellers})
+        
+        # Load deployment data
+        self.deployments = load_deployments()
+        
+        # Refund deadlines of the buyer's escrows (optional)
+        self.refunds = None
+        if buyer_private_key:
+            buyer_account = self.w3.eth.account.from_key(buyer_private_key)
+            self.refunds = RefundScheduler(self.w3, buyer_account, self.nonces, self.fees, self.contracts)
+            log.info("Refunds enabled", extra={'buyer': buyer_account.address})
+        
+        # Recent block hashes, to notice reorgs
+        self.confirmations = confirmations
+        self.recent_blocks = ReorgTracker()
+        
+        # Durable progress (last block, handled logs, in-flight releases)
+        self.store = self.open_store(state_path)
+        # Conditions already processed: one bitmap per verifier, restored from the store
+        self.processed_conditions = self.store.processed_conditions()
+        # Release readiness per escrow, kept from its events
+        self.readiness = self.open_readiness()
+        self.inflight_escrows = {}  # escrow address (lowercase) -> release tx hash
+        self.metrics.inflight.set_function(lambda: len(self.inflight_escrows))
+        
+        # Release execution, decoupled from event ingestion
+        self.release_queue = queue.Queue(maxsize=RELEASE_QUEUE_SIZE)
+        self.jobs_lock = threading.Lock()
+        self.open_blocks = Counter()  # block -> releases queued or running for its events
+        self.open_logs = Counter()  # (tx hash, log index) -> releases queued or running for it
+        self.release_error = None  # first exception a worker raised, see wait_for_releases()
+        self.metrics.queue_depth.set_function(self.release_queue.qsize)
+        self.workers = [
+            threading.Thread(target=self.release_worker, name=f"release-{i}", daemon=True)
+            for i in range(release_workers)
+        ]
+        for worker in self.workers:
+            worker.start()
         
-        print(f"\nLoaded {len(deployments['escrow_contracts'])} escrow contract(s)")
-        if deployments['condition_verifier']:
-            print(f"ConditionVerifier: {deployments['condition_verifier']['address']}")
+        # Failed releases, retried with backoff on a thread of their own
+        self.retries = RetryScheduler(self.store, self.run_retry, self.metrics)
+        self.retries.start()
         
-        return deployments
+        # Backfill state
+        checkpoint = self.store.last_block()
+        if start_block is None and checkpoint is not None:
+            start_block = checkpoint + 1
+            log.info("Resuming from checkpoint", extra={'block': checkpoint})
+        self.start_block = start_block
+        self.backfill_range = BACKFILL_INITIAL_RANGE
+        self.last_block = checkpoint  # last block whose events have been handled
+        
+    def open_store(self, state_path):
+        """Checkpoint store for this bot (overridden by the sharded keeper)"""
+        return KeeperCheckpointStore(state_path)
+    
+    def open_readiness(self):
+        """Readiness tracker saving its records in the store, restored up to the checkpoint"""
+        return ReadinessTracker(self.w3, load_abi('contracts/Escrow.abi'), self.store, self.store.last_block())
+    
+    def _fulfilled_event(self):
+        """ConditionFulfilled of the ConditionVerifier ABI (decodes logs of any verifier)"""
+        return self.w3.eth.contract(abi=load_abi(CV_ABI_PATH)).events.ConditionFulfilled()
     
-    def _load_abi(self, path):
-        """Load ABI from file"""
-        with open(path, 'r') as f:
-            return json.load(f)
+    def safe_head(self):
+        """Newest block with enough confirmations to act on"""
+        return self.w3.eth.block_number - self.confirmations
     
-    def setup_event_filters(self):
-        """Set up event filters for monitoring"""
-        cv_address = self.deployments['condition_verifier']['address']
-        cv_abi = self.deployments['condition_verifier']['abi']
+    def canonical_hash(self, block_number):
+        """Hash of the canonical block at block_number (None past the head)"""
+        try:
+            return self.w3.eth.get_block(block_number)['hash']
+        except BlockNotFound:
+            return None
+    
+    def check_for_reorg(self):
+        """
+        Compare the last handled blocks with the canonical chain. After a
+        reorg, the logs handled from orphaned blocks are unmarked and the
+        checkpoint moves back to the fork, so the next scan re-processes
+        that range from the canonical chain. Returns the fork block, or None.
+        """
+        reorg = self.recent_blocks.find_fork(self.canonical_hash)
+        if reorg is None:
+            return None
         
-        # Create contract instance
-        cv_contract = self.w3.eth.contract(address=cv_address, abi=cv_abi)
+        fork_block, retracted = reorg
+        # Let queued releases finish first, so none marks a retracted event handled afterwards
+        self.release_queue.join()
+        log.warning("Chain reorganisation, rescanning from the fork", extra={
+            'fork_block': fork_block, 'retracted_events': len(retracted)
+        })
+        for tx_hash, log_index, condition in retracted:
+            self.store.unmark_processed(tx_hash, log_index, condition)
+            self.processed_conditions.discard(*condition)
+        self.readiness.rewind(fork_block)
+        if self.last_block is not None and self.last_block > fork_block:
+            self.last_block = fork_block
+            self.store.set_last_block(fork_block)
+        self.metrics.reorgs.inc()
+        return fork_block
+
+    def fetch_logs(self, from_block, to_block, query):
+        """
+        Yield (range_end, logs) for an eth_getLogs query (address/topics)
+        over [from_block, to_block] in bounded block ranges.
         
-        # Filter for ConditionFulfilled events
-        # Changed: fromBlock -> from_block
-        self.filters['condition_fulfilled'] = cv_contract.events.ConditionFulfilled.create_filter(
-            from_block='latest'  # ← Changed from fromBlock
-        )
+        The range halves when the node rejects a request (too many results,
+        range limit, timeout) or answers slowly, and doubles again while
+        requests come back quickly, so the scan settles on the largest range
+        the node is happy to serve.
+        """
+        start = from_block
+        while start <= to_block:
+            end = min(start + self.backfill_range - 1, to_block)
+            began = time.monotonic()
+            try:
+                logs = self.w3.eth.get_logs({**query, 'fromBlock': start, 'toBlock': end})
+            except Exception as e:
+                if self.backfill_range <= BACKFILL_MIN_RANGE:
+                    raise
+                self.backfill_range = resize_log_range(self.backfill_range)
+                log.warning("eth_getLogs failed, shrinking the block range", extra={
+                    'from_block': start, 'to_block': end, 'error': str(e), 'block_range': self.backfill_range
+                })
+                continue
+            
+            self.backfill_range = resize_log_range(self.backfill_range, time.monotonic() - began)
+            
+            yield end, logs
+            start = end + 1
+
+    def fetch_fulfilled_logs(self, from_block, to_block):
+        """
+        Yield (range_end, events) for [from_block, to_block]: the
+        ConditionFulfilled events of every known verifier and the Escrow
+        events readiness depends on, in chain order, from one eth_getLogs
+        request per range.
+        """
+        event_abi = self._fulfilled_event()
+        self.sync_readiness(from_block - 1)
         
-        print(f"\n✓ Event filters set up")
-        print(f"  Monitoring: ConditionFulfilled events from {cv_address}")
+        # Filtered by topic only: an address list would grow with every
+        # escrow, so logs of unknown contracts are dropped here instead
+        query = {'topics': [[event_abi.topic, *self.readiness.topics]]}
+        for range_end, logs in self.fetch_logs(from_block, to_block, query):
+            events = []
+            verifiers = self.deployments['verifiers']
+            for entry in logs:
+                if entry['address'].lower() in verifiers:
+                    events.append(event_abi.process_log(entry))
+                elif entry['address'] in self.readiness:
+                    events.append(self.readiness.decode(entry))
+            yield range_end, events
+
+    def sync_readiness(self, to_block):
+        """
+        Start readiness records for escrows deployed since the last call (or
+        forgotten after a reorg). Records saved by an earlier run are
+        restored; the other escrows have their history replayed up to
+        to_block: their own events and their verifiers' ConditionFulfilled
+        events for their conditions, read together. Nothing is released for
+        history; the scans that follow pick up from to_block + 1.
+        """
+        untracked = [escrow for escrow in self.deployments['escrow_contracts']
+                     if escrow['address'] not in self.readiness]
+        if not untracked:
+            return
+        new = [escrow for escrow in untracked if not self.readiness.track(escrow)]
+        if len(new) < len(untracked):
+            log.info("Restored escrow readiness", extra={'escrows': len(untracked) - len(new)})
+        if not new:
+            return
+        unknown = sum(1 for escrow in new if escrow['block'] is None)
+        if unknown:
+            log.warning("Escrow records without a deployment block, reading their history from block 0", extra={
+                'escrows': unknown
+            })
+        from_block = min(escrow['block'] or 0 for escrow in new)
+        if to_block < from_block:
+            return
+        
+        event_abi = self._fulfilled_event()
+        conditions = {(escrow['condition_verifier'].lower(), escrow['condition_id']) for escrow in new}
+        verifiers = sorted({self.deployments['verifiers'][verifier] for verifier, _ in conditions
+                            if verifier in self.deployments['verifiers']})
+        events = []
+        for i in range(0, len(new), HISTORY_ADDRESS_BATCH):
+            # Their verifiers ride along with the first batch of escrows
+            addresses = [escrow['address'] for escrow in new[i:i + HISTORY_ADDRESS_BATCH]]
+            query = {
+                'address': addresses + (verifiers if i == 0 else []),
+                'topics': [[event_abi.topic, *self.readiness.topics] if i == 0 else self.readiness.topics]
+            }
+            for _, logs in self.fetch_logs(from_block, to_block, query):
+                for entry in logs:
+                    if entry['address'] in self.readiness:
+                        events.append(self.readiness.decode(entry))
+                        continue
+                    event = event_abi.process_log(entry)
+                    if (entry['address'].lower(), event['args']['condition_id']) in conditions:
+                        events.append(event)
+        
+        events.sort(key=lambda event: (event['blockNumber'], event['logIndex']))
+        for event in events:
+            if event['address'] in self.readiness:
+                self.readiness.apply(event)
+            else:
+                self.note_fulfilled(event)
+        log.info("Read escrow history", extra={'escrows': len(new), 'to_block': to_block, 'events': len(events)})
+
+    def backfill(self, from_block, to_block):
+        """Process historical ConditionFulfilled events between two blocks"""
+        if from_block > to_block:
+            return
+        
+        log.info("Backfilling", extra={'from_block': from_block, 'to_block': to_block})
+        began = time.monotonic()
+        total = 0
+        
+        # Hash taken before the scan: a reorg racing it shows up next cycle
+        to_hash = self.canonical_hash(to_block)
+        for range_end, events in self.fetch_fulfilled_logs(from_block, to_block):
+            self.handle_fulfilled_events(events)
+            total += len(events)
+            self.last_block = range_end
+            self.store.set_last_block(self.checkpoint_block())
+            self.store.flush()
+        if to_hash is not None:
+            self.recent_blocks.record(to_block, to_hash)
+        
+        log.info("Backfill complete", extra={'events': total, 'seconds': round(time.monotonic() - began, 3)})
 
     def check_new_fulfilled_conditions(self):
         """Check for new ConditionFulfilled events"""
+        began = time.monotonic()
         try:
-            events = self.filters['condition_fulfilled'].get_new_entries()
+            # Pick up escrows deployed since the last cycle
+            self.deployments = load_deployments(self.deployments)
+            
+            self.check_for_reorg()
+            head = self.safe_head()
+            if self.last_block is None:
+                # Fresh start without a checkpoint: tail from the current head
+                self.last_block = head
+            from_block = self.last_block + 1
+            
+            # Everything between the checkpoint and the confirmed head
+            if head >= from_block:
+                head_hash = self.canonical_hash(head)
+                for range_end, events in self.fetch_fulfilled_logs(from_block, head):
+                    self.handle_fulfilled_events(events)
+                    self.last_block = range_end
+                if head_hash is not None:
+                    self.recent_blocks.record(head, head_hash)
+                self.metrics.last_block.set(head)
             
-            for event in events:
-                condition_id = event['args']['condition_id']
+            # Deadlines pass with or without new blocks
+            if self.refunds is not None:
+                self.check_refunds(from_block, head)
                 
-                # Skip if already processed
-                if condition_id in self.processed_conditions:
+        except Exception as e:
+            log.error("Error checking events", exc_info=True)
+        finally:
+            # One SQLite transaction per poll cycle
+            if self.last_block is not None:
+                self.store.set_last_block(self.checkpoint_block())
+            self.store.flush()
+            self.metrics.poll_duration.observe(time.monotonic() - began)
+    
+    def check_refunds(self, from_block, to_block):
+        """Update refund deadlines from [from_block, to_block], then refund what is due"""
+        self.refunds.track(self.deployments)
+        self.refunds.scan(from_block, to_block)
+        self.refunds.sync_clock(self.w3.eth.get_block('latest')['timestamp'])
+        self.refunds.settle()
+        self.refunds.run_due()
+    
+    def sleep_interval(self):
+        """POLL_INTERVAL, or less if a refund deadline passes sooner"""
+        until_due = self.refunds.seconds_until_due() if self.refunds is not None else None
+        if until_due is None:
+            return POLL_INTERVAL
+        return min(POLL_INTERVAL, until_due)
+    
+    def note_fulfilled(self, event):
+        """Meet the external condition of the escrows linked to a ConditionFulfilled event; returns those now ready"""
+        return [
+            escrow for escrow in find_escrows(self.deployments, event['address'], event['args']['condition_id'])
+            if self.readiness.set_external(escrow['address'], event)
+        ]
+    
+    def owns(self, escrow, block_number):
+        """Whether this keeper releases escrow for an event in block_number (the sharded keeper narrows it)"""
+        return True
+    
+    def handle_fulfilled_events(self, events):
+        """
+        Fold a batch of events (see fetch_fulfilled_logs) into the readiness
+        records and queue a release for every escrow that became ready: a
+        ConditionFulfilled from the verifier meets the external condition of
+        the escrows linked to it, Escrow events track their deposit and
+        internal conditions. Releases run on the worker threads; this only
+        waits when the release queue is full.
+        """
+        jobs = []
+        
+        for event in events:
+            if event['address'] in self.readiness:
+                escrow = self.readiness.apply(event)
+                if escrow is not None and self.owns(escrow, event['blockNumber']):
+                    log.info("Escrow ready", extra={
+                        'escrow': escrow['address'], 'last_event': event['event'], 'block': event['blockNumber']
+                    })
+                    jobs.append({'escrow': escrow, 'condition_id': escrow['condition_id'],
+                                 'block': event['blockNumber'], 'log': None, 'fulfilled_at': None})
+                continue
+            
+            condition_id = event['args']['condition_id']
+            condition = (event['address'], condition_id)
+            ready = self.note_fulfilled(event)
+            
+            # Skip if already processed (this run, or before a restart)
+            if condition in self.processed_conditions:
+                continue
+            if self.store.is_processed(event['transactionHash'], event['logIndex']):
+                # Handled before the store kept bitmaps
+                self.processed_conditions.add(*condition)
+                self.store.mark_processed(event['transactionHash'], event['logIndex'], condition)
+                continue
+            
+            self.metrics.events.inc()
+            log.info("ConditionFulfilled", extra={
+                'verifier': event['address'], 'condition_id': condition_id, 'block': event['blockNumber']
+            })
+            
+            # Find matching escrow contract(s)
+            matching_escrows = find_escrows(self.deployments, event['address'], condition_id)
+            
+            if matching_escrows:
+                jobs.extend({
+                    'escrow': escrow, 'condition_id': condition_id, 'block': event['blockNumber'],
+                    'log': (event['transactionHash'], event['logIndex'], condition),
+                    'fulfilled_at': (event['blockNumber'], event['args']['timestamp'])
+                } for escrow in ready)
+                if len(ready) < len(matching_escrows):
+                    log.info("Linked escrows not ready yet, released once they are", extra={
+                        'condition_id': condition_id, 'waiting': len(matching_escrows) - len(ready)
+                    })
+            else:
+                log.warning("No matching escrow", extra={'condition_id': condition_id})
+            
+            # Mark as processed (once its releases have run, if it has any)
+            self.processed_conditions.add(*condition)
+            if not ready:
+                self.store.mark_processed(event['transactionHash'], event['logIndex'], condition)
+            self.recent_blocks.record(
+                event['blockNumber'], event['blockHash'],
+                (event['transactionHash'], event['logIndex'], condition)
+            )
+        
+        # One eth_call screens the whole batch instead of state() + a
+        # simulated release() per escrow
+        statuses = self.prescreen([job['escrow']['address'] for job in jobs])
+        
+        for job in jobs:
+            self.open_job(job)
+        for queued, job in enumerate(jobs):
+            try:
+                job['prescreened'] = statuses is not None
+                status = statuses.get(job['escrow']['address'].lower()) if statuses is not None else None
+                if statuses is not None and not (status and status['ready']):
+                    self.reject_prescreened(job, status)
+                    self.finish_job(job)
                     continue
-                
-                print(f"\n🔔 NEW EVENT: ConditionFulfilled")
-                print(f"   Condition ID: {condition_id}")
-                print(f"   Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-                
-                # Find matching escrow contract(s)
-                matching_escrows = [
-                    escrow for escrow in self.deployments['escrow_contracts']
-                    if escrow['condition_id'] == condition_id
-                ]
-                
-                if matching_escrows:
-                    for escrow in matching_escrows:
-                        self.attempt_release(escrow, condition_id)
-                else:
-                    print(f"   ⚠️  No matching escrow found for condition {condition_id}")
-                
-                # Mark as processed
-                self.processed_conditions.add(condition_id)
-                
+                self.enqueue_release(job)
+            except BaseException:
+                # Inline release failed (e.g. LeaseLost): the rest are not run
+                for abandoned in jobs[queued + 1:]:
+                    self.finish_job(abandoned, handled=False)
+                raise
+    
+    # ----- release execution -----
+    def enqueue_release(self, job):
+        """
+        Hand a release job to the workers. Blocks while the queue is full, so
+        an event storm holds ingestion back instead of growing memory.
+        """
+        if self.workers:
+            self.release_queue.put(job)
+        else:
+            self.run_release_job(job)
+    
+    def open_job(self, job):
+        with self.jobs_lock:
+            self.open_blocks[job['block']] += 1
+            if job['log'] is not None:
+                self.open_logs[job['log']] += 1
+    
+    def finish_job(self, job, handled=True):
+        """Close a job; its event is marked processed once its last job closes"""
+        with self.jobs_lock:
+            self.open_blocks[job['block']] -= 1
+            if not self.open_blocks[job['block']]:
+                del self.open_blocks[job['block']]
+            if job['log'] is not None:
+                self.open_logs[job['log']] -= 1
+                if not self.open_logs[job['log']]:
+                    del self.open_logs[job['log']]
+                    if handled:
+                        self.store.mark_processed(*job['log'])
+    
+    def release_worker(self):
+        """Worker thread: execute queued releases until a None job arrives"""
+        while True:
+            job = self.release_queue.get()
+            try:
+                if job is None:
+                    return
+                self.run_release_job(job)
+            finally:
+                self.release_queue.task_done()
+    
+    def run_release_job(self, job):
+        """Send one release and wait for its receipt"""
+        try:
+            release = self.attempt_release(job['escrow'], job['condition_id'], prescreened=job['prescreened'])
+            if release is not None:
+                release['fulfilled_at'] = job['fulfilled_at']
+                self.settle_release(release)
         except Exception as e:
-            print(f"Error checking events: {e}")
+            if not self.workers:
+                raise
+            log.error("Release failed", extra={'escrow': job['escrow']['address'], 'error': str(e)})
+            if self.release_error is None:
+                self.release_error = e
+        finally:
+            self.finish_job(job)
+    
+    def checkpoint_block(self):
+        """
+        Last block safe to checkpoint: a release still queued or running for
+        a later event must be found again by the rescan after a restart
+        """
+        with self.jobs_lock:
+            if self.open_blocks:
+                return min(self.last_block, min(self.open_blocks) - 1)
+        return self.last_block
+    
+    def wait_for_releases(self):
+        """Block until every queued release has run; re-raise the first worker error"""
+        self.release_queue.join()
+        error, self.release_error = self.release_error, None
+        if error is not None:
+            raise error
+    
+    def stop_workers(self):
+        self.retries.stop()
+        for _ in self.workers:
+            self.release_queue.put(None)
+        for worker in self.workers:
+            worker.join()
+        self.workers = []
+    
+    def run_retry(self, escrow_address, condition_id):
+        """Attempt a failed release again (called by the retry thread)"""
+        escrow = find_escrow(self.deployments, escrow_address)
+        if escrow is None:
+            log.warning("Retry for an escrow not in the deployments", extra={'escrow': escrow_address})
+            self.retries.failed(escrow_address, condition_id, "escrow not in the deployments")
+            return
+        log.info("Retrying release", extra={'escrow': escrow['address']})
+        release = self.attempt_release(escrow, condition_id)
+        if release is not None:
+            self.settle_release(release)
     
-    def attempt_release(self, escrow_data, condition_id):
-        """Attempt to call release() on an escrow contract"""
+    def prescreen(self, escrow_addresses):
+        """
+        Release readiness for many escrows via EscrowMulticall, keyed by
+        lowercase address. None if no multicall is deployed (or it fails),
+        in which case each release is checked individually.
+        """
+        if not escrow_addresses or not self.deployments['multicall']:
+            return None
+        try:
+            multicall = self.contracts.get(self.deployments['multicall'], load_abi(MULTICALL_ABI_PATH))
+            statuses = check_release_ready(multicall, escrow_addresses)
+        except Exception as e:
+            log.warning("Multicall pre-screen failed, checking escrows one by one", extra={'error': str(e)})
+            return None
+        return {address.lower(): status for address, status in statuses.items()}
+    
+    def reject_prescreened(self, job, status):
+        """
+        A release the multicall pre-screen found not ready. As after a
+        per-escrow pre-check, an escrow no longer funded needs no release;
+        anything else (e.g. a node lagging behind the events) is retried.
+        """
+        escrow_address = job['escrow']['address']
+        if status is not None and status['state'] != 1:
+            log.info("Escrow not funded", extra={'escrow': escrow_address, 'state': status['state']})
+            self.retries.resolved(escrow_address)
+            return
+        if job['escrow']['seller'].lower() not in self.lanes:
+            log.info("Skipping escrow of another seller", extra={'escrow': escrow_address})
+            return
+        reason = not_ready_reason(status)
+        log.warning("Pre-screen failed", extra={'escrow': escrow_address, 'reason': reason})
+        self.retries.failed(escrow_address, job['condition_id'], reason)
+    
+    def recover_inflight_releases(self, only=None):
+        """
+        Settle release transactions left unconfirmed by a previous run
+        
+        only: optional predicate on the escrow address; rows it rejects are
+        left for whichever keeper owns that escrow
+        """
+        pending = self.store.inflight()
+        if only is not None:
+            pending = [row for row in pending if only(row[1])]
+        if not pending:
+            return
+        
+        log.info("Checking in-flight releases from the last run", extra={'releases': len(pending)})
+        for tx_hash, escrow_address, nonce in pending:
+            try:
+                self.w3.eth.get_transaction(tx_hash)
+            except TransactionNotFound:
+                # Dropped from the mempool: safe to release again
+                log.warning("In-flight release was dropped, will be retried", extra={
+                    'escrow': escrow_address, 'tx_hash': tx_hash
+                })
+                self.store.clear_inflight(tx_hash)
+                continue
+            
+            # Known to the node: wait for it rather than sending a duplicate
+            self.inflight_escrows[escrow_address.lower()] = tx_hash
+            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+            log.info("In-flight release mined", extra={'tx_hash': tx_hash, 'status': receipt.status})
+            self.store.clear_inflight(tx_hash)
+            self.inflight_escrows.pop(escrow_address.lower(), None)
+        
+        self.store.flush()
+    
+    def attempt_release(self, escrow_data, condition_id, prescreened=False):
+        """
+        Attempt to call release() on an escrow contract
+        
+        prescreened: readiness was already confirmed by the multicall
+        pre-screen, so the per-escrow state()/simulation calls are skipped
+        """
         escrow_address = escrow_data['address']
         escrow_seller = escrow_data['seller']
         
-        print(f"\n🤖 ATTEMPTING AUTO-RELEASE")
-        print(f"   Escrow: {escrow_address}")
-        print(f"   Seller: {escrow_seller}")
+        log.debug("Attempting release", extra={'escrow': escrow_address, 'seller': escrow_seller})
         
-        # Verify this bot controls the seller account
-        if self.seller_address.lower() != escrow_seller.lower():
-            print(f"   ❌ Bot account mismatch!")
-            print(f"      Bot: {self.seller_address}")
-            print(f"      Required: {escrow_seller}")
+        # Verify this bot holds the seller's key
+        lane = self.lanes.get(escrow_seller.lower())
+        if lane is None:
+            log.error("Seller key not loaded", extra={
+                'escrow': escrow_address, 'seller': escrow_seller,
+                'sellers': [lane['account'].address for lane in self.lanes.values()]
+            })
+            return
+        seller = lane['account']
+        
+        # Never submit a second release while one is still pending
+        if escrow_address.lower() in self.inflight_escrows:
+            log.info("Release already in flight", extra={
+                'escrow': escrow_address, 'tx_hash': self.inflight_escrows[escrow_address.lower()]
+            })
             return
         
-        # Create escrow contract instance
-        escrow_contract = self.w3.eth.contract(
-            address=escrow_address,
-            abi=escrow_data['abi']
-        )
+        # Cached escrow contract instance
+        escrow_contract = self.contracts.get(escrow_address, escrow_data['abi'])
         
         try:
-            # Check escrow state before attempting release
-            state = escrow_contract.functions.state().call()
-            if state != 1:
-                print(f"   ⚠️  Escrow not funded (state={state})")
-                return
-            
-            # Pre-check: simulate the call
-            try:
-                escrow_contract.functions.release().call({'from': self.seller_address})
-                print(f"   ✓ Pre-check passed")
-            except Exception as sim_error:
-                print(f"   ❌ Pre-check failed: {sim_error}")
-                return
-            
-            # Build release transaction
-            nonce = self.w3.eth.get_transaction_count(self.seller_address)
+            if prescreened:
+                log.debug("Pre-check passed (multicall)", extra={'escrow': escrow_address})
+            else:
+                # Check escrow state before attempting release
+                state = escrow_contract.functions.state().call()
+                if state != 1:
+                    log.info("Escrow not funded", extra={'escrow': escrow_address, 'state': state})
+                    self.retries.resolved(escrow_address)
+                    return
+                
+                # Pre-check: simulate the call
+                try:
+                    escrow_contract.functions.release().call({'from': seller.address})
+                    log.debug("Pre-check passed", extra={'escrow': escrow_address})
+                except Exception as sim_error:
+                    log.warning("Pre-check failed", extra={'escrow': escrow_address, 'error': str(sim_error)})
+                    self.retries.failed(escrow_address, condition_id, revert_reason(sim_error))
+                    return
             
-            release_tx = escrow_contract.functions.release().build_transaction({
-                'from': self.seller_address,
-                'nonce': nonce,
-                'gas': 500000,
-                'gasPrice': self.w3.to_wei('20', 'gwei')
+            # Build, sign and send with a locally reserved nonce; the seller's
+            # sends are serialised so its nonces reach the node in order
+            fees = self.fees.current()
+            with lane['lock']:
+                if escrow_address.lower() in self.inflight_escrows:
+                    log.info("Release already in flight", extra={
+                        'escrow': escrow_address, 'tx_hash': self.inflight_escrows[escrow_address.lower()]
+                    })
+                    return
+                tx_hash, nonce = self.nonces.send(
+                    escrow_contract.functions.release(),
+                    {'from': seller.address, 'gas': RELEASE_GAS, **fees},
+                    seller.key
+                )
+                self.inflight_escrows[escrow_address.lower()] = tx_hash.hex()
+                self.store.add_inflight(tx_hash, escrow_address, nonce)
+            log.info("Release sent", extra={
+                'escrow': escrow_address, 'tx_hash': tx_hash, 'nonce': nonce, 'fees': format_fees(fees)
             })
             
-            # Sign and send transaction (for integrity)
-            signed_tx = self.w3.eth.account.sign_transaction(
-                release_tx,
-                private_key=self.seller_account.key
-            )
-            
-            tx_hash = self.w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-            print(f"   📤 Release TX sent: {tx_hash.hex()}")
-            
-            # Wait for confirmation
-            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash)
+            # Confirmation is collected by settle_release()
+            return {
+                'escrow': escrow_contract,
+                'condition_id': condition_id,
+                'lane': lane,
+                'nonce': nonce,
+                'fees': fees,
+                'txs': [(tx_hash, self.nonces.track(tx_hash))],  # original + replacements
+            }
+                
+        except Exception as e:
+            self.metrics.releases.inc(result='error')
+            log.error("Error during release", extra={'escrow': escrow_address, 'error': str(e)})
+            self.retries.failed(escrow_address, condition_id, revert_reason(e))
+    
+    def settle_release(self, release):
+        """
+        Wait for the receipt of a release sent by attempt_release(). A release
+        still unmined after RELEASE_BUMP_BLOCKS blocks is replaced (same
+        nonce) with higher fees, so one underpriced transaction cannot stall
+        its worker.
+        """
+        sent_at_block = self.receipts.head or self.w3.eth.block_number
+        while True:
+            futures = [future for _, future in release['txs'] if not future.done()]
+            wait_for_futures(futures, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
             
-            if receipt.status == 1:
-                # Get released amount from events
+            done = [(tx_hash, future) for tx_hash, future in release['txs'] if future.done()]
+            mined = [(tx_hash, future) for tx_hash, future in done if future.exception() is None]
+            if mined:
+                self.finish_release(release, *mined[0])
+                return
+            if len(done) == len(release['txs']):
+                # Every attempt timed out or was dropped
+                tx_hash, future = release['txs'][-1]
+                self.metrics.releases.inc(result='error')
                 try:
-                    released_events = escrow_contract.events.Released().process_receipt(receipt)
-                    if released_events:
-                        amount = released_events[0]['args']['amount']
-                        print(f"   ✅ RELEASE SUCCESSFUL!")
-                        print(f"      Amount: {self.w3.from_wei(amount, 'ether')} ETH")
-                        print(f"      Gas used: {receipt.gasUsed}")
-                    else:
-                        print(f"   ✅ Transaction successful (status=1)")
-                except:
-                    print(f"   ✅ Transaction successful (status=1)")
-            else:
-                print(f"   ❌ Release failed (status=0)")
-                print(f"      TX: {tx_hash.hex()}")
-                
+                    self.nonces.settle(tx_hash, future)
+                except Exception as e:
+                    log.error("Error confirming release", extra={
+                        'escrow': release['escrow'].address, 'tx_hash': tx_hash, 'error': str(e)
+                    })
+                    if isinstance(e, TransactionNotFound):
+                        # Dropped: nothing of this release is pending any more
+                        for sent_hash, _ in release['txs']:
+                            self.store.clear_inflight(sent_hash)
+                        self.inflight_escrows.pop(release['escrow'].address.lower(), None)
+                    self.retries.failed(release['escrow'].address, release['condition_id'], revert_reason(e))
+                return
+            
+            head = self.receipts.head or sent_at_block
+            if head - sent_at_block >= RELEASE_BUMP_BLOCKS:
+                self.bump_release(release)
+                sent_at_block = head
+    
+    def bump_release(self, release):
+        """Replace a stuck release with the same nonce and higher fees"""
+        escrow_address = release['escrow'].address
+        fees = self.fees.bump(release['fees'])
+        if fees is None:
+            log.warning("Release still unmined at the fee cap", extra={
+                'escrow': escrow_address, 'fees': format_fees(release['fees'])
+            })
+            return
+        
+        try:
+            seller = release['lane']['account']
+            with release['lane']['lock']:
+                tx_hash = self.nonces.replace(
+                    release['escrow'].functions.release(),
+                    {'from': seller.address, 'gas': RELEASE_GAS, **fees},
+                    seller.key,
+                    release['nonce']
+                )
         except Exception as e:
-            print(f"   ❌ Error during release: {e}")
+            # Typically "nonce too low": an earlier attempt was just mined
+            log.warning("Could not replace release", extra={'escrow': escrow_address, 'error': str(e)})
+            return
+        
+        log.info("Replaced unmined release with higher fees", extra={
+            'escrow': escrow_address, 'tx_hash': tx_hash, 'blocks': RELEASE_BUMP_BLOCKS, 'fees': format_fees(fees)
+        })
+        release['fees'] = fees
+        release['txs'].append((tx_hash, self.nonces.track(tx_hash)))
+        self.inflight_escrows[escrow_address.lower()] = tx_hash.hex()
+        self.store.add_inflight(tx_hash, escrow_address, release['nonce'])
+    
+    def finish_release(self, release, tx_hash, future):
+        """Record and report the mined transaction of a release"""
+        escrow_contract = release['escrow']
+        receipt = self.nonces.settle(tx_hash, future)
+        for sent_hash, _ in release['txs']:
+            self.store.clear_inflight(sent_hash)
+        self.inflight_escrows.pop(escrow_contract.address.lower(), None)
+        self.record_release(release, receipt)
+        
+        if receipt.status == 1:
+            # Get released amount from events
+            amount = None
+            try:
+                released_events = escrow_contract.events.Released().process_receipt(receipt)
+                if released_events:
+                    amount = released_events[0]['args']['amount']
+            except Exception:
+                pass
+            log.info("Release successful", extra={
+                'escrow': escrow_contract.address, 'tx_hash': tx_hash, 'amount_wei': amount,
+                'gas_used': receipt.gasUsed
+            })
+            self.retries.resolved(escrow_contract.address)
+        else:
+            # The tracker decodes it already; replay only a receipt fetched without it
+            reason = receipt['revertReason'] if 'revertReason' in receipt else decode_revert_reason(self.w3, receipt)
+            reason = reason or "reverted (status=0)"
+            log.error("Release reverted", extra={
+                'escrow': escrow_contract.address, 'tx_hash': tx_hash, 'reason': reason
+            })
+            self.retries.failed(escrow_contract.address, release['condition_id'], reason)
+    
+    def record_release(self, release, receipt):
+        """Outcome, gas and event-to-receipt latency of a mined release"""
+        self.metrics.releases.inc(result='success' if receipt.status == 1 else 'reverted')
+        self.metrics.release_gas.observe(receipt.gasUsed)
+        fulfilled = release.get('fulfilled_at')
+        if fulfilled is not None:
+            fulfilled_block, fulfilled_timestamp = fulfilled
+            self.metrics.release_latency_blocks.observe(receipt.blockNumber - fulfilled_block)
+            self.metrics.release_latency.observe(max(0, time.time() - fulfilled_timestamp))
     
     def run(self):
         """Main bot loop"""
-        print("\n" + "="*60)
-        print("🤖 ESCROW KEEPER BOT STARTED")
-        print("="*60)
-        print(f"Polling interval: {POLL_INTERVAL} seconds")
-        print(f"Press Ctrl+C to stop")
-        print("="*60)
-        
-        # Set up event monitoring
-        self.setup_event_filters()
+        log.info("Keeper bot started", extra={'poll_interval': POLL_INTERVAL})
         
         try:
+            log.info("Monitoring ConditionFulfilled events", extra={
+                'condition_verifiers': list(self.deployments['verifiers'].values()),
+                'confirmations': self.confirmations
+            })
+            self.recover_inflight_releases()
+            
+            if self.start_block is not None:
+                self.backfill(self.start_block, self.safe_head())
+            
             while True:
                 self.check_new_fulfilled_conditions()
-                time.sleep(POLL_INTERVAL)
+                time.sleep(self.sleep_interval())
                 
         except KeyboardInterrupt:
-            print("\n\n⏹️  Bot stopped by user")
-            print("="*60)
-        except Exception as e:
-            print(f"\n\n❌ Bot crashed: {e}")
+            log.info("Bot stopped by user")
+        except Exception:
+            log.critical("Bot crashed", exc_info=True)
             raise
+        finally:
+            self.stop_workers()
+            self.receipts.stop()
+            self.store.close()
+            self.metrics.close()
 
 
 def main():
     """Entry point for keeper bot"""
-    print("="*60)
-    print("ESCROW KEEPER BOT INITIALIZATION")
-    print("="*60)
+    parser = argparse.ArgumentParser(description="Escrow keeper bot")
+    parser.add_argument(
+        "--from-block", type=int, default=None,
+        help="backfill ConditionFulfilled events from this block before tailing "
+             "(default: resume from the saved checkpoint)"
+    )
+    parser.add_argument(
+        "--state-db", default=STATE_PATH,
+        help=f"SQLite checkpoint file (default: {STATE_PATH})"
+    )
+    parser.add_argument(
+        "--confirmations", type=int, default=CONFIRMATIONS,
+        help=f"blocks a ConditionFulfilled event must be buried under before release (default: {CONFIRMATIONS})"
+    )
+    parser.add_argument(
+        "--metrics-port", type=int, default=None,
+        help="serve Prometheus metrics on this port at /metrics (default: off)"
+    )
+    parser.add_argument(
+        "--keystore", default=None,
+        help="directory of encrypted seller keystores to load instead of typing one key "
+             "(see sellerKeystore.py)"
+    )
+    parser.add_argument(
+        "--release-workers", type=int, default=RELEASE_WORKERS,
+        help=f"threads sending releases and waiting for their receipts; 0 releases inline (default: {RELEASE_WORKERS})"
+    )
+    parser.add_argument(
+        "--refunds", action="store_true",
+        help="also refund the buyer's escrows when their timeout passes (asks for the buyer key)"
+    )
+    parser.add_argument(
+        "--log-level", default=None,
+        help="level, optionally per logger, e.g. INFO,nonceManager=DEBUG (default: $LOG_LEVEL or INFO)"
+    )
+    args = parser.parse_args()
+    setup_logging(args.log_level)
     
-    # Get seller private key
-    seller_key = getpass.getpass(prompt="Enter seller private key: ")
+    # Seller key(s)
+    seller_key = prompt_sellers(args.keystore)
     
-    if not seller_key:
-        print("Error: Private key required")
-        sys.exit(1)
+    buyer_key = None
+    if args.refunds:
+        buyer_key = getpass.getpass(prompt="Enter buyer private key: ")
+        if not buyer_key:
+            log.error("Buyer private key required for --refunds")
+            sys.exit(1)
     
     # Initialize and run bot
-    bot = EscrowKeeperBot(seller_key)
+    bot = EscrowKeeperBot(
+        seller_key,
+        start_block=args.from_block,
+        state_path=args.state_db,
+        confirmations=args.confirmations,
+        buyer_private_key=buyer_key,
+        release_workers=args.release_workers
+    )
+    if args.metrics_port is not None:
+        bot.metrics.serve(args.metrics_port)
+        log.info("Serving metrics", extra={'url': f"http://{METRICS_HOST}:{args.metrics_port}/metrics"})
     bot.run()
 
 
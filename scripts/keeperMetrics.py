@@ -0,0 +1,284 @@
+"""
+Prometheus metrics for the keeper
+Counters, gauges and fixed-bucket histograms kept in memory and served in the
+Prometheus text format from a small HTTP endpoint:
+
+    metrics = KeeperMetrics()
+    metrics.serve(9108)          # GET http://host:9108/metrics
+
+Recording a value is a dict lookup and an integer add under a lock, and the
+endpoint only does work when scraped, so the keeper collects metrics
+unconditionally and serving them is opt-in (--metrics-port). RPC calls are
+measured by a web3 middleware (see KeeperMetrics.middleware).
+"""
+
+import time
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from web3.middleware import Web3Middleware
+
+METRICS_HOST = "0.0.0.0"
+
+# Histogram buckets (upper bounds; +Inf is implicit)
+LATENCY_BUCKETS = (1, 2, 5, 10, 15, 30, 60, 120, 300, 600)  # seconds
+BLOCK_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+RPC_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # seconds
+POLL_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)  # seconds
+GAS_BUCKETS = (25000, 50000, 75000, 100000, 150000, 250000, 500000)
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base class: a named family of values keyed by label values"""
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}  # tuple of label values -> value
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(labels[name] for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def snapshot(self):
+        """{tuple of label values: count} for every label combination seen"""
+        with self._lock:
+            return dict(self._values)
+
+
+class Gauge(Metric):
+    """A value that goes up and down; set_function() makes it computed at scrape time"""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._function = None
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function):
+        self._function = function
+
+    def value(self, **labels):
+        if self._function is not None:
+            return self._function()
+        return self._values.get(self._key(labels), 0)
+
+    def render(self):
+        if self._function is None:
+            return super().render()
+        try:
+            value = self._function()
+        except Exception:
+            return []
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}",
+                f"{self.name} {_format_value(value)}"]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, buckets, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # per-bucket (non-cumulative) counts incl. +Inf, sum
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0]
+            state[0][index] += 1
+            state[1] += value
+
+    def count(self, **labels):
+        state = self._values.get(self._key(labels))
+        return sum(state[0]) if state else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class KeeperMetrics:
+    """Every metric the keeper bots record"""
+
+    def __init__(self):
+        self.events = Counter(
+            "keeper_events_total", "ConditionFulfilled events handled")
+        self.releases = Counter(
+            "keeper_releases_total", "Release attempts by outcome", ("result",))
+        self.release_latency = Histogram(
+            "keeper_release_latency_seconds",
+            "ConditionFulfilled block timestamp to release receipt", LATENCY_BUCKETS)
+        self.release_latency_blocks = Histogram(
+            "keeper_release_latency_blocks",
+            "Blocks from ConditionFulfilled to the release receipt", BLOCK_BUCKETS)
+        self.release_gas = Histogram(
+            "keeper_release_gas_used", "Gas used per mined release", GAS_BUCKETS)
+        self.rpc_requests = Counter(
+            "keeper_rpc_requests_total", "JSON-RPC requests by method", ("method",))
+        self.rpc_errors = Counter(
+            "keeper_rpc_errors_total", "JSON-RPC requests that failed, by method", ("method",))
+        self.rpc_latency = Histogram(
+            "keeper_rpc_request_duration_seconds",
+            "JSON-RPC round trip by method (a batch is one 'batch' observation)",
+            RPC_BUCKETS, ("method",))
+        self.poll_duration = Histogram(
+            "keeper_poll_cycle_seconds", "Duration of one poll cycle", POLL_BUCKETS)
+        self.queue_depth = Gauge(
+            "keeper_release_queue_depth", "Releases queued and not yet picked up by a worker")
+        self.inflight = Gauge(
+            "keeper_releases_in_flight", "Release transactions sent and not yet mined")
+        self.retries_pending = Gauge(
+            "keeper_release_retries_pending", "Failed releases waiting for a retry")
+        self.dead_letters = Counter(
+            "keeper_dead_letters_total", "Releases given up on after every retry failed")
+        self.reorgs = Counter(
+            "keeper_reorgs_total", "Chain reorganisations that orphaned handled blocks")
+        self.last_block = Gauge(
+            "keeper_last_block", "Last block whose events have been handled")
+        self._server = None
+
+    def all(self):
+        return [value for value in vars(self).values() if isinstance(value, Metric)]
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.all():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def observe_rpc(self, method, seconds, failed=False):
+        self.rpc_requests.inc(method=method)
+        self.rpc_latency.observe(seconds, method=method)
+        if failed:
+            self.rpc_errors.inc(method=method)
+
+    def middleware(self):
+        """
+        web3 middleware class timing every request made through a Web3 or
+        AsyncWeb3 object:  w3.middleware_onion.add(metrics.middleware())
+        """
+        metrics = self
+
+        class RPCMetricsMiddleware(Web3Middleware):
+            def wrap_make_request(self, make_request):
+                def middleware(method, params):
+                    began = time.monotonic()
+                    failed = True
+                    try:
+                        response = make_request(method, params)
+                        failed = 'error' in response
+                        return response
+                    finally:
+                        metrics.observe_rpc(method, time.monotonic() - began, failed)
+                return middleware
+
+            def wrap_make_batch_request(self, make_batch_request):
+                def middleware(requests_info):
+                    began = time.monotonic()
+                    try:
+                        return make_batch_request(requests_info)
+                    finally:
+                        metrics.rpc_latency.observe(time.monotonic() - began, method="batch")
+                        for method, _ in requests_info:
+                            metrics.rpc_requests.inc(method=method)
+                return middleware
+
+            async def async_wrap_make_request(self, make_request):
+                async def middleware(method, params):
+                    began = time.monotonic()
+                    failed = True
+                    try:
+                        response = await make_request(method, params)
+                        failed = 'error' in response
+                        return response
+                    finally:
+                        metrics.observe_rpc(method, time.monotonic() - began, failed)
+                return middleware
+
+        return RPCMetricsMiddleware
+
+    def serve(self, port, host=METRICS_HOST):
+        """Serve GET /metrics on a daemon thread; returns the bound port"""
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/metrics', '/'):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # scrapes every few seconds would drown the keeper's output
+
+        self._server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server.server_address[1]
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
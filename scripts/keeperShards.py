@@ -0,0 +1,452 @@
+"""
+Sharded Escrow keeper
+Runs several keeper processes side by side, each releasing the escrows of a
+subset of condition_ids. ConditionFulfilled events are split into shards by
+a hash of (verifier, condition_id); which worker owns which shard is
+coordinated through leases in the shared SQLite state file.
+
+Start one process per worker, all pointing at the same --state-db:
+    python scripts/keeperShards.py --worker-id a
+    python scripts/keeperShards.py --worker-id b
+
+A worker renews its leases every poll cycle. If it stops (crash, kill,
+network split) its leases expire after LEASE_SECONDS and the survivors claim
+its shards, rescanning them from the last block the dead worker committed.
+Already handled logs and in-flight release transactions live in the same
+file, so nothing is released twice or skipped.
+"""
+
+import sys
+import math
+import time
+import socket
+import hashlib
+import logging
+import argparse
+
+from keeperBot import (
+    EscrowKeeperBot, STATE_PATH, POLL_INTERVAL, CONFIRMATIONS, RELEASE_WORKERS, load_deployments, find_escrow
+)
+from keeperStore import KeeperCheckpointStore, _hex
+from nonceManager import NonceManager
+from readinessTracker import ReadinessTracker
+from contractCache import load_abi
+from keeperMetrics import METRICS_HOST
+from sellerKeystore import prompt_sellers
+from structuredLogging import setup_logging
+
+log = logging.getLogger("keeperShards")
+
+NUM_SHARDS = 16
+LEASE_SECONDS = 15  # a worker silent for this long loses its shards (keep > 2 * POLL_INTERVAL)
+NONCE_RETRIES = 5  # workers sharing a seller account race for its nonces
+
+SHARD_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shard_leases (
+    shard INTEGER PRIMARY KEY,
+    owner TEXT,
+    expires_at REAL NOT NULL DEFAULT 0,
+    last_block INTEGER
+);
+CREATE TABLE IF NOT EXISTS shard_workers (
+    worker_id TEXT PRIMARY KEY,
+    heartbeat REAL NOT NULL
+);
+"""
+
+
+def shard_for(verifier_address, condition_id, num_shards=NUM_SHARDS):
+    """Shard of a condition; stable across processes and restarts"""
+    key = f"{verifier_address.lower()}:{condition_id}".encode()
+    return int.from_bytes(hashlib.sha256(key).digest()[:8], 'big') % num_shards
+
+
+class LeaseLost(Exception):
+    """The worker no longer holds the lease of a shard it is processing"""
+
+
+class ShardedCheckpointStore(KeeperCheckpointStore):
+    """
+    KeeperCheckpointStore shared by every worker, plus the shard lease table.
+
+    Each shard carries its own last_block, so a worker taking over a shard
+    resumes it exactly where the previous owner stopped. In-flight releases
+    are written immediately rather than at flush(), so a worker that dies
+    after sending a release still leaves a record for its successor.
+    """
+
+    def __init__(self, path, worker_id, num_shards=NUM_SHARDS, lease_seconds=LEASE_SECONDS):
+        super().__init__(path)
+        self.worker_id = worker_id
+        self.num_shards = num_shards
+        self.lease_seconds = lease_seconds
+        self._shard_blocks = {}
+
+        self.conn.executescript(SHARD_SCHEMA)
+        with self.conn:
+            existing = self.conn.execute("SELECT COUNT(*) FROM shard_leases").fetchone()[0]
+            if existing == 0:
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO shard_leases (shard) VALUES (?)",
+                    [(shard,) for shard in range(num_shards)]
+                )
+            elif existing != num_shards:
+                raise ValueError(f"{path} is set up for {existing} shards, not {num_shards}")
+
+    # ----- leases -----
+    def renew_leases(self, rebalance=True, now=None):
+        """
+        Heartbeat, extend this worker's leases and, with rebalance, claim free
+        or expired shards up to a fair share (shards / live workers) and give
+        up any above it. Returns {shard: (last_block, expires_at)} for the
+        shards now held.
+
+        Rebalance only between poll cycles (after flush()), since shards given
+        up here are immediately claimable by other workers.
+        """
+        with self.lock:
+            now = time.time() if now is None else now
+            expires_at = now + self.lease_seconds
+
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute(
+                    "INSERT INTO shard_workers (worker_id, heartbeat) VALUES (?, ?) "
+                    "ON CONFLICT(worker_id) DO UPDATE SET heartbeat = excluded.heartbeat",
+                    (self.worker_id, now)
+                )
+                live_workers = self.conn.execute(
+                    "SELECT COUNT(*) FROM shard_workers WHERE heartbeat > ?",
+                    (now - self.lease_seconds,)
+                ).fetchone()[0]
+                fair_share = math.ceil(self.num_shards / live_workers)
+
+                self.conn.execute(
+                    "UPDATE shard_leases SET expires_at = ? WHERE owner = ? AND expires_at > ?",
+                    (expires_at, self.worker_id, now)
+                )
+                held = [row[0] for row in self.conn.execute(
+                    "SELECT shard FROM shard_leases WHERE owner = ? AND expires_at > ? ORDER BY shard",
+                    (self.worker_id, now)
+                )]
+
+                if rebalance and len(held) > fair_share:
+                    self.conn.executemany(
+                        "UPDATE shard_leases SET owner = NULL, expires_at = 0 WHERE shard = ?",
+                        [(shard,) for shard in held[fair_share:]]
+                    )
+                elif rebalance and len(held) < fair_share:
+                    free = [row[0] for row in self.conn.execute(
+                        "SELECT shard FROM shard_leases WHERE owner IS NULL OR expires_at <= ? "
+                        "ORDER BY shard LIMIT ?",
+                        (now, fair_share - len(held))
+                    )]
+                    self.conn.executemany(
+                        "UPDATE shard_leases SET owner = ?, expires_at = ? WHERE shard = ?",
+                        [(self.worker_id, expires_at, shard) for shard in free]
+                    )
+
+                rows = self.conn.execute(
+                    "SELECT shard, last_block, expires_at FROM shard_leases "
+                    "WHERE owner = ? AND expires_at > ?",
+                    (self.worker_id, now)
+                ).fetchall()
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+
+            return {shard: (last_block, lease_end) for shard, last_block, lease_end in rows}
+
+    def release_leases(self):
+        """Hand every shard back (clean shutdown) so others need not wait for expiry"""
+        with self.lock:
+            with self.conn:
+                self.conn.execute(
+                    "UPDATE shard_leases SET owner = NULL, expires_at = 0 WHERE owner = ?",
+                    (self.worker_id,)
+                )
+                self.conn.execute("DELETE FROM shard_workers WHERE worker_id = ?", (self.worker_id,))
+
+    # ----- buffered writes -----
+    def set_shard_blocks(self, shards, block_number):
+        with self.lock:
+            for shard in shards:
+                self._shard_blocks[shard] = block_number
+
+    def add_inflight(self, tx_hash, escrow_address, nonce):
+        with self.lock:
+            # Written through: the successor of a crashed worker must see it
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO inflight_releases (tx_hash, escrow, nonce, sent_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (_hex(tx_hash), escrow_address, nonce, time.time())
+                )
+
+    def discard(self):
+        """Drop the pending batch (except confirmations) after losing a lease mid-cycle"""
+        with self.lock:
+            self._last_block = None
+            self._processed.clear()
+            self._conditions = {key: handled for key, handled in self._conditions.items() if not handled}
+            self._shard_blocks.clear()
+
+    def flush(self):
+        with self.lock:
+            # Handled logs are committed before the shard checkpoints move past
+            # them; a crash in between only means a rescan that finds them handled
+            super().flush()
+            if not self._shard_blocks:
+                return
+            with self.conn:
+                self.conn.executemany(
+                    "UPDATE shard_leases SET last_block = ? WHERE shard = ? AND owner = ?",
+                    [(block, shard, self.worker_id) for shard, block in self._shard_blocks.items()]
+                )
+            self._shard_blocks.clear()
+
+
+class ShardedKeeperBot(EscrowKeeperBot):
+    def __init__(self, seller_private_key, worker_id, num_shards=NUM_SHARDS,
+                 lease_seconds=LEASE_SECONDS, start_block=None, state_path=STATE_PATH, metrics=None,
+                 confirmations=CONFIRMATIONS, release_workers=RELEASE_WORKERS):
+        """
+        One worker of a sharded keeper fleet
+
+        start_block: where to start shards that no worker has processed yet
+        (default: the chain head when the shard is first claimed)
+        """
+        self.worker_id = worker_id
+        self.num_shards = num_shards
+        self.lease_seconds = lease_seconds
+        self.leases = {}  # shard -> lease expiry (time.time())
+        self.resume = {}  # held shard -> first block of this cycle's scan for it
+        super().__init__(seller_private_key, start_block=start_block, state_path=state_path,
+                         metrics=metrics, confirmations=confirmations, release_workers=release_workers)
+        self.nonces = NonceManager(self.w3, retries=NONCE_RETRIES, receipts=self.receipts)
+
+    def open_store(self, state_path):
+        return ShardedCheckpointStore(state_path, self.worker_id, self.num_shards, self.lease_seconds)
+
+    def open_readiness(self):
+        # Each worker follows every escrow only as far as its own shards'
+        # blocks, so readiness is read from history instead of shared in the file
+        return ReadinessTracker(self.w3, load_abi('contracts/Escrow.abi'))
+
+    def shard_of_escrow(self, escrow_address):
+        escrow = find_escrow(self.deployments, escrow_address)
+        if escrow is None:
+            return None
+        return shard_for(escrow['condition_verifier'], escrow['condition_id'], self.num_shards)
+
+    def owns(self, escrow, block_number):
+        # Earlier blocks of a shard were handled by whoever held it then
+        shard = shard_for(escrow['condition_verifier'], escrow['condition_id'], self.num_shards)
+        return block_number >= self.resume.get(shard, math.inf)
+
+    def holds(self, shard):
+        """Whether this worker still holds shard, renewing when the lease runs low"""
+        if shard not in self.leases:
+            return False
+        if time.time() > self.leases[shard] - self.lease_seconds / 3:
+            held = self.store.renew_leases(rebalance=False)
+            self.leases = {s: lease_end for s, (_, lease_end) in held.items()}
+        return shard in self.leases
+
+    def poll_once(self):
+        """Renew leases, then handle new events of every held shard up to the head"""
+        began = time.monotonic()
+        try:
+            self._poll_shards()
+        finally:
+            self.metrics.poll_duration.observe(time.monotonic() - began)
+
+    def _poll_shards(self):
+        self.deployments = load_deployments(self.deployments)
+        fork_block = self.check_for_reorg()
+        head = self.safe_head()
+        held = self.store.renew_leases()
+
+        if fork_block is not None:
+            # Move every held shard back to the fork right away, so the
+            # rescan survives a lease lost later in this cycle
+            rewound = [shard for shard, (last_block, _) in held.items()
+                       if last_block is not None and last_block > fork_block]
+            self.store.set_shard_blocks(rewound, fork_block)
+            self.store.flush()
+            held = {shard: (min(last_block, fork_block) if last_block is not None else None, lease_end)
+                    for shard, (last_block, lease_end) in held.items()}
+
+        gained = set(held) - set(self.leases)
+        lost = set(self.leases) - set(held)
+        self.leases = {shard: lease_end for shard, (_, lease_end) in held.items()}
+        if lost:
+            log.info("Gave up shards", extra={'worker_id': self.worker_id, 'shards': sorted(lost)})
+        if gained:
+            log.info("Claimed shards", extra={'worker_id': self.worker_id, 'shards': sorted(gained)})
+            # Readiness of their escrows was only partly followed while another
+            # worker held them: read it again from history
+            self.readiness.forget(
+                escrow['address'] for escrow in self.deployments['escrow_contracts']
+                if shard_for(escrow['condition_verifier'], escrow['condition_id'], self.num_shards) in gained
+            )
+            # Let releases the previous owner left in flight settle first
+            self.recover_inflight_releases(only=lambda escrow: self.shard_of_escrow(escrow) in gained)
+            self.retries.reload()
+        if not held:
+            return
+
+        # Block each shard resumes from
+        resume = {}
+        for shard, (last_block, _) in held.items():
+            if last_block is not None:
+                resume[shard] = last_block + 1
+            else:
+                resume[shard] = self.start_block if self.start_block is not None else head + 1
+
+        self.resume = resume
+        try:
+            from_block = min(resume.values())
+            head_hash = self.canonical_hash(head)
+            if from_block <= head:
+                for _, events in self.fetch_fulfilled_logs(from_block, head):
+                    owned = []
+                    for event in events:
+                        if event['address'] in self.readiness:
+                            owned.append(event)  # every escrow's readiness; owns() gates releases
+                        elif event['blockNumber'] >= resume.get(
+                            shard_for(event['address'], event['args']['condition_id'], self.num_shards),
+                            head + 1
+                        ):
+                            owned.append(event)
+                        else:
+                            self.note_fulfilled(event)  # another shard's: readiness only
+                    self.handle_fulfilled_events(owned)
+            # The shards' blocks are only committed once their releases ran
+            self.wait_for_releases()
+        except LeaseLost as e:
+            log.warning("Lease lost, dropping this cycle", extra={'worker_id': self.worker_id, 'error': str(e)})
+            self.store.discard()
+            self.processed_conditions = self.store.processed_conditions()
+            # The cycle is rescanned: let its readiness changes happen again
+            self.readiness.rewind(from_block - 1)
+            return
+
+        self.last_block = head
+        self.store.set_shard_blocks(held, head)
+        self.store.flush()
+        if head_hash is not None:
+            self.recent_blocks.record(head, head_hash)
+        self.metrics.last_block.set(head)
+
+    def attempt_release(self, escrow_data, condition_id, prescreened=False):
+        # Fence every release on the lease: once a shard has moved, its new
+        # owner handles the event instead
+        shard = shard_for(escrow_data['condition_verifier'], condition_id, self.num_shards)
+        if not self.holds(shard):
+            raise LeaseLost(f"lost lease on shard {shard}")
+        return super().attempt_release(escrow_data, condition_id, prescreened=prescreened)
+
+    def run_retry(self, escrow_address, condition_id):
+        # Only the worker holding the escrow's shard retries it; the stored
+        # retry is left for that worker otherwise
+        shard = self.shard_of_escrow(escrow_address)
+        if shard is None or not self.holds(shard):
+            self.retries.cancel(escrow_address)
+            return
+        super().run_retry(escrow_address, condition_id)
+
+    def run(self):
+        """Main worker loop"""
+        log.info("Sharded keeper started", extra={
+            'worker_id': self.worker_id, 'shards': self.num_shards, 'lease_seconds': self.lease_seconds,
+            'poll_interval': POLL_INTERVAL
+        })
+
+        try:
+            while True:
+                try:
+                    self.poll_once()
+                except Exception:
+                    log.error("Error checking events", extra={'worker_id': self.worker_id}, exc_info=True)
+                    self.store.flush()
+                time.sleep(POLL_INTERVAL)
+
+        except KeyboardInterrupt:
+            log.info("Worker stopped by user, handing back shards", extra={'worker_id': self.worker_id})
+            self.store.flush()
+            self.store.release_leases()
+        finally:
+            self.stop_workers()
+            self.receipts.stop()
+            self.store.close()
+            self.metrics.close()
+
+
+def main():
+    """Entry point for one sharded keeper worker"""
+    parser = argparse.ArgumentParser(description="Sharded escrow keeper worker")
+    parser.add_argument(
+        "--worker-id", default=f"{socket.gethostname()}-{time.time_ns()}",
+        help="unique name of this worker (default: hostname + start time)"
+    )
+    parser.add_argument(
+        "--shards", type=int, default=NUM_SHARDS,
+        help=f"number of shards; must match every other worker (default: {NUM_SHARDS})"
+    )
+    parser.add_argument(
+        "--lease-seconds", type=float, default=LEASE_SECONDS,
+        help=f"shard lease duration (default: {LEASE_SECONDS})"
+    )
+    parser.add_argument(
+        "--from-block", type=int, default=None,
+        help="start block for shards no worker has processed yet (default: chain head)"
+    )
+    parser.add_argument(
+        "--state-db", default=STATE_PATH,
+        help=f"SQLite file shared by all workers (default: {STATE_PATH})"
+    )
+    parser.add_argument(
+        "--confirmations", type=int, default=CONFIRMATIONS,
+        help=f"blocks a ConditionFulfilled event must be buried under before release (default: {CONFIRMATIONS})"
+    )
+    parser.add_argument(
+        "--keystore", default=None,
+        help="directory of encrypted seller keystores to load instead of typing one key "
+             "(see sellerKeystore.py)"
+    )
+    parser.add_argument(
+        "--release-workers", type=int, default=RELEASE_WORKERS,
+        help=f"threads sending releases and waiting for their receipts; 0 releases inline (default: {RELEASE_WORKERS})"
+    )
+    parser.add_argument(
+        "--metrics-port", type=int, default=None,
+        help="serve Prometheus metrics on this port at /metrics (default: off)"
+    )
+    parser.add_argument(
+        "--log-level", default=None,
+        help="level, optionally per logger, e.g. INFO,keeperShards=DEBUG (default: $LOG_LEVEL or INFO)"
+    )
+    args = parser.parse_args()
+    setup_logging(args.log_level)
+
+    seller_key = prompt_sellers(args.keystore)
+
+    bot = ShardedKeeperBot(
+        seller_key, args.worker_id,
+        num_shards=args.shards,
+        lease_seconds=args.lease_seconds,
+        start_block=args.from_block,
+        state_path=args.state_db,
+        confirmations=args.confirmations,
+        release_workers=args.release_workers
+    )
+    if args.metrics_port is not None:
+        bot.metrics.serve(args.metrics_port)
+        log.info("Serving metrics", extra={'url': f"http://{METRICS_HOST}:{args.metrics_port}/metrics"})
+    bot.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+"""
+Persistent checkpoint store for the Escrow keeper bot
+Keeps the last fully processed block, the ConditionFulfilled logs already
+handled (and their condition ids, as one bitmap per verifier), the release
+readiness of every escrow, release transactions that were sent but not yet
+confirmed and failed releases (waiting for a retry, or given up on in the
+dead-letter table),
+so a restarted bot resumes where it stopped instead of replaying history
+"""
+
+import sqlite3
+import time
+import threading
+
+from conditionBitmap import ConditionBitmap, ProcessedConditions
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoint (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    last_block INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS processed_logs (
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    PRIMARY KEY (tx_hash, log_index)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS processed_conditions (
+    verifier TEXT PRIMARY KEY,
+    bitmap BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS escrow_readiness (
+    escrow TEXT PRIMARY KEY,
+    conditions INTEGER NOT NULL,
+    fulfilled INTEGER NOT NULL,
+    external INTEGER NOT NULL,
+    funded INTEGER NOT NULL,
+    block INTEGER NOT NULL,
+    log_index INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS inflight_releases (
+    tx_hash TEXT PRIMARY KEY,
+    escrow TEXT NOT NULL,
+    nonce INTEGER NOT NULL,
+    sent_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS release_retries (
+    escrow TEXT PRIMARY KEY,
+    condition_id INTEGER NOT NULL,
+    attempts INTEGER NOT NULL,
+    next_at REAL NOT NULL,
+    last_error TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dead_letters (
+    escrow TEXT PRIMARY KEY,
+    condition_id INTEGER NOT NULL,
+    attempts INTEGER NOT NULL,
+    reason TEXT NOT NULL,
+    failed_at REAL NOT NULL
+);
+"""
+
+
+def _hex(value):
+    """Normalise a tx hash (HexBytes/bytes/str) to a lowercase 0x string"""
+    if isinstance(value, (bytes, bytearray)):
+        value = value.hex()
+    value = value.lower()
+    return value if value.startswith('0x') else '0x' + value
+
+
+class KeeperCheckpointStore:
+    """
+    SQLite-backed keeper progress.
+
+    Changes are buffered in memory and written by flush() in a single
+    transaction, which the keeper calls once per poll cycle (or backfill
+    range). Lookups consult the buffer first, so unflushed work is never
+    repeated within a run. Failed releases are the exception: they are
+    written through, since they happen off the poll cycle. The keeper's
+    release workers share the store, so every method holds self.lock.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+        # Pending batch
+        self._last_block = None
+        self._processed = set()
+        self._unprocessed = set()  # retracted after a reorg
+        self._conditions = {}  # (verifier, condition_id) -> handled (True) / retracted (False)
+        self._readiness = {}  # escrow lowercase -> readiness row, or None once forgotten
+        self._inflight = {}
+        self._confirmed = set()
+
+    # ----- reads -----
+    def last_block(self):
+        """Last fully processed block, or None if the store is empty"""
+        with self.lock:
+            if self._last_block is not None:
+                return self._last_block
+            row = self.conn.execute("SELECT last_block FROM checkpoint WHERE id = 0").fetchone()
+            return row[0] if row else None
+
+    def is_processed(self, tx_hash, log_index):
+        """Whether the log at (tx_hash, log_index) has already been handled"""
+        with self.lock:
+            key = (_hex(tx_hash), int(log_index))
+            if key in self._processed:
+                return True
+            if key in self._unprocessed:
+                return False
+            row = self.conn.execute(
+                "SELECT 1 FROM processed_logs WHERE tx_hash = ? AND log_index = ?", key
+            ).fetchone()
+            return row is not None
+
+    def processed_conditions(self):
+        """ProcessedConditions holding every handled condition"""
+        with self.lock:
+            processed = ProcessedConditions(dict(
+                self.conn.execute("SELECT verifier, bitmap FROM processed_conditions")
+            ))
+            for (verifier, condition_id), handled in self._conditions.items():
+                if handled:
+                    processed.add(verifier, condition_id)
+                else:
+                    processed.discard(verifier, condition_id)
+            return processed
+
+    def readiness(self):
+        """
+        Saved readiness records:
+        {escrow lowercase: (conditions, fulfilled, external, funded, (block, log_index))}
+        """
+        with self.lock:
+            rows = {
+                escrow: tuple(row) for escrow, *row in self.conn.execute(
+                    "SELECT escrow, conditions, fulfilled, external, funded, block, log_index FROM escrow_readiness"
+                )
+            }
+            for escrow, row in self._readiness.items():
+                if row is None:
+                    rows.pop(escrow, None)
+                else:
+                    rows[escrow] = row
+            return {
+                escrow: (conditions, fulfilled, bool(external), bool(funded), (block, log_index))
+                for escrow, (conditions, fulfilled, external, funded, block, log_index) in rows.items()
+            }
+
+    def inflight(self):
+        """Release transactions sent but not yet confirmed: [(tx_hash, escrow, nonce)]"""
+        with self.lock:
+            rows = {
+                tx_hash: (escrow, nonce)
+                for tx_hash, escrow, nonce in self.conn.execute(
+                    "SELECT tx_hash, escrow, nonce FROM inflight_releases"
+                )
+            }
+            for tx_hash, (escrow, nonce, _) in self._inflight.items():
+                rows[tx_hash] = (escrow, nonce)
+            for tx_hash in self._confirmed:
+                rows.pop(tx_hash, None)
+            return [(tx_hash, escrow, nonce) for tx_hash, (escrow, nonce) in rows.items()]
+
+    # ----- buffered writes -----
+    def set_last_block(self, block_number):
+        with self.lock:
+            self._last_block = block_number
+
+    def mark_processed(self, tx_hash, log_index, condition=None):
+        """condition: (verifier, condition_id) of the log, recorded in its bitmap"""
+        with self.lock:
+            key = (_hex(tx_hash), int(log_index))
+            self._unprocessed.discard(key)
+            self._processed.add(key)
+            if condition is not None:
+                self._conditions[(condition[0].lower(), int(condition[1]))] = True
+
+    def unmark_processed(self, tx_hash, log_index, condition=None):
+        """Forget a handled log whose block was orphaned by a reorg"""
+        with self.lock:
+            key = (_hex(tx_hash), int(log_index))
+            self._processed.discard(key)
+            self._unprocessed.add(key)
+            if condition is not None:
+                self._conditions[(condition[0].lower(), int(condition[1]))] = False
+
+    def save_readiness(self, escrow_address, record):
+        """record: a ReadinessTracker record"""
+        with self.lock:
+            self._readiness[escrow_address.lower()] = (
+                record['conditions'], record['fulfilled'], int(record['external']), int(record['funded']),
+                *record['position']
+            )
+
+    def forget_readiness(self, escrow_addresses):
+        with self.lock:
+            for escrow_address in escrow_addresses:
+                self._readiness[escrow_address.lower()] = None
+
+    def add_inflight(self, tx_hash, escrow_address, nonce):
+        with self.lock:
+            tx_hash = _hex(tx_hash)
+            self._confirmed.discard(tx_hash)
+            self._inflight[tx_hash] = (escrow_address, nonce, time.time())
+
+    def clear_inflight(self, tx_hash):
+        with self.lock:
+            tx_hash = _hex(tx_hash)
+            if self._inflight.pop(tx_hash, None) is None:
+                self._confirmed.add(tx_hash)
+
+    def flush(self):
+        """Write the pending batch in one transaction"""
+        with self.lock:
+            if (self._last_block is None and not self._processed and not self._unprocessed
+                    and not self._conditions and not self._readiness and not self._inflight
+                    and not self._confirmed):
+                return
+
+            with self.conn:
+                if self._last_block is not None:
+                    self.conn.execute(
+                        "INSERT INTO checkpoint (id, last_block) VALUES (0, ?) "
+                        "ON CONFLICT(id) DO UPDATE SET last_block = excluded.last_block",
+                        (self._last_block,)
+                    )
+                self.conn.executemany(
+                    "DELETE FROM processed_logs WHERE tx_hash = ? AND log_index = ?",
+                    self._unprocessed
+                )
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO processed_logs (tx_hash, log_index) VALUES (?, ?)",
+                    self._processed
+                )
+                self.write_conditions()
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO escrow_readiness "
+                    "(escrow, conditions, fulfilled, external, funded, block, log_index) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(escrow, *row) for escrow, row in self._readiness.items() if row is not None]
+                )
+                self.conn.executemany(
+                    "DELETE FROM escrow_readiness WHERE escrow = ?",
+                    [(escrow,) for escrow, row in self._readiness.items() if row is None]
+                )
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO inflight_releases (tx_hash, escrow, nonce, sent_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    [(tx_hash, *row) for tx_hash, row in self._inflight.items()]
+                )
+                self.conn.executemany(
+                    "DELETE FROM inflight_releases WHERE tx_hash = ?",
+                    [(tx_hash,) for tx_hash in self._confirmed]
+                )
+
+            self._last_block = None
+            self._processed.clear()
+            self._unprocessed.clear()
+            self._conditions.clear()
+            self._readiness.clear()
+            self._inflight.clear()
+            self._confirmed.clear()
+
+    def write_conditions(self):
+        """
+        Apply the pending condition changes to the stored bitmaps (inside
+        flush's transaction). Each bitmap is read back and updated rather
+        than overwritten, so processes sharing the file keep each other's bits.
+        """
+        changes = {}
+        for (verifier, condition_id), handled in self._conditions.items():
+            changes.setdefault(verifier, []).append((condition_id, handled))
+        for verifier, updates in changes.items():
+            row = self.conn.execute(
+                "SELECT bitmap FROM processed_conditions WHERE verifier = ?", (verifier,)
+            ).fetchone()
+            bitmap = ConditionBitmap.from_bytes(row[0] if row else b'')
+            for condition_id, handled in updates:
+                if handled:
+                    bitmap.add(condition_id)
+                else:
+                    bitmap.discard(condition_id)
+            self.conn.execute(
+                "INSERT INTO processed_conditions (verifier, bitmap) VALUES (?, ?) "
+                "ON CONFLICT(verifier) DO UPDATE SET bitmap = excluded.bitmap",
+                (verifier, bitmap.to_bytes())
+            )
+
+    # ----- failed releases (written through) -----
+    def retries(self):
+        """Releases waiting for a retry: [(escrow, condition_id, attempts, next_at, last_error)]"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT escrow, condition_id, attempts, next_at, last_error FROM release_retries ORDER BY next_at"
+            ).fetchall()
+
+    def retry_attempts(self, escrow_address):
+        """Failed attempts so far of the release of escrow_address, or None if it has no retry"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT attempts FROM release_retries WHERE escrow = ?", (escrow_address.lower(),)
+            ).fetchone()
+            return row[0] if row else None
+
+    def save_retry(self, escrow_address, condition_id, attempts, next_at, error):
+        with self.lock:
+            with self.conn:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO release_retries (escrow, condition_id, attempts, next_at, last_error) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (escrow_address.lower(), condition_id, attempts, next_at, error)
+                )
+
+    def clear_retry(self, escrow_address):
+        with self.lock:
+            with self.conn:
+                self.conn.execute("DELETE FROM release_retries WHERE escrow = ?", (escrow_address.lower(),))
+
+    def dead_letter(self, escrow_address, condition_id, attempts, reason):
+        """Give up on a release: move it from the retries to the dead-letter table"""
+        with self.lock:
+            with self.conn:
+                self.conn.execute("DELETE FROM release_retries WHERE escrow = ?", (escrow_address.lower(),))
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO dead_letters (escrow, condition_id, attempts, reason, failed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (escrow_address.lower(), condition_id, attempts, reason, time.time())
+                )
+
+    def dead_letters(self):
+        """[(escrow, condition_id, attempts, reason, failed_at)], oldest first"""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT escrow, condition_id, attempts, reason, failed_at FROM dead_letters ORDER BY failed_at"
+            ).fetchall()
+
+    def replay_dead_letters(self, escrow_addresses=None):
+        """
+        Move dead letters (all, or those of escrow_addresses) back to the
+        retries, due now and with a fresh attempt budget; returns how many
+        """
+        with self.lock:
+            rows = self.dead_letters()
+            if escrow_addresses is not None:
+                wanted = {address.lower() for address in escrow_addresses}
+                rows = [row for row in rows if row[0] in wanted]
+            with self.conn:
+                for escrow, condition_id, _, reason, _ in rows:
+                    self.conn.execute("DELETE FROM dead_letters WHERE escrow = ?", (escrow,))
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO release_retries (escrow, condition_id, attempts, next_at, last_error) "
+                        "VALUES (?, ?, 0, ?, ?)",
+                        (escrow, condition_id, time.time(), reason)
+                    )
+            return len(rows)
+
+    def close(self):
+        with self.lock:
+            self.flush()
+            self.conn.close()
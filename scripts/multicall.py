@@ -0,0 +1,172 @@
+"""
+Python helpers for contracts/EscrowMulticall.vy
+Reads many escrows (or arbitrary view calls) in a single eth_call
+
+Deploy once per network and record it (in testnet.json, or the registry):
+    python scripts/multicall.py deploy
+Check escrows by hand:
+    python scripts/multicall.py ready <escrow_address> [<escrow_address> ...]
+"""
+
+import sys
+import getpass
+from datetime import datetime, timezone
+from eth_utils import get_abi_output_types
+from web3 import Web3
+
+from nonceManager import NonceManager
+from contractCache import load_abi
+from deploymentRegistry import append_deployments, latest_deployment
+
+GANACHE_URL = "http://127.0.0.1:8545"
+MULTICALL_ABI_PATH = "contracts/EscrowMulticall.abi"
+MULTICALL_BIN_PATH = "contracts/EscrowMulticall.bin"
+
+# Escrows per eth_call: keeps each call well under the node's eth_call gas cap
+# (the contract itself accepts up to MAX_ESCROWS = 500)
+READY_BATCH_SIZE = 200
+AGGREGATE_BATCH_SIZE = 256  # MAX_CALLS in the contract
+
+
+def load_multicall(w3, address):
+    """Contract instance for a deployed EscrowMulticall"""
+    return w3.eth.contract(address=address, abi=load_abi(MULTICALL_ABI_PATH))
+
+
+def deploy_multicall(w3, private_key):
+    """Deploy EscrowMulticall; returns (address, tx_hash)"""
+    abi = load_abi(MULTICALL_ABI_PATH)
+    with open(MULTICALL_BIN_PATH) as f:
+        bytecode = f.read().strip()
+
+    deployer = w3.eth.account.from_key(private_key).address
+    nonces = NonceManager(w3)
+    tx_hash, _ = nonces.send(w3.eth.contract(abi=abi, bytecode=bytecode).constructor(), {
+        "from": deployer,
+        "gas": 2000000,
+        "gasPrice": w3.to_wei("20", "gwei"),
+    }, private_key)
+    receipt = nonces.wait(tx_hash)
+    assert receipt.status == 1, "EscrowMulticall deployment failed"
+    return receipt.contractAddress, tx_hash
+
+
+def _ready_batches(escrow_addresses, batch_size):
+    addresses = [Web3.to_checksum_address(a) for a in escrow_addresses]
+    return [addresses[i:i + batch_size] for i in range(0, len(addresses), batch_size)]
+
+
+def _statuses(rows):
+    return {
+        escrow: {
+            'seller': seller,
+            'state': state,
+            'internal_fulfilled': internal_ok,
+            'external_fulfilled': external_ok,
+            'ready': ready,
+        }
+        for escrow, seller, state, internal_ok, external_ok, ready in rows
+    }
+
+
+def check_release_ready(multicall, escrow_addresses, batch_size=READY_BATCH_SIZE):
+    """
+    Release readiness of many escrows, one eth_call per batch_size escrows.
+
+    Returns: {escrow_address: {'seller', 'state', 'internal_fulfilled',
+                               'external_fulfilled', 'ready'}}
+    """
+    statuses = {}
+    for batch in _ready_batches(escrow_addresses, batch_size):
+        statuses.update(_statuses(multicall.functions.check_release_ready(batch).call()))
+    return statuses
+
+
+def not_ready_reason(status):
+    """Why check_release_ready() found an escrow not ready (status None: missing from its result)"""
+    if status is None:
+        return "missing from the multicall result"
+    if status['state'] != 1:
+        return "escrow not funded"
+    if not status['internal_fulfilled']:
+        return "internal conditions not fulfilled"
+    if not status['external_fulfilled']:
+        return "external condition not fulfilled"
+    return "not ready"
+
+
+async def check_release_ready_async(multicall, escrow_addresses, batch_size=READY_BATCH_SIZE):
+    """check_release_ready() for a contract attached to an AsyncWeb3 instance"""
+    statuses = {}
+    for batch in _ready_batches(escrow_addresses, batch_size):
+        statuses.update(_statuses(await multicall.functions.check_release_ready(batch).call()))
+    return statuses
+
+
+def aggregate(multicall, calls, batch_size=AGGREGATE_BATCH_SIZE):
+    """
+    Run view calls (e.g. escrow.functions.state()) in as few eth_calls as
+    possible. Returns one entry per call: the decoded output (a single value
+    is unwrapped) or None if that call reverted.
+    """
+    w3 = multicall.w3
+    results = []
+    for i in range(0, len(calls), batch_size):
+        batch = calls[i:i + batch_size]
+        encoded = [(fn.address, fn._encode_transaction_data()) for fn in batch]
+        for fn, (success, data) in zip(batch, multicall.functions.aggregate(encoded).call()):
+            if not success:
+                results.append(None)
+                continue
+            decoded = w3.codec.decode(get_abi_output_types(fn.abi), data)
+            results.append(decoded[0] if len(decoded) == 1 else decoded)
+    return results
+
+
+def record_deployment(address, tx_hash, deployer):
+    """Record the EscrowMulticall deployment"""
+    timestamp = datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+    append_deployments([{
+        "contract": "EscrowMulticall",
+        "address": address,
+        "txHash": tx_hash.hex(),
+        "deployer": deployer,
+        "timestamp": timestamp,
+        "constructorArgs": []
+    }])
+
+
+def latest_multicall_address():
+    """Address of the most recently recorded EscrowMulticall, or None"""
+    deployment = latest_deployment("EscrowMulticall")
+    return deployment and deployment["address"]
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in ("deploy", "ready"):
+        print("Usage: python scripts/multicall.py deploy")
+        print("       python scripts/multicall.py ready <escrow_address> [<escrow_address> ...]")
+        sys.exit(1)
+
+    w3 = Web3(Web3.HTTPProvider(GANACHE_URL))
+    assert w3.is_connected(), "Web3 not connected to Ganache!"
+
+    if sys.argv[1] == "deploy":
+        private_key = getpass.getpass(prompt="Enter deployer private key: ")
+        address, tx_hash = deploy_multicall(w3, private_key)
+        record_deployment(address, tx_hash, w3.eth.account.from_key(private_key).address)
+        print(f"EscrowMulticall deployed at: {address}")
+        print("Deployment recorded")
+        return
+
+    multicall_address = latest_multicall_address()
+    assert multicall_address, "No EscrowMulticall recorded (run: python scripts/multicall.py deploy)"
+    statuses = check_release_ready(load_multicall(w3, multicall_address), sys.argv[2:])
+    for escrow, status in statuses.items():
+        flag = "✅" if status['ready'] else "❌"
+        print(f"{flag} {escrow} | state={status['state']} "
+              f"internal={status['internal_fulfilled']} external={status['external_fulfilled']}")
+
+
+if __name__ == "__main__":
+    main()
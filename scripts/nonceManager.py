@@ -0,0 +1,159 @@
+"""
+Local nonce manager shared by the keeper, interact.py, deploy.py and the tests
+Nonces are reserved from an in-process counter per sender instead of calling
+eth_getTransactionCount before every transaction, so one account can send a
+run of transactions back-to-back and confirm them afterwards
+"""
+
+import threading
+from web3.exceptions import TimeExhausted, TransactionNotFound
+
+# Substrings of node errors that mean our local counter is out of step
+# (geth/erigon, ganache, eth-tester wording)
+NONCE_ERROR_MARKERS = (
+    "nonce too low",
+    "nonce too high",
+    "correct nonce",
+    "invalid transaction nonce",
+    "already known",
+    "replacement transaction underpriced",
+)
+
+
+def is_nonce_error(error):
+    """Whether an exception from send_raw_transaction is a nonce mismatch"""
+    message = str(error).lower()
+    return any(marker in message for marker in NONCE_ERROR_MARKERS)
+
+
+class NonceManager:
+    """
+    Per-sender nonce reservation with resync on gaps and dropped transactions.
+
+    The first reservation for an address reads the node's pending transaction
+    count; after that nonces come from a local counter. If a send fails, the
+    node reports a nonce mismatch, or a sent transaction disappears from the
+    node, the counter is re-read from the node.
+
+    With a ReceiptTracker, receipts are collected by its batched polling
+    instead of one wait_for_transaction_receipt loop per transaction.
+    """
+
+    def __init__(self, w3, retries=1, receipts=None):
+        self.w3 = w3
+        self.retries = retries  # extra attempts after a nonce error
+        self.receipts = receipts  # optional ReceiptTracker
+        self._lock = threading.Lock()
+        self._next = {}  # sender -> next nonce to hand out
+        self._sent = {}  # sender -> {nonce: tx_hash} not yet confirmed
+
+    def reserve(self, address):
+        """Reserve and return the next nonce for address"""
+        with self._lock:
+            if address not in self._next:
+                self._next[address] = self.w3.eth.get_transaction_count(address, 'pending')
+            nonce = self._next[address]
+            self._next[address] += 1
+            return nonce
+
+    def resync(self, address):
+        """Re-read the next nonce for address from the node"""
+        with self._lock:
+            self._next[address] = self.w3.eth.get_transaction_count(address, 'pending')
+            mined = self.w3.eth.get_transaction_count(address, 'latest')
+            sent = self._sent.get(address, {})
+            for nonce in [n for n in sent if n < mined]:
+                del sent[nonce]
+
+    def send(self, call, tx_params, private_key):
+        """
+        Build `call` (a contract function or constructor) with the next local
+        nonce, sign it and broadcast it without waiting for the receipt.
+        Retries with a fresh nonce (up to self.retries times) if the node
+        rejects the nonce, e.g. because another process sent from the same
+        account.
+
+        Returns: (tx_hash, nonce)
+        """
+        sender = tx_params['from']
+        for attempt in range(self.retries + 1):
+            nonce = self.reserve(sender)
+            try:
+                tx = call.build_transaction({**tx_params, 'nonce': nonce})
+                signed = self.w3.eth.account.sign_transaction(tx, private_key)
+                tx_hash = self.w3.eth.send_raw_transaction(signed.raw_transaction)
+            except Exception as e:
+                # The reserved nonce was never used: close the gap
+                self.resync(sender)
+                if attempt < self.retries and is_nonce_error(e):
+                    continue
+                raise
+
+            with self._lock:
+                self._sent.setdefault(sender, {})[nonce] = tx_hash
+            return tx_hash, nonce
+
+    def replace(self, call, tx_params, private_key, nonce):
+        """
+        Re-send `call` with an already used nonce (e.g. with higher fees, to
+        unstick it). Whichever of the transactions is mined wins; node
+        errors, such as the nonce having been mined meanwhile, propagate.
+
+        Returns: tx_hash of the replacement
+        """
+        sender = tx_params['from']
+        tx = call.build_transaction({**tx_params, 'nonce': nonce})
+        signed = self.w3.eth.account.sign_transaction(tx, private_key)
+        tx_hash = self.w3.eth.send_raw_transaction(signed.raw_transaction)
+        with self._lock:
+            self._sent.setdefault(sender, {})[nonce] = tx_hash
+        return tx_hash
+
+    def wait(self, tx_hash, timeout=120):
+        """
+        Wait for the receipt of a transaction sent through send().
+        If the node no longer knows the transaction it was dropped: the
+        sender's counter is resynced and TransactionNotFound is raised.
+        """
+        if self.receipts is not None:
+            return self.settle(tx_hash, self.track(tx_hash, timeout))
+        try:
+            receipt = self.w3.eth.wait_for_transaction_receipt(tx_hash, timeout=timeout)
+        except TimeExhausted:
+            self._check_dropped(tx_hash)
+            raise
+        self._forget(tx_hash)
+        return receipt
+
+    def track(self, tx_hash, timeout=120):
+        """Non-blocking wait(): a Future of the receipt (needs a ReceiptTracker)"""
+        return self.receipts.track(tx_hash, timeout=timeout)
+
+    def settle(self, tx_hash, future):
+        """Receipt from a track() future, with the same dropped-transaction handling as wait()"""
+        try:
+            receipt = future.result()
+        except TimeExhausted:
+            self._check_dropped(tx_hash)
+            raise
+        self._forget(tx_hash)
+        return receipt
+
+    def _forget(self, tx_hash):
+        with self._lock:
+            for sent in self._sent.values():
+                for nonce, sent_hash in list(sent.items()):
+                    if sent_hash == tx_hash:
+                        del sent[nonce]
+                        return
+
+    def _check_dropped(self, tx_hash):
+        try:
+            self.w3.eth.get_transaction(tx_hash)
+        except TransactionNotFound:
+            with self._lock:
+                senders = [s for s, sent in self._sent.items() if tx_hash in sent.values()]
+            self._forget(tx_hash)
+            for sender in senders:
+                self.resync(sender)
+            raise
@@ -0,0 +1,144 @@
+"""
+Release readiness of escrows, kept up to date from their events
+An escrow can be released once it is funded, every internal condition the
+buyer added is fulfilled and its external ConditionVerifier condition is met.
+Rather than re-reading each escrow's storage, the keeper keeps one small
+record per escrow and folds in the logs it scans anyway:
+
+    Escrow.ConditionAdded          sets bit `index` of the condition mask
+    Escrow.ConditionFulfilled      sets bit `index` of the fulfilled mask
+    Escrow.Deposited               funded
+    Escrow.Released / Refunded     no longer funded
+    ConditionVerifier.ConditionFulfilled (linked condition)   external met
+
+so the escrow is known to be ready the moment the last of these arrives,
+in whichever order they come.
+
+Given the keeper's checkpoint store, records are saved with each poll
+cycle and restored on startup, so a restart reads history only for escrows
+it has no record of.
+"""
+
+from hexbytes import HexBytes
+
+ESCROW_EVENTS = ('ConditionAdded', 'ConditionFulfilled', 'Deposited', 'Released', 'Refunded')
+
+
+def is_ready(record):
+    return record['funded'] and record['external'] and record['fulfilled'] == record['conditions']
+
+
+class ReadinessTracker:
+    def __init__(self, w3, escrow_abi, store=None, checkpoint=None):
+        """
+        store: KeeperCheckpointStore to save records in and restore them from
+        checkpoint: the store's last fully processed block. Saved records
+        with events past it are not restored, as a release those events made
+        due may not have run: they are read from history again.
+        """
+        events = w3.eth.contract(abi=escrow_abi).events
+        self.events = {}  # topic -> Escrow event ABI
+        self.topics = []  # topics of the Escrow events readiness depends on
+        for name in ESCROW_EVENTS:
+            event = getattr(events, name)()
+            self.events[HexBytes(event.topic)] = event
+            self.topics.append(event.topic)
+        self.records = {}  # escrow address lowercase -> readiness record
+        self.store = store
+        self.saved = {}  # escrow address lowercase -> saved record not tracked yet
+        if store is not None and checkpoint is not None:
+            self.saved = {escrow: row for escrow, row in store.readiness().items() if row[4][0] <= checkpoint}
+
+    def __contains__(self, escrow_address):
+        return escrow_address.lower() in self.records
+
+    def __len__(self):
+        return len(self.records)
+
+    # ----- records -----
+    def track(self, escrow):
+        """
+        Start the record of an escrow (from load_deployments): its saved one
+        if there is one, else an empty one. Returns True if it was restored.
+        """
+        key = escrow['address'].lower()
+        record = {
+            'escrow': escrow,
+            'conditions': 0,  # bit i set: internal condition i exists
+            'fulfilled': 0,  # bit i set: internal condition i is fulfilled
+            'external': int(escrow['condition_verifier'], 16) == 0,  # no verifier: nothing to wait for
+            'funded': False,
+            'position': (-1, -1),  # (block, log index) of the last event applied
+        }
+        saved = self.saved.pop(key, None)
+        if saved is not None:
+            record['conditions'], record['fulfilled'], record['external'], record['funded'], record['position'] = saved
+        self.records[key] = record
+        self._save(key)
+        return saved is not None
+
+    def _save(self, key):
+        if self.store is not None:
+            self.store.save_readiness(key, self.records[key])
+
+    def rewind(self, block_number):
+        """
+        Forget escrows with events applied after block_number (orphaned by a
+        reorg); they are tracked again from their history. Returns how many.
+        """
+        stale = [key for key, record in self.records.items() if record['position'][0] > block_number]
+        stale += [key for key, row in self.saved.items() if row[4][0] > block_number]
+        self.forget(stale)
+        return len(stale)
+
+    def forget(self, escrow_addresses):
+        keys = [escrow_address.lower() for escrow_address in escrow_addresses]
+        for key in keys:
+            self.records.pop(key, None)
+            self.saved.pop(key, None)
+        if self.store is not None:
+            self.store.forget_readiness(keys)
+
+    # ----- events -----
+    def decode(self, log):
+        """Decoded Escrow event for a raw log, or None if readiness does not depend on it"""
+        event = self.events.get(HexBytes(log['topics'][0])) if log['topics'] else None
+        return event.process_log(log) if event is not None else None
+
+    def _advance(self, record, event):
+        """Move the record past event; False if it was already applied"""
+        position = (event['blockNumber'], event['logIndex'])
+        if position <= record['position']:
+            return False
+        record['position'] = position
+        return True
+
+    def apply(self, event):
+        """Fold a decoded Escrow event in; returns the escrow record if it just became ready"""
+        record = self.records.get(event['address'].lower())
+        if record is None or not self._advance(record, event):
+            return None
+
+        was_ready = is_ready(record)
+        name = event['event']
+        if name == 'ConditionAdded':
+            record['conditions'] |= 1 << event['args']['index']
+        elif name == 'ConditionFulfilled':
+            record['fulfilled'] |= 1 << event['args']['index']
+        elif name == 'Deposited':
+            record['funded'] = True
+        else:
+            record['funded'] = False  # Released or Refunded: nothing left to release
+        self._save(event['address'].lower())
+        return record['escrow'] if is_ready(record) and not was_ready else None
+
+    def set_external(self, escrow_address, event):
+        """Mark the external condition met by a ConditionVerifier event; as apply()"""
+        record = self.records.get(escrow_address.lower())
+        if record is None or not self._advance(record, event):
+            return None
+
+        was_ready = is_ready(record)
+        record['external'] = True
+        self._save(escrow_address.lower())
+        return record['escrow'] if is_ready(record) and not was_ready else None
@@ -0,0 +1,223 @@
+"""
+Background receipt tracker
+Holds the hashes of sent transactions and, once per new block, asks the node
+for all of their receipts in a single JSON-RPC batch. Each tracked
+transaction gets a concurrent.futures.Future (and optional callback) that
+resolves as soon as its receipt shows up, so senders never block on
+wait_for_transaction_receipt and RPC load follows blocks, not pending
+transactions.
+
+Reverted receipts come back with a 'revertReason' field, decoded by
+replaying the transaction with eth_call on the state before its block.
+"""
+
+import time
+import logging
+import threading
+from concurrent.futures import Future
+from web3.datastructures import AttributeDict
+from web3.exceptions import ContractLogicError, TimeExhausted, TransactionNotFound
+
+from keeperStore import _hex
+from retryScheduler import revert_reason
+
+log = logging.getLogger("receiptTracker")
+
+RECEIPT_POLL_INTERVAL = 0.25  # seconds between eth_blockNumber checks
+RECEIPT_TIMEOUT = 120  # seconds before a tracked transaction fails with TimeExhausted
+
+
+def decode_revert_reason(w3, receipt):
+    """
+    Revert reason of a failed transaction (None if it can't be recovered),
+    from replaying it on the state before its block: the state after it may
+    no longer fail, or fail for another reason
+    """
+    try:
+        tx = w3.eth.get_transaction(receipt['transactionHash'])
+        w3.eth.call({
+            'from': tx['from'],
+            'to': tx['to'],
+            'data': tx['input'],
+            'value': tx['value'],
+            'gas': tx['gas'],
+        }, receipt['blockNumber'] - 1)
+    except ContractLogicError as e:
+        return revert_reason(e)
+    except Exception:
+        return None
+    return None
+
+
+async def decode_revert_reason_async(w3, receipt):
+    """decode_revert_reason() for an AsyncWeb3 instance"""
+    try:
+        tx = await w3.eth.get_transaction(receipt['transactionHash'])
+        await w3.eth.call({
+            'from': tx['from'],
+            'to': tx['to'],
+            'data': tx['input'],
+            'value': tx['value'],
+            'gas': tx['gas'],
+        }, receipt['blockNumber'] - 1)
+    except ContractLogicError as e:
+        return revert_reason(e)
+    except Exception:
+        return None
+    return None
+
+
+class ReceiptTracker:
+    """
+    Resolves futures for sent transactions from batched receipt polling.
+
+        tracker = ReceiptTracker(w3)
+        future = tracker.track(tx_hash, callback=on_mined)
+        ...
+        receipt = future.result()   # or tracker.wait(tx_hash)
+
+    Callbacks run on the tracker thread with (tx_hash, receipt); keep them
+    short and thread-safe. Call stop() when done (the thread is a daemon, so
+    a forgotten tracker does not keep the process alive).
+    """
+
+    def __init__(self, w3, poll_interval=RECEIPT_POLL_INTERVAL, timeout=RECEIPT_TIMEOUT):
+        self.w3 = w3
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._pending = {}  # tx hash (0x hex) -> (future, callback, deadline)
+        self._unchecked = False  # hashes added since the last batch
+        self._last_head = None
+        self.head = None  # latest block number seen by the tracker
+        self._batch_supported = hasattr(w3.provider, 'make_batch_request')
+        self._thread = threading.Thread(target=self._run, name="receipt-tracker", daemon=True)
+        self._thread.start()
+
+    # ----- public API -----
+    def track(self, tx_hash, callback=None, timeout=None):
+        """Start tracking a sent transaction; returns a Future of its receipt"""
+        key = _hex(tx_hash)
+        future = Future()
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        with self._lock:
+            if key in self._pending:
+                return self._pending[key][0]
+            self._pending[key] = (future, callback, deadline)
+            self._unchecked = True
+        self._wakeup.set()
+        return future
+
+    def wait(self, tx_hash, timeout=None):
+        """Blocking helper: track tx_hash and return its receipt"""
+        return self.track(tx_hash, timeout=timeout).result()
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+        self._thread.join()
+
+    # ----- tracker thread -----
+    def _run(self):
+        while not self._stopped.is_set():
+            with self._lock:
+                idle = not self._pending
+            if idle:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            try:
+                self._poll()
+            except Exception as e:
+                log.warning("Receipt polling failed", extra={'error': str(e)})
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _poll(self):
+        head = self.w3.eth.block_number
+        self.head = head
+        with self._lock:
+            if head == self._last_head and not self._unchecked:
+                self._expire()
+                return
+            self._unchecked = False
+            hashes = list(self._pending)
+
+        try:
+            receipts = self._fetch_receipts(hashes)
+        except Exception:
+            with self._lock:
+                self._unchecked = True  # retry on the next tick, not the next block
+            raise
+        self._last_head = head
+
+        for tx_hash, receipt in receipts.items():
+            if receipt['status'] == 0:
+                receipt = AttributeDict({**receipt, 'revertReason': decode_revert_reason(self.w3, receipt)})
+            self._resolve(tx_hash, receipt)
+
+        with self._lock:
+            self._expire()
+
+    def _fetch_receipts(self, hashes):
+        """{tx_hash: receipt} for the hashes that have been mined"""
+        if self._batch_supported:
+            try:
+                responses = self.w3.provider.make_batch_request(
+                    [("eth_getTransactionReceipt", [tx_hash]) for tx_hash in hashes]
+                )
+            except NotImplementedError:
+                self._batch_supported = False
+            else:
+                if isinstance(responses, dict):  # the node rejected the whole batch
+                    raise RuntimeError(responses.get('error'))
+                mined = [
+                    tx_hash for tx_hash, response in zip(hashes, responses)
+                    if response.get('result')
+                ]
+                if not mined:
+                    return {}
+                # Second batch, through web3, only for what is known to be mined
+                # so the receipts come back formatted as usual
+                with self.w3.batch_requests() as batch:
+                    for tx_hash in mined:
+                        batch.add(self.w3.eth.get_transaction_receipt(tx_hash))
+                    return dict(zip(mined, batch.execute()))
+
+        # Providers without batching: one request per pending transaction
+        receipts = {}
+        for tx_hash in hashes:
+            try:
+                receipts[tx_hash] = self.w3.eth.get_transaction_receipt(tx_hash)
+            except TransactionNotFound:
+                pass
+        return receipts
+
+    def _resolve(self, tx_hash, receipt):
+        with self._lock:
+            entry = self._pending.pop(tx_hash, None)
+        if entry is None:
+            return
+        future, callback, _ = entry
+        future.set_result(receipt)
+        if callback is not None:
+            try:
+                callback(tx_hash, receipt)
+            except Exception as e:
+                log.warning("Receipt callback failed", extra={'tx_hash': tx_hash, 'error': str(e)})
+
+    def _expire(self):
+        # Caller holds self._lock
+        now = time.monotonic()
+        for tx_hash, (future, _, deadline) in list(self._pending.items()):
+            if now > deadline:
+                del self._pending[tx_hash]
+                future.set_exception(TimeExhausted(
+                    f"Transaction {tx_hash} is not in the chain after tracking timeout"
+                ))
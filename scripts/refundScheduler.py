@@ -0,0 +1,210 @@
+"""
+Deadline scheduler for automatic refunds
+Keeps every funded escrow of the keeper's buyer account in a min-heap keyed
+by its refund deadline (start + timeout). The keeper sleeps until the
+earliest deadline and then pops only the escrows that are due, so a wake-up
+costs O(log n) per due escrow however many escrows are live; nothing is
+rescanned on a tick.
+
+EscrowStatus events keep the heap current: a deposit schedules the escrow,
+a release or refund cancels it. Cancelled entries are not searched for in
+the heap; they are dropped when they reach the top.
+"""
+
+import time
+import heapq
+import logging
+from web3.exceptions import ContractLogicError
+
+from contractCache import load_abi
+from multicall import MULTICALL_ABI_PATH, aggregate
+
+ESCROW_ABI_PATH = "contracts/Escrow.abi"
+log = logging.getLogger("refundScheduler")
+
+REFUND_GAS = 300000
+REFUND_RETRY_SECONDS = 2  # re-check an escrow the pending block still considers too early
+
+
+def address_topic(address):
+    """32-byte log topic of an indexed address argument"""
+    return '0x' + address[2:].lower().rjust(64, '0')
+
+
+class RefundScheduler:
+    def __init__(self, w3, buyer_account, nonces, fees, contracts):
+        self.w3 = w3
+        self.buyer_account = buyer_account
+        self.buyer_address = buyer_account.address
+        self.nonces = nonces
+        self.fees = fees
+        self.contracts = contracts
+        self.escrow_abi = load_abi(ESCROW_ABI_PATH)
+        self.status_event = w3.eth.contract(abi=self.escrow_abi).events.EscrowStatus()
+
+        self.heap = []  # (due time, escrow address lowercase)
+        self.due = {}  # escrow address lowercase -> due time of its live heap entry
+        self.deadlines = {}  # escrow address lowercase -> (checksum address, start + timeout)
+        self.records_seen = 0  # escrow records of the deployments already read
+        self.clock_offset = 0  # chain time ahead of the local clock, in seconds
+        self.pending = []  # (escrow address, tx hash, receipt future)
+
+    # ----- escrows and deadlines -----
+    def track(self, deployments):
+        """Read start/timeout/state of escrows recorded since the last call"""
+        escrows = deployments['escrow_contracts']
+        if len(escrows) < self.records_seen:
+            self.records_seen = 0  # deployments were reloaded from scratch
+        new = [
+            escrow for escrow in escrows[self.records_seen:]
+            if escrow['address'].lower() not in self.deadlines
+            and (escrow.get('buyer') or self.buyer_address).lower() == self.buyer_address.lower()
+        ]
+        self.records_seen = len(escrows)
+        if not new:
+            return
+
+        contracts = [self.contracts.get(escrow['address'], self.escrow_abi) for escrow in new]
+        calls = [
+            call for contract in contracts
+            for call in (contract.functions.start(), contract.functions.timeout(), contract.functions.state())
+        ]
+        if deployments['multicall']:
+            multicall = self.contracts.get(deployments['multicall'], load_abi(MULTICALL_ABI_PATH))
+            results = aggregate(multicall, calls)
+        else:
+            results = [call.call() for call in calls]
+
+        for i, contract in enumerate(contracts):
+            start, timeout, state = results[3 * i:3 * i + 3]
+            if start is None:
+                continue
+            self.deadlines[contract.address.lower()] = (contract.address, start + timeout)
+            if state == 1:
+                self.schedule(contract.address)
+
+    def schedule(self, escrow_address, due=None):
+        """Put a funded escrow on the heap at its deadline (or at `due`)"""
+        key = escrow_address.lower()
+        if due is None:
+            due = self.deadlines[key][1]
+        self.due[key] = due
+        heapq.heappush(self.heap, (due, key))
+
+    def cancel(self, escrow_address):
+        self.due.pop(escrow_address.lower(), None)
+
+    def scan(self, from_block, to_block):
+        """Apply the EscrowStatus events of the buyer's escrows in [from_block, to_block]"""
+        if from_block > to_block:
+            return
+        logs = self.w3.eth.get_logs({
+            'topics': [self.status_event.topic, address_topic(self.buyer_address)],
+            'fromBlock': from_block,
+            'toBlock': to_block
+        })
+        for entry in logs:
+            key = entry['address'].lower()
+            if key not in self.deadlines:
+                continue  # not recorded yet; track() reads its state when it is
+            if self.status_event.process_log(entry)['args']['state'] == 1:
+                self.schedule(key)
+            else:
+                self.cancel(key)
+
+    # ----- clock -----
+    def sync_clock(self, block_timestamp):
+        """Follow chains whose clock runs ahead of ours (e.g. after evm_increaseTime)"""
+        self.clock_offset = max(0, block_timestamp - time.time())
+
+    def now(self):
+        return time.time() + self.clock_offset
+
+    def seconds_until_due(self):
+        """Seconds until the earliest deadline passes, or None if nothing is scheduled"""
+        while self.heap and self.due.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)  # cancelled or rescheduled
+        if not self.heap:
+            return None
+        # refund() needs block.timestamp > start + timeout
+        return max(0, self.heap[0][0] + 1 - self.now())
+
+    # ----- refunds -----
+    def run_due(self):
+        """Refund every escrow whose deadline has passed; returns how many were sent"""
+        sent = 0
+        now = self.now()
+        while self.heap and self.heap[0][0] < now:
+            due, key = heapq.heappop(self.heap)
+            if self.due.get(key) != due:
+                continue
+            del self.due[key]
+            sent += self.attempt_refund(self.deadlines[key][0])
+        return sent
+
+    def attempt_refund(self, escrow_address):
+        """Refund one escrow if the pending block would accept it"""
+        escrow_contract = self.contracts.get(escrow_address, self.escrow_abi)
+        log.info("Refund deadline passed", extra={'escrow': escrow_address})
+        try:
+            escrow_contract.functions.refund().call({'from': self.buyer_address}, block_identifier='pending')
+        except Exception as e:
+            reason = str(e)
+            if "timeout has not passed" in reason:
+                # The pending block's clock lags ours; it catches up with the next block
+                self.schedule(escrow_address, self.now() + REFUND_RETRY_SECONDS)
+                log.info("Not yet refundable on chain, retrying", extra={
+                    'escrow': escrow_address, 'retry_seconds': REFUND_RETRY_SECONDS
+                })
+            elif isinstance(e, ContractLogicError) or "revert" in reason:
+                # Conditions met (the seller releases it) or no longer funded
+                log.info("Not refunding", extra={'escrow': escrow_address, 'reason': reason})
+            else:
+                self.schedule(escrow_address, self.now() + REFUND_RETRY_SECONDS)
+                log.warning("Refund pre-check failed, retrying", extra={
+                    'escrow': escrow_address, 'error': reason, 'retry_seconds': REFUND_RETRY_SECONDS
+                })
+            return 0
+
+        try:
+            tx_hash, _ = self.nonces.send(
+                escrow_contract.functions.refund(),
+                {'from': self.buyer_address, 'gas': REFUND_GAS, **self.fees.current()},
+                self.buyer_account.key
+            )
+        except Exception as e:
+            self.schedule(escrow_address, self.now() + REFUND_RETRY_SECONDS)
+            log.error("Error sending refund", extra={'escrow': escrow_address, 'error': str(e)})
+            return 0
+        log.info("Refund sent", extra={'escrow': escrow_address, 'tx_hash': tx_hash})
+        self.pending.append((escrow_address, tx_hash, self.nonces.track(tx_hash)))
+        return 1
+
+    def settle(self):
+        """Report refunds whose receipts have arrived, without blocking"""
+        still_pending = []
+        for escrow_address, tx_hash, future in self.pending:
+            if not future.done():
+                still_pending.append((escrow_address, tx_hash, future))
+                continue
+            try:
+                receipt = self.nonces.settle(tx_hash, future)
+            except Exception as e:
+                # Dropped or timed out: try again
+                log.warning("Refund not mined, retrying", extra={
+                    'escrow': escrow_address, 'tx_hash': tx_hash, 'error': str(e)
+                })
+                self.schedule(escrow_address, self.now())
+                continue
+            if receipt.status == 1:
+                log.info("Refund successful", extra={
+                    'escrow': escrow_address, 'tx_hash': tx_hash, 'gas_used': receipt.gasUsed
+                })
+            else:
+                log.error("Refund reverted", extra={
+                    'escrow': escrow_address, 'tx_hash': tx_hash, 'reason': receipt.get('revertReason')
+                })
+                # Mined before the deadline by the block's clock; the next
+                # pre-check drops the escrow if it can never be refunded
+                self.schedule(escrow_address, self.now() + REFUND_RETRY_SECONDS)
+        self.pending = still_pending
@@ -0,0 +1,89 @@
+"""
+Reorg detection for the keeper
+Remembers the hashes of the most recent blocks the keeper has handled (the
+checkpoint block of every cycle and every block a ConditionFulfilled event
+came from) in a fixed-size ring buffer, so memory stays constant however
+long the keeper runs. Each cycle the newest entry is compared with the node's
+canonical chain; on a mismatch the buffer is walked back to the last block
+still on the chain, and the events recorded above it are handed back to be
+retracted and scanned again.
+"""
+
+from collections import deque
+
+from keeperStore import _hex
+
+BLOCK_HASH_HISTORY = 256  # blocks remembered; reorgs deeper than this cannot be undone exactly
+
+
+class ReorgTracker:
+    def __init__(self, size=BLOCK_HASH_HISTORY):
+        # [block_number, block_hash, [(tx_hash, log_index, (verifier, condition_id))]], ascending
+        self._blocks = deque(maxlen=size)
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def record(self, block_number, block_hash, log=None):
+        """Remember a handled block, and optionally a log handled from it"""
+        block_hash = _hex(block_hash)
+        logs = [log] if log is not None else []
+
+        if self._blocks and self._blocks[-1][0] == block_number:
+            entry = self._blocks[-1]
+            if entry[1] != block_hash:
+                entry[1], entry[2] = block_hash, []
+            entry[2].extend(logs)
+            return
+        if not self._blocks or self._blocks[-1][0] < block_number:
+            self._blocks.append([block_number, block_hash, logs])
+            return
+
+        # Out of order (a rescan of older blocks): keep the ring sorted
+        for index, entry in enumerate(self._blocks):
+            if entry[0] == block_number:
+                if entry[1] != block_hash:
+                    entry[1], entry[2] = block_hash, []
+                entry[2].extend(logs)
+                return
+            if entry[0] > block_number:
+                if index == 0 and len(self._blocks) == self._blocks.maxlen:
+                    return  # older than anything the ring still has room for
+                if len(self._blocks) == self._blocks.maxlen:
+                    self._blocks.popleft()
+                    index -= 1
+                self._blocks.insert(index, [block_number, block_hash, logs])
+                return
+
+    def find_fork(self, canonical_hash):
+        """
+        Check the newest remembered block against the chain.
+
+        canonical_hash: function of a block number returning the node's hash
+        for it (None if the chain is now shorter than that).
+
+        Returns None while the newest block is still canonical, otherwise
+        (fork_block, retracted) where fork_block is the last remembered block
+        that is still canonical (or the block before the oldest remembered
+        one, if none is) and retracted lists the (tx_hash, log_index,
+        (verifier, condition_id)) of every log recorded above it. The orphaned entries
+        are forgotten.
+        """
+        if not self._blocks:
+            return None
+
+        def canonical(block_number, block_hash):
+            found = canonical_hash(block_number)
+            return found is not None and _hex(found) == block_hash
+
+        if canonical(*self._blocks[-1][:2]):
+            return None
+
+        retracted = []
+        while self._blocks:
+            block_number, block_hash, logs = self._blocks[-1]
+            if canonical(block_number, block_hash):
+                return block_number, retracted
+            retracted.extend(logs)
+            self._blocks.pop()
+        return block_number - 1, retracted
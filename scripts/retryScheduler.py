@@ -0,0 +1,218 @@
+"""
+Retry scheduler for failed releases
+A release whose pre-check reverts (or that the multicall pre-screen finds
+not ready), whose send raises (RPC errors included) or whose transaction is
+dropped or reverts is not forgotten: it is saved in
+the keeper's state file and retried with exponential backoff on a thread of
+its own, so retries never hold up new events. A release that still fails
+after RETRY_ATTEMPTS tries moves to the dead-letter table with its decoded
+revert reason, where it can be inspected and replayed:
+
+    python scripts/retryScheduler.py retries            # releases waiting for a retry
+    python scripts/retryScheduler.py dead               # releases given up on
+    python scripts/retryScheduler.py replay <escrow>    # retry again (or --all)
+
+A running keeper picks replayed releases up within RETRY_RELOAD_SECONDS.
+"""
+
+import time
+import heapq
+import logging
+import argparse
+import threading
+from datetime import datetime
+from web3.exceptions import ContractLogicError
+
+from keeperStore import KeeperCheckpointStore
+
+log = logging.getLogger("retryScheduler")
+
+STATE_PATH = "deployments/keeper_state.db"
+RETRY_BASE_SECONDS = 5  # delay after the first failure, doubled after each further one
+RETRY_MAX_SECONDS = 600
+RETRY_ATTEMPTS = 8  # failures before a release moves to the dead-letter table
+RETRY_RELOAD_SECONDS = 30  # re-read the retries table for releases replayed from the CLI
+
+
+def backoff(attempts, base=RETRY_BASE_SECONDS, cap=RETRY_MAX_SECONDS):
+    """Seconds to wait after the attempts-th failure"""
+    return min(cap, base * 2 ** (attempts - 1))
+
+
+def revert_reason(error):
+    """Readable reason of a failed call: the revert string if there is one"""
+    message = str(error)
+    if isinstance(error, ContractLogicError) and error.message:
+        message = error.message
+    if "execution reverted: " in message:
+        return message.split("execution reverted: ", 1)[1]
+    if isinstance(error, ContractLogicError):
+        return message
+    return f"{type(error).__name__}: {message}"
+
+
+class RetryScheduler:
+    """
+    Min-heap of failed releases keyed by their next attempt time, drained
+    by a daemon thread that calls run(escrow_address, condition_id) for
+    each one that is due. Attempts and errors live in the store, so the
+    backoff carries on across restarts.
+    """
+
+    def __init__(self, store, run, metrics=None, max_attempts=RETRY_ATTEMPTS,
+                 base=RETRY_BASE_SECONDS, cap=RETRY_MAX_SECONDS):
+        self.store = store
+        self.run = run
+        self.metrics = metrics
+        self.max_attempts = max_attempts
+        self.base = base
+        self.cap = cap
+
+        self.heap = []  # (due time, escrow address lowercase)
+        self.due = {}  # escrow address lowercase -> (due time, condition_id) of its live heap entry
+        self.condition = threading.Condition()
+        self.stopped = False
+        self.thread = None
+        if metrics is not None:
+            metrics.retries_pending.set_function(lambda: len(self.due))
+
+    # ----- scheduling -----
+    def schedule(self, escrow_address, condition_id, due):
+        key = escrow_address.lower()
+        with self.condition:
+            self.due[key] = (due, condition_id)
+            heapq.heappush(self.heap, (due, key))
+            self.condition.notify()
+
+    def cancel(self, escrow_address):
+        """Drop the in-memory entry only; the stored retry stays for its owner"""
+        with self.condition:
+            self.due.pop(escrow_address.lower(), None)
+
+    def reload(self):
+        """Schedule stored retries not scheduled yet (after a restart, or replayed)"""
+        for escrow, condition_id, _, next_at, _ in self.store.retries():
+            if escrow not in self.due:
+                self.schedule(escrow, condition_id, next_at)
+
+    def failed(self, escrow_address, condition_id, reason):
+        """
+        Record a failed release: schedule it again after the backoff, or
+        move it to the dead-letter table once it has used up its attempts.
+        Returns the delay in seconds, or None if it was dead-lettered.
+        """
+        attempts = (self.store.retry_attempts(escrow_address) or 0) + 1
+        if attempts >= self.max_attempts:
+            self.cancel(escrow_address)
+            self.store.dead_letter(escrow_address, condition_id, attempts, reason)
+            if self.metrics is not None:
+                self.metrics.dead_letters.inc()
+            log.error("Giving up on release, moved to dead letters", extra={
+                'escrow': escrow_address, 'attempts': attempts, 'reason': reason
+            })
+            return None
+        delay = backoff(attempts, self.base, self.cap)
+        self.store.save_retry(escrow_address, condition_id, attempts, time.time() + delay, reason)
+        self.schedule(escrow_address, condition_id, time.time() + delay)
+        log.warning("Release failed, retry scheduled", extra={
+            'escrow': escrow_address, 'attempt': attempts, 'max_retries': self.max_attempts - 1,
+            'delay_seconds': delay, 'reason': reason
+        })
+        return delay
+
+    def resolved(self, escrow_address):
+        """The escrow was released (or needs no release any more)"""
+        with self.condition:
+            scheduled = self.due.pop(escrow_address.lower(), None)
+        if scheduled is not None or self.store.retry_attempts(escrow_address) is not None:
+            self.store.clear_retry(escrow_address)
+
+    # ----- thread -----
+    def start(self):
+        self.reload()
+        self.thread = threading.Thread(target=self.loop, name="release-retries", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def pop_due(self):
+        """Due (escrow, condition_id) entries, or [] once the wait is over"""
+        with self.condition:
+            while self.heap and self.due.get(self.heap[0][1], (None,))[0] != self.heap[0][0]:
+                heapq.heappop(self.heap)  # cancelled or rescheduled
+            wait = RETRY_RELOAD_SECONDS
+            if self.heap:
+                wait = min(wait, max(0, self.heap[0][0] - time.time()))
+            if wait > 0:
+                self.condition.wait(wait)
+            if self.stopped:
+                return []
+            due = []
+            now = time.time()
+            while self.heap and self.heap[0][0] <= now:
+                due_at, key = heapq.heappop(self.heap)
+                if self.due.get(key, (None,))[0] != due_at:
+                    continue
+                due.append((key, self.due.pop(key)[1]))
+            return due
+
+    def loop(self):
+        reloaded = time.monotonic()
+        while not self.stopped:
+            for escrow_address, condition_id in self.pop_due():
+                try:
+                    self.run(escrow_address, condition_id)
+                except Exception as e:
+                    log.error("Retry failed", extra={'escrow': escrow_address, 'error': str(e)})
+                    self.failed(escrow_address, condition_id, revert_reason(e))
+            if time.monotonic() - reloaded >= RETRY_RELOAD_SECONDS:
+                try:
+                    self.reload()
+                except Exception as e:
+                    log.warning("Could not reload retries", extra={'error': str(e)})
+                reloaded = time.monotonic()
+
+
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and replay failed keeper releases")
+    parser.add_argument("command", choices=["retries", "dead", "replay"])
+    parser.add_argument("escrows", nargs="*", help="escrow addresses to replay")
+    parser.add_argument("--all", action="store_true", help="replay every dead letter")
+    parser.add_argument("--state-db", default=STATE_PATH, help=f"keeper state file (default: {STATE_PATH})")
+    args = parser.parse_args()
+
+    store = KeeperCheckpointStore(args.state_db)
+    try:
+        if args.command == "retries":
+            rows = store.retries()
+            print(f"🔁 {len(rows)} release(s) waiting for a retry")
+            for escrow, condition_id, attempts, next_at, error in rows:
+                print(f"   {escrow}  condition {condition_id}  attempts {attempts}  next {format_time(next_at)}")
+                print(f"      Last error: {error}")
+        elif args.command == "dead":
+            rows = store.dead_letters()
+            print(f"☠️  {len(rows)} dead-lettered release(s)")
+            for escrow, condition_id, attempts, reason, failed_at in rows:
+                print(f"   {escrow}  condition {condition_id}  attempts {attempts}  failed {format_time(failed_at)}")
+                print(f"      Reason: {reason}")
+        else:
+            if not args.all and not args.escrows:
+                parser.error("replay needs escrow addresses or --all")
+            replayed = store.replay_dead_letters(None if args.all else args.escrows)
+            print(f"✅ {replayed} release(s) moved back to the retries")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
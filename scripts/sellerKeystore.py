@@ -0,0 +1,106 @@
+"""
+Encrypted keystore directory for keeper seller accounts
+Every *.json file in the directory is a standard (V3) Ethereum keystore,
+as written by geth, clef or `add` below, and all of them share one
+password, so a single keeper can release the escrows of many sellers.
+
+    python scripts/sellerKeystore.py add keystore/     # encrypt a key into the directory
+    python scripts/sellerKeystore.py list keystore/    # addresses, without decrypting
+    python scripts/keeperBot.py --keystore keystore/
+"""
+
+import os
+import sys
+import json
+import getpass
+import argparse
+from datetime import datetime, timezone
+from eth_account import Account
+
+
+def keystore_files(directory):
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.endswith('.json') or name.startswith('UTC--')
+    )
+
+
+def load_keystore(directory, password):
+    """Decrypt every keystore in directory; returns [LocalAccount] in file name order"""
+    accounts = []
+    for path in keystore_files(directory):
+        with open(path, 'r') as f:
+            keyfile = json.load(f)
+        try:
+            private_key = Account.decrypt(keyfile, password)
+        except ValueError as e:
+            raise ValueError(f"cannot decrypt {path}: {e}") from None
+        accounts.append(Account.from_key(private_key))
+    if not accounts:
+        raise FileNotFoundError(f"No keystore files in {directory}")
+    return accounts
+
+
+def save_key(directory, private_key, password, iterations=None):
+    """
+    Encrypt private_key into a new keystore file in directory; returns its path
+    iterations: scrypt work factor (default: eth_account's)
+    """
+    keyfile = Account.encrypt(private_key, password, iterations=iterations)
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H-%M-%S.%fZ')
+    path = os.path.join(directory, f"UTC--{stamp}--{keyfile['address']}.json")
+    with open(path, 'w') as f:
+        json.dump(keyfile, f)
+    os.chmod(path, 0o600)
+    return path
+
+
+def prompt_sellers(directory=None):
+    """
+    Seller keys for a keeper command line: every account in the keystore
+    directory (one password prompt), or else a single private key typed in
+    """
+    if directory is None:
+        seller_key = getpass.getpass(prompt="Enter seller private key: ")
+        if not seller_key:
+            print("Error: Private key required")
+            sys.exit(1)
+        return seller_key
+
+    password = getpass.getpass(prompt=f"Password for keystore {directory}: ")
+    try:
+        accounts = load_keystore(directory, password)
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print(f"🔑 Loaded {len(accounts)} seller account(s) from {directory}")
+    return accounts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seller keystore directory for the keeper")
+    parser.add_argument("command", choices=["add", "list"])
+    parser.add_argument("directory")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for path in keystore_files(args.directory):
+            with open(path, 'r') as f:
+                print(f"0x{json.load(f)['address']}  {os.path.basename(path)}")
+        return
+
+    private_key = getpass.getpass(prompt="Enter seller private key: ")
+    password = getpass.getpass(prompt="Keystore password: ")
+    if not private_key or not password:
+        print("Error: private key and password required")
+        sys.exit(1)
+    if password != getpass.getpass(prompt="Repeat password: "):
+        print("Error: passwords differ")
+        sys.exit(1)
+    path = save_key(args.directory, private_key, password)
+    print(f"✅ Saved {Account.from_key(private_key).address} to {path}")
+
+
+if __name__ == "__main__":
+    main()
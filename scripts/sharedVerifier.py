@@ -0,0 +1,109 @@
+"""
+One canonical ConditionVerifier per network
+A ConditionVerifier holds any number of conditions, so escrows do not each
+need their own. With --shared-verifier, deploy.py (single and --manifest)
+looks up the shared verifier recorded for the connected chain and only
+creates a condition on it for each new escrow; the first run on a chain
+deploys and records it. The keeper watches it along with any other verifier
+its escrows are linked to.
+
+    python scripts/sharedVerifier.py show      # shared verifier of the connected chain
+    python scripts/sharedVerifier.py deploy    # deploy one now (if there is none yet)
+
+The record is the usual ConditionVerifier deployment record with
+"shared": true and the chain id; a record whose contract is gone (a
+restarted local chain) is ignored.
+"""
+
+import sys
+import getpass
+from datetime import datetime, timezone
+from web3 import Web3
+
+from nonceManager import NonceManager
+from contractCache import load_abi
+from deploymentRegistry import append_deployments, latest_deployments
+
+GANACHE_URL = "http://127.0.0.1:8545"
+CV_ABI_PATH = "contracts/ConditionVerifier.abi"
+CV_BIN_PATH = "contracts/ConditionVerifier.bin"
+
+
+def find_shared_verifier(w3):
+    """Address of the shared ConditionVerifier recorded for this chain, or None"""
+    chain_id = w3.eth.chain_id
+    for deployment in latest_deployments("ConditionVerifier"):
+        if deployment.get("shared") and deployment.get("chainId") == chain_id:
+            if w3.eth.get_code(deployment["address"]):
+                return deployment["address"]
+    return None
+
+
+def record_shared_verifier(address, tx_hash, deployer, chain_id):
+    """Record the shared ConditionVerifier"""
+    timestamp = datetime.now(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
+    append_deployments([{
+        "contract": "ConditionVerifier",
+        "address": address,
+        "txHash": tx_hash.hex(),
+        "deployer": deployer,
+        "timestamp": timestamp,
+        "constructorArgs": [],
+        "shared": True,
+        "chainId": chain_id
+    }])
+
+
+def shared_verifier(w3, private_key, nonces=None):
+    """
+    The shared ConditionVerifier of this chain, deployed and recorded first
+    if there is none. Returns: (address, True if it was deployed just now)
+    """
+    address = find_shared_verifier(w3)
+    if address is not None:
+        return address, False
+
+    deployer = w3.eth.account.from_key(private_key).address
+    with open(CV_BIN_PATH) as f:
+        cv_bytecode = f.read().strip()
+    nonces = nonces or NonceManager(w3)
+    ConditionVerifier = w3.eth.contract(abi=load_abi(CV_ABI_PATH), bytecode=cv_bytecode)
+    tx_hash, _ = nonces.send(ConditionVerifier.constructor(), {
+        "from": deployer,
+        "gas": 4000000,
+        "gasPrice": w3.to_wei("20", "gwei"),
+    }, private_key)
+    receipt = nonces.wait(tx_hash)
+    assert receipt.status == 1, "ConditionVerifier deployment failed"
+    record_shared_verifier(receipt.contractAddress, tx_hash, deployer, w3.eth.chain_id)
+    return receipt.contractAddress, True
+
+
+def main():
+    if len(sys.argv) != 2 or sys.argv[1] not in ("show", "deploy"):
+        print("Usage: python scripts/sharedVerifier.py show|deploy")
+        sys.exit(1)
+
+    w3 = Web3(Web3.HTTPProvider(GANACHE_URL))
+    assert w3.is_connected(), "Web3 not connected to Ganache!"
+
+    if sys.argv[1] == "show":
+        address = find_shared_verifier(w3)
+        if address is None:
+            print(f"❌ No shared ConditionVerifier recorded for chain {w3.eth.chain_id}")
+            sys.exit(1)
+        cv = w3.eth.contract(address=address, abi=load_abi(CV_ABI_PATH))
+        print(f"✅ Shared ConditionVerifier: {address} ({cv.functions.condition_count().call()} conditions)")
+        return
+
+    private_key = getpass.getpass(prompt="Enter deployer private key: ")
+    address, deployed = shared_verifier(w3, private_key)
+    if deployed:
+        print(f"✅ Shared ConditionVerifier deployed at: {address}")
+        print("Deployment recorded")
+    else:
+        print(f"✅ Shared ConditionVerifier already deployed at: {address}")
+
+
+if __name__ == "__main__":
+    main()
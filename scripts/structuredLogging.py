@@ -0,0 +1,134 @@
+"""
+Structured, non-blocking logging for the keeper and scripts
+Every record is written as one JSON object per line (time, level, logger,
+message and any fields passed in `extra`), so logs can be filtered and
+aggregated with jq or loaded straight into an analysis tool:
+
+    log = logging.getLogger("keeperBot")
+    log.info("Release sent", extra={'escrow': address, 'tx_hash': tx_hash})
+
+    {"ts": "2026-01-05T10:15:02.113Z", "level": "INFO", "logger": "keeperBot",
+     "msg": "Release sent", "escrow": "0x...", "tx_hash": "0x..."}
+
+setup_logging() installs a QueueHandler on the root logger: logging a
+record only puts it on an in-memory queue, and a QueueListener thread
+formats and writes it, so the caller never waits on a slow terminal or
+pipe. Levels are given as "LEVEL,logger=LEVEL,...", e.g.
+"INFO,nonceManager=DEBUG,web3=WARNING" (--log-level, or LOG_LEVEL in the
+environment).
+"""
+
+import os
+import sys
+import copy
+import json
+import queue
+import atexit
+import logging
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+DEFAULT_LEVEL = "INFO"
+
+# LogRecord attributes; anything else on a record came from `extra`
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_listener = None
+
+
+def _json_default(value):
+    if isinstance(value, (bytes, bytearray)):
+        return '0x' + bytes(value).hex()
+    return str(value)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, msg, extra fields, exc"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds')
+                  .replace('+00:00', 'Z'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=_json_default, ensure_ascii=False)
+
+
+class _RecordQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread"""
+
+    def prepare(self, record):
+        # Resolve the message and traceback now, while their objects are
+        # current; the JSON is built on the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def parse_levels(spec):
+    """'INFO,keeperBot=DEBUG' -> ('INFO', {'keeperBot': 'DEBUG'})"""
+    default = None
+    overrides = {}
+    for part in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, level = part.rpartition('=')
+        level = level.strip().upper()
+        if not isinstance(logging.getLevelName(level), int):
+            raise ValueError(f"unknown log level {level!r} in {spec!r}")
+        if name:
+            overrides[name.strip()] = level
+        else:
+            default = level
+    return default or DEFAULT_LEVEL, overrides
+
+
+def setup_logging(levels=None, stream=None):
+    """
+    Send every logger's records through a queue to a background thread that
+    writes them as JSON lines to stream (default: stdout). Calling it again
+    replaces the previous setup. Returns the QueueListener.
+
+    levels: "LEVEL,logger=LEVEL,..." (default: $LOG_LEVEL, else INFO)
+    """
+    global _listener
+    default, overrides = parse_levels(levels or os.environ.get('LOG_LEVEL') or DEFAULT_LEVEL)
+    stop_logging()
+
+    records = queue.SimpleQueue()  # unbounded: logging never blocks the caller
+    writer = logging.StreamHandler(stream or sys.stdout)
+    writer.setFormatter(JsonFormatter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_RecordQueueHandler(records))
+    root.setLevel(default)
+    for name, level in overrides.items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = QueueListener(records, writer)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Write out the records still queued and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,354 @@
+"""
+Throughput benchmark for the keeper's event ingestion
+Feeds synthetic ConditionFulfilled streams through EscrowKeeperBot and
+reports events/sec, p50/p99 end-to-end latency and RPC calls per event.
+
+    mocked: an in-process node (SyntheticNode below) serves the stream, so
+            10k-100k events run in seconds. Measures ingestion and matching
+            (log scan, readiness, escrow lookup, queueing); latency runs
+            from the block appearing on the node to a worker picking up its
+            release, which is recorded instead of sent.
+    chain:  the local dev chain at 127.0.0.1:8545 with real escrows, one
+            fulfilment transaction per event. Latency runs from the
+            fulfilment receipt to the keeper seeing its release mined.
+
+Results are saved as JSON (benchmark_results_<time>.json next to this
+script, or --output) so runs of different releases can be compared.
+
+    python3 tests/benchmark_keeper.py                     # mocked 10 / 1k / 100k
+    python3 tests/benchmark_keeper.py --chain --sizes 10  # also the dev chain
+"""
+
+import os, sys, json, time, platform, argparse, subprocess, contextlib
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+import web3
+from eth_abi import encode
+from web3 import Web3
+from web3.providers.base import BaseProvider
+from workdir import workdir
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from keeperBot import EscrowKeeperBot
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+MOCKED_SIZES = (10, 1000, 100000)
+CHAIN_SIZES = (10,)
+EVENTS_PER_BLOCK = 100  # synthetic fulfilments per mocked block; one keeper poll per block
+CHAIN_ID = 1337
+ZERO_HASH = "0x" + "00" * 32
+REQUIRED_AMOUNT = 1000  # wei per external condition (chain mode)
+
+
+# --- HELPER FUNCTIONS ---
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+def load_abi(name):
+    with open(os.path.join(REPO_ROOT, 'contracts', name)) as f:
+        return json.load(f)
+
+def write_deployments(records):
+    """testnet.json holding records, in the working directory"""
+    with open(os.path.join('deployments', 'testnet.json'), 'w') as f:
+        json.dump({"network": "benchmark", "deployments": records}, f)
+
+def escrow_record(address, seller, verifier, condition_id, block):
+    return {
+        "contract": "Escrow", "address": address, "txHash": "", "blockNumber": block,
+        "deployer": seller, "seller": seller, "timestamp": "", "constructorArgs": [],
+        "linkedContracts": {
+            "conditionVerifier": verifier,
+            "externalConditionId": condition_id,
+            "beneficiary": seller,
+            "requiredAmount": REQUIRED_AMOUNT
+        }
+    }
+
+def rpc_calls(bot):
+    """{method: requests} the keeper made so far, counted by its metrics middleware"""
+    return {labels[0]: count for labels, count in bot.metrics.rpc_requests.snapshot().items()}
+
+def summarise(mode, events, seconds, latencies, calls_before, bot):
+    """One result row; RPC calls are the keeper's own since calls_before"""
+    calls = {method: count - calls_before.get(method, 0) for method, count in rpc_calls(bot).items()}
+    calls = {method: count for method, count in calls.items() if count}
+    total = sum(calls.values())
+    result = {
+        "mode": mode,
+        "events": events,
+        "seconds": round(seconds, 4),
+        "events_per_sec": round(events / seconds, 1),
+        "latency_p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "latency_p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "rpc_calls": total,
+        "rpc_calls_per_event": round(total / events, 4),
+        "rpc_calls_by_method": dict(sorted(calls.items())),
+    }
+    print(f"✅ {mode} {events} events: {result['events_per_sec']} events/s, "
+          f"p50 {result['latency_p50_ms']}ms, p99 {result['latency_p99_ms']}ms, "
+          f"{result['rpc_calls_per_event']} RPC calls/event")
+    return result
+
+
+# --- MOCKED PROVIDER ---
+class SyntheticNode(BaseProvider):
+    """
+    In-process stand-in for an Ethereum node
+    Answers the JSON-RPC the keeper uses while ingesting (eth_chainId,
+    eth_blockNumber, eth_getBlockByNumber, eth_getLogs) from logs kept in
+    memory. Block 1 deposits into every escrow; the benchmark then mines
+    blocks of ConditionFulfilled logs one at a time.
+    """
+
+    def __init__(self, verifier, escrow_addresses):
+        super().__init__()
+        self.verifier = verifier
+        self.block_number = 0
+        self.blocks = [[]]  # block number -> logs
+        self.by_address = {}  # address lowercase -> (block numbers, logs), in block order
+        self.deposited = Web3().eth.contract(abi=load_abi('Escrow.abi')).events.Deposited()
+        self.fulfilled = Web3().eth.contract(abi=load_abi('ConditionVerifier.abi')).events.ConditionFulfilled()
+        self.mine([
+            (address, self.deposited.topic, encode(['address', 'uint256'], [address, 10 ** 16]))
+            for address in escrow_addresses
+        ])
+
+    def mine(self, entries):
+        """Add a block with a log per (address, topic, data)"""
+        self.block_number += 1
+        number = self.block_number
+        logs = []
+        for log_index, (address, topic, data) in enumerate(entries):
+            log = {
+                "address": address,
+                "topics": [topic],
+                "data": "0x" + data.hex(),
+                "blockNumber": hex(number),
+                "blockHash": self._block_hash(number),
+                "transactionHash": Web3.keccak(text=f"synthetic-tx-{number}-{log_index}").to_0x_hex(),
+                "transactionIndex": hex(log_index),
+                "logIndex": hex(log_index),
+                "removed": False,
+            }
+            logs.append(log)
+            numbers, by_block = self.by_address.setdefault(address.lower(), ([], []))
+            numbers.append(number)
+            by_block.append(log)
+        self.blocks.append(logs)
+        return number
+
+    def mine_fulfilled(self, condition_ids):
+        timestamp = 1700000000 + self.block_number + 1
+        return self.mine([
+            (self.verifier, self.fulfilled.topic, encode(['uint256'] * 3, [condition_id, 1, timestamp]))
+            for condition_id in condition_ids
+        ])
+
+    # ----- JSON-RPC -----
+    def _block_hash(self, number):
+        return Web3.keccak(text=f"synthetic-block-{number}").to_0x_hex()
+
+    def _block(self, number):
+        if number > self.block_number:
+            return None
+        return {
+            "number": hex(number),
+            "hash": self._block_hash(number),
+            "parentHash": self._block_hash(number - 1) if number else ZERO_HASH,
+            "timestamp": hex(1700000000 + number),
+            "miner": "0x" + "00" * 20,
+            "gasLimit": hex(30000000),
+            "gasUsed": "0x0",
+            "difficulty": "0x0",
+            "extraData": "0x",
+            "logsBloom": "0x" + "00" * 256,
+            "nonce": "0x" + "00" * 8,
+            "stateRoot": ZERO_HASH,
+            "transactionsRoot": ZERO_HASH,
+            "receiptsRoot": ZERO_HASH,
+            "sha3Uncles": ZERO_HASH,
+            "mixHash": ZERO_HASH,
+            "baseFeePerGas": "0x1",
+            "size": "0x0",
+            "transactions": [],
+            "uncles": [],
+        }
+
+    def _block_param(self, value):
+        if value in (None, "latest", "safe", "finalized", "pending"):
+            return self.block_number
+        if value == "earliest":
+            return 0
+        return int(value, 16) if isinstance(value, str) else value
+
+    def _get_logs(self, flt):
+        from_block = self._block_param(flt.get("fromBlock", "earliest"))
+        to_block = min(self._block_param(flt.get("toBlock")), self.block_number)
+        addresses = flt.get("address")
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        topics = (flt.get("topics") or [None])[0]
+        if isinstance(topics, str):
+            topics = [topics]
+        topics = {topic.lower() for topic in topics} if topics else None
+
+        if addresses:
+            candidates = []
+            for address in addresses:
+                numbers, logs = self.by_address.get(address.lower(), ([], []))
+                candidates.extend(logs[bisect_left(numbers, from_block):bisect_right(numbers, to_block)])
+        else:
+            candidates = [log for number in range(from_block, to_block + 1) for log in self.blocks[number]]
+        return [log for log in candidates if topics is None or log["topics"][0].lower() in topics]
+
+    def make_request(self, method, params):
+        if method == "eth_chainId":
+            result = hex(CHAIN_ID)
+        elif method == "net_version":
+            result = str(CHAIN_ID)
+        elif method == "eth_blockNumber":
+            result = hex(self.block_number)
+        elif method == "eth_getBlockByNumber":
+            result = self._block(self._block_param(params[0]))
+        elif method == "eth_getLogs":
+            result = self._get_logs(params[0])
+        else:
+            return {"jsonrpc": "2.0", "id": 0,
+                    "error": {"code": -32601, "message": f"method not supported by the synthetic node: {method}"}}
+        return {"jsonrpc": "2.0", "id": 0, "result": result}
+
+    def is_connected(self, show_traceback=False):
+        return True
+
+
+# --- MOCKED RUN ---
+def run_mocked(events, seller_priv):
+    """Stream `events` fulfilments through a keeper on a SyntheticNode"""
+    seller = Web3().eth.account.from_key(seller_priv)
+    verifier = Web3.to_checksum_address("0x" + "c0" * 20)
+    addresses = [Web3.to_checksum_address(f"0x{i + 1:040x}") for i in range(events)]
+    node = SyntheticNode(verifier, addresses)
+    records = [{"contract": "ConditionVerifier", "address": verifier, "txHash": "",
+                "deployer": seller.address, "timestamp": "", "constructorArgs": []}]
+    records += [escrow_record(address, seller.address, verifier, i, 1) for i, address in enumerate(addresses)]
+    with workdir(), open(os.devnull, 'w') as quiet, contextlib.redirect_stdout(quiet):
+        write_deployments(records)
+        bot = EscrowKeeperBot(seller_priv, state_path='keeper_state.db', provider=node)
+        # Releases are recorded, not sent: the chain run covers execution
+        picked_up = {}
+        def record_release(escrow, condition_id, prescreened=False):
+            picked_up.setdefault(condition_id, time.perf_counter())
+        bot.attempt_release = record_release
+        node.mine([])
+        bot.check_new_fulfilled_conditions()  # tail from here, escrow history read
+        calls_before = rpc_calls(bot)
+
+        arrived = {}
+        began = time.perf_counter()
+        for start in range(0, events, EVENTS_PER_BLOCK):
+            batch = range(start, min(start + EVENTS_PER_BLOCK, events))
+            node.mine_fulfilled(batch)
+            now = time.perf_counter()
+            arrived.update((condition_id, now) for condition_id in batch)
+            bot.check_new_fulfilled_conditions()
+        bot.wait_for_releases()
+        elapsed = time.perf_counter() - began
+        bot.stop_workers()
+        bot.receipts.stop()
+        bot.store.close()
+
+    assert len(picked_up) == events, f"{events - len(picked_up)} of {events} events produced no release"
+    latencies = [picked_up[condition_id] - arrived[condition_id] for condition_id in arrived]
+    return summarise("mocked", events, elapsed, latencies, calls_before, bot)
+
+
+# --- DEV CHAIN RUN ---
+def run_chain(events):
+    """Fulfil `events` real escrows on the dev chain one by one while a keeper polls"""
+    from keeper_setup import seller_priv, setup_escrows, fulfil
+
+    print(f"\n⛓️  Setting up {events} escrows on the dev chain...")
+    with workdir(), open(os.devnull, 'w') as quiet, contextlib.redirect_stdout(quiet):
+        cv_contract, escrows = setup_escrows([{}] * events)
+        condition_ids = [condition_id for _, condition_id in escrows]
+
+        bot = EscrowKeeperBot(seller_priv, state_path='keeper_state.db')
+        mined = {}
+        finish_release = bot.finish_release
+        def timed_finish(release, tx_hash, future):
+            mined[release['condition_id']] = time.perf_counter()
+            finish_release(release, tx_hash, future)
+        bot.finish_release = timed_finish
+        bot.check_new_fulfilled_conditions()  # tail from here, escrow history read
+        calls_before = rpc_calls(bot)
+
+        arrived = {}
+        began = time.perf_counter()
+        for condition_id in condition_ids:
+            fulfil(cv_contract, condition_id)
+            arrived[condition_id] = time.perf_counter()
+            bot.check_new_fulfilled_conditions()
+        give_up = time.time() + 120
+        while len(mined) < events and time.time() < give_up:
+            bot.wait_for_releases()
+            bot.check_new_fulfilled_conditions()
+        elapsed = time.perf_counter() - began
+        bot.stop_workers()
+        bot.receipts.stop()
+        bot.store.close()
+
+    assert len(mined) == events, f"{events - len(mined)} of {events} escrows were not released"
+    latencies = [mined[condition_id] - arrived[condition_id] for condition_id in arrived]
+    return summarise("chain", events, elapsed, latencies, calls_before, bot)
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "-C", REPO_ROOT, "describe", "--always", "--dirty"],
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "web3": web3.__version__,
+        "machine": platform.machine(),
+        "events_per_block": EVENTS_PER_BLOCK,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keeper ingestion benchmark")
+    parser.add_argument("--sizes", type=lambda s: [int(n) for n in s.split(",")], default=None,
+                        help=f"comma-separated stream sizes (default: mocked {MOCKED_SIZES}, chain {CHAIN_SIZES})")
+    parser.add_argument("--chain", action="store_true",
+                        help="also run against the dev chain at 127.0.0.1:8545 (needs the *_PRIVATE_KEY variables)")
+    parser.add_argument("--no-mocked", action="store_true", help="skip the mocked provider runs")
+    parser.add_argument("--output", default=None,
+                        help="results file (default: tests/benchmark_results_<time>.json)")
+    args = parser.parse_args()
+
+    seller_priv = os.environ.get("SELLER_PRIVATE_KEY") or "0x" + "01" * 32
+    results = []
+    if not args.no_mocked:
+        for size in args.sizes or MOCKED_SIZES:
+            print(f"---MOCKED: {size} events---")
+            results.append(run_mocked(size, seller_priv))
+            print("---------------------------------------------------------------------------------")
+    if args.chain:
+        for size in args.sizes or CHAIN_SIZES:
+            print(f"---DEV CHAIN: {size} events---")
+            results.append(run_chain(size))
+            print("---------------------------------------------------------------------------------")
+
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)),
+        f"benchmark_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    with open(output, 'w') as f:
+        json.dump({"timestamp": datetime.now().isoformat(timespec='seconds'),
+                   "environment": environment(), "results": results}, f, indent=2)
+    print(f"✅ Saved {len(results)} results to {output}")
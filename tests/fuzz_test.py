@@ -1,10 +1,18 @@
-import os, sys, json
+import os, sys, json, logging
 from web3 import Web3
 from web3.exceptions import ContractLogicError
 from datetime import datetime
 from test_deploy import deploy_escrow_with_verifier  
 import random
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from nonceManager import NonceManager
+from receiptTracker import ReceiptTracker
+from structuredLogging import setup_logging
+
+log = logging.getLogger("fuzz_test")
+setup_logging()
+
 # save results to json
 RESULTS_FILE = f"fuzz_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
 fuzz_results = []
@@ -16,6 +24,7 @@ buyer_priv = os.environ.get("BUYER_PRIVATE_KEY")
 seller_priv = os.environ.get("SELLER_PRIVATE_KEY")
 buyer = w3.eth.account.from_key(buyer_priv)
 seller = w3.eth.account.from_key(seller_priv)
+nonces = NonceManager(w3, receipts=ReceiptTracker(w3))
 
 """ 🎯 SMART PRE-CHECK + VYPER REVERT DECODER (Ganache-proof!) """
 def smart_precheck(escrow, cv_contract, function_name, *args, from_addr=None, value=0, is_cv=False):
@@ -102,32 +111,27 @@ def safe_tx(escrow, cv_contract, fn_name, *args, from_addr=buyer.address, value=
     success, reason = smart_precheck(escrow, cv_contract, fn_name, *args, from_addr, value, is_cv)
     if not success:
         log_result(f"{fn_name}_PRECHECK_FAIL", False, reason, escrow_addr)
-        print(f"PRE-SIM FAIL {fn_name}: {reason}")
+        log.debug("Pre-check failed", extra={'function': fn_name, 'reason': reason})
         return None
     
     # Determine target contract and function
     target_contract = cv_contract if is_cv else escrow
     fn = getattr(target_contract.functions, fn_name)
-    nonce = w3.eth.get_transaction_count(from_addr)
     gas_price = w3.to_wei("20", "gwei")
     gas = 2000000
     
     try:
-        tx = fn(*args).build_transaction({
+        tx_hash, _ = nonces.send(fn(*args), {
             "from": from_addr,
             "value": value,
-            "nonce": nonce,
             "gas": gas,
             "gasPrice": gas_price
-        })
-        
-        signed = w3.eth.account.sign_transaction(tx, signer_priv)
-        tx_hash = w3.eth.send_raw_transaction(signed.raw_transaction)
-        receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+        }, signer_priv)
+        receipt = nonces.wait(tx_hash)
         
         if receipt.status == 1:
             log_result(fn_name, True, "", escrow_addr)
-            print(f"✅ {fn_name} succeeded")
+            log.debug("Transaction succeeded", extra={'function': fn_name, 'tx_hash': tx_hash})
             return receipt
         else:
             # 🔍 POST-TX DIAGNOSIS
@@ -149,18 +153,18 @@ def safe_tx(escrow, cv_contract, fn_name, *args, from_addr=buyer.address, value=
                 reason = "🛑 TX REVERTED"
             
             log_result(fn_name, False, reason, escrow_addr)
-            print(f"❌ {fn_name} TX REVERTED: {reason}")
+            log.debug("Transaction reverted", extra={'function': fn_name, 'tx_hash': tx_hash, 'reason': reason})
             return None
             
     except ContractLogicError as ex:
         reason = decode_revert_reason_raw(str(ex))
         log_result(fn_name, False, reason, escrow_addr)
-        print(f"❌ {fn_name} VYPER ERROR: {reason}")
+        log.debug("Vyper error", extra={'function': fn_name, 'reason': reason})
         return None
     except Exception as e:
         reason = str(e)
         log_result(f"{fn_name}_CRASH", False, reason, escrow_addr)
-        print(f"❌ {fn_name} CRASH: {reason}")
+        log.debug("Crash", extra={'function': fn_name, 'reason': reason})
         return None
 
 # log result to json with pattern detection
@@ -175,21 +179,22 @@ def log_result(operation, success, error_msg="", escrow_addr=""):
     }
     fuzz_results.append(result)
     
-    status = '✅' if success else '❌'
-    msg_preview = (error_msg[:60] + "..." if error_msg else "").replace("🛑 VYPER ASSERT: '", "")
+    error = (error_msg or "").replace("🛑 VYPER ASSERT: '", "").lower()
+    if "conditions" in error:
+        pattern = "conditions"
+    elif "index" in error or "bounds" in error:
+        pattern = "bounds"
+    elif "funded" in error:
+        pattern = "funded"
+    elif "external" in error:
+        pattern = "external"
+    else:
+        pattern = None
     
-    if "conditions" in msg_preview.lower():
-        msg_preview = "🔄 " + msg_preview
-    elif "index" in msg_preview.lower() or "bounds" in msg_preview.lower():
-        msg_preview = "📏 " + msg_preview
-    elif "funded" in msg_preview.lower():
-        msg_preview = "💰 " + msg_preview
-    elif "external" in msg_preview.lower():
-        msg_preview = "🔗 " + msg_preview
-    elif "deposit_eth" in operation:
-        msg_preview = "🌐 " + msg_preview
-    
-    print(f"[{len(fuzz_results)}] {operation} → {status} {msg_preview}")
+    log.log(logging.INFO if success else logging.WARNING, "Operation", extra={
+        'seq': len(fuzz_results), 'escrow': escrow_addr, 'operation': operation,
+        'success': success, 'error': result['error'], 'pattern': pattern
+    })
 
 def fuzz_iteration(): 
     # 6-TUPLE DEPLOYMENT (Escrow + ConditionVerifier + Condition)
@@ -202,8 +207,12 @@ def fuzz_iteration():
     escrow = w3.eth.contract(address=escrow_addr, abi=escrow_abi)
     cv_contract = w3.eth.contract(address=cv_addr, abi=cv_abi)
     
+    # test_deploy signs with the deployer key outside our nonce manager;
+    # the deployer is usually the buyer, so re-read its nonce once per deploy
+    nonces.resync(buyer.address)
+    
     log_result("DEPLOY", True, "", escrow_addr)
-    print(f"🆕 Deployed: {escrow_addr} (CV: {cv_addr}, Cond: {condition_id})")
+    log.info("Deployed", extra={'escrow': escrow_addr, 'condition_verifier': cv_addr, 'condition_id': condition_id})
     
     # Generate odd data upfront for conditions
     num_conditions = random.randint(0, 10)
@@ -271,7 +280,7 @@ def fuzz_iteration():
     num_ops = random.randint(8, 15)
     random.shuffle(operations)
     
-    print(f"🌀 Running {num_ops} randomized ops (from {len(operations)} total ops)...")
+    log.info("Running randomized ops", extra={'ops': num_ops, 'ops_available': len(operations)})
     for i in range(num_ops):
         try:
             result = operations[i % len(operations)]()
@@ -292,15 +301,14 @@ def fuzz_iteration():
         "success_rate": float(iteration_success_rate)
     })
     
-    print(f"📊 Iteration success rate: {iteration_success_rate:.1%}")
-    print("=== Iteration complete ===\n")
+    log.info("Iteration complete", extra={'escrow': escrow_addr, 'success_rate': round(iteration_success_rate, 3)})
 
 # Run 150 fuzz iterations
 for i in range(150):
-    print(f"=== Fuzz iteration {i} ===")
+    log.info("Fuzz iteration", extra={'iteration': i})
     fuzz_iteration()
 
 # FINAL SAVE
 with open(RESULTS_FILE, 'w') as f:
     json.dump(fuzz_results, f, indent=2)
-print(f"✅ Saved {len(fuzz_results)} results to {RESULTS_FILE}")
+log.info("Saved results", extra={'results': len(fuzz_results), 'path': RESULTS_FILE})
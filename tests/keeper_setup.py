@@ -0,0 +1,111 @@
+"""
+Chain setup shared by the keeper tests: the test accounts, a nonce-managed
+send_tx, and setup_escrows(), which deploys escrows linked to ETH deposit
+conditions and records them in the working directory for the keeper
+"""
+
+import os, sys, json
+from web3 import Web3
+from test_deploy import deploy_condition_verifier, create_eth_deposit_condition
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from nonceManager import NonceManager
+
+REQUIRED_AMOUNT = 1000  # wei per external condition
+ESCROW_DEPOSIT = Web3.to_wei('0.01', 'ether')
+
+w3 = Web3(Web3.HTTPProvider("http://127.0.0.1:8545"))
+assert w3.is_connected(), "Web3 connection failed!"
+deployer_priv = os.environ.get("DEPLOYER_PRIVATE_KEY")
+buyer_priv = os.environ.get("BUYER_PRIVATE_KEY")
+seller_priv = os.environ.get("SELLER_PRIVATE_KEY")
+deployer = w3.eth.account.from_key(deployer_priv)
+buyer = w3.eth.account.from_key(buyer_priv)
+seller = w3.eth.account.from_key(seller_priv)
+nonces = NonceManager(w3)
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def send_tx(call, private_key, value=0, gas=4000000):
+    sender = w3.eth.account.from_key(private_key).address
+    tx_hash, _ = nonces.send(call, {
+        'from': sender,
+        'value': value,
+        'gas': gas,
+        'gasPrice': w3.to_wei('20', 'gwei')
+    }, private_key)
+    receipt = nonces.wait(tx_hash)
+    assert receipt.status == 1, f"transaction {tx_hash.hex()} reverted"
+    return receipt
+
+def setup_escrows(specs):
+    """
+    One ConditionVerifier and an escrow per spec, each linked to its own ETH
+    deposit condition whose beneficiary is the escrow's seller. The deployer
+    is the buyer of all of them. A spec is a dict of any of:
+        seller      escrow seller (default: the keeper account `seller`)
+        timeout     seconds (default: 3600)
+        conditions  internal condition descriptions, added before the deposit
+        funded      deposit into the escrow (default: True)
+        fulfilled   fulfil the external condition (default: False)
+    Call it inside `with workdir():` (tests/workdir.py); it writes
+    deployments/testnet.json into the current working directory.
+    Returns: (cv_contract, [(escrow_contract, condition_id)])
+    """
+    cv_address, cv_abi, _ = deploy_condition_verifier()
+    nonces.resync(deployer.address)
+    cv_contract = w3.eth.contract(address=cv_address, abi=cv_abi)
+    with open('contracts/Escrow.abi') as f:
+        escrow_abi = json.load(f)
+    with open('contracts/Escrow.bin') as f:
+        escrow_bytecode = f.read().strip()
+
+    records = [{
+        "contract": "ConditionVerifier", "address": cv_address, "txHash": "",
+        "deployer": deployer.address, "timestamp": "", "constructorArgs": []
+    }]
+    escrows = []
+    for spec in specs:
+        escrow_seller = spec.get('seller', seller.address)
+        condition_id = create_eth_deposit_condition(cv_address, cv_abi, escrow_seller, REQUIRED_AMOUNT)
+        nonces.resync(deployer.address)
+        receipt = send_tx(
+            w3.eth.contract(abi=escrow_abi, bytecode=escrow_bytecode).constructor(
+                escrow_seller, spec.get('timeout', 3600), cv_address, condition_id, escrow_seller
+            ),
+            deployer_priv
+        )
+        escrow = w3.eth.contract(address=receipt.contractAddress, abi=escrow_abi)
+        for description in spec.get('conditions', []):
+            send_tx(escrow.functions.add_conditions(description), deployer_priv, gas=500000)
+        if spec.get('funded', True):
+            send_tx(escrow.functions.deposit(), deployer_priv, value=ESCROW_DEPOSIT, gas=500000)
+        if spec.get('fulfilled', False):
+            send_tx(cv_contract.functions.deposit_eth(condition_id), buyer_priv, value=REQUIRED_AMOUNT, gas=500000)
+        escrows.append((escrow, condition_id))
+        records.append({
+            "contract": "Escrow", "address": escrow.address, "txHash": "",
+            "blockNumber": receipt.blockNumber, "deployer": deployer.address, "seller": escrow_seller,
+            "timestamp": "", "constructorArgs": [],
+            "linkedContracts": {
+                "conditionVerifier": cv_address,
+                "externalConditionId": condition_id,
+                "beneficiary": escrow_seller,
+                "requiredAmount": REQUIRED_AMOUNT
+            }
+        })
+
+    with open(os.path.join('deployments', 'testnet.json'), 'w') as f:
+        json.dump({"network": "ganache", "deployments": records}, f)
+    return cv_contract, escrows
+
+def fulfil(cv_contract, condition_id):
+    return send_tx(cv_contract.functions.deposit_eth(condition_id), buyer_priv, value=REQUIRED_AMOUNT, gas=500000)
+
+def mine(blocks):
+    for _ in range(blocks):
+        w3.provider.make_request("evm_mine", [])
+
+def release_count(escrow, from_block):
+    return len(escrow.events.Released().get_logs(from_block=from_block))
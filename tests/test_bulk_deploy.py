@@ -0,0 +1,117 @@
+import os, sys, csv, json
+from web3 import Web3
+from workdir import workdir
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+import bulkDeploy
+from nonceManager import NonceManager
+from keeperBot import load_deployments
+from contractCache import load_abi
+
+w3 = Web3(Web3.HTTPProvider("http://127.0.0.1:8545"))
+assert w3.is_connected(), "Web3 connection failed!"
+deployer_priv = os.environ.get("DEPLOYER_PRIVATE_KEY")
+buyer_priv = os.environ.get("BUYER_PRIVATE_KEY")
+seller_priv = os.environ.get("SELLER_PRIVATE_KEY")
+deployer = w3.eth.account.from_key(deployer_priv)
+buyer = w3.eth.account.from_key(buyer_priv)
+seller = w3.eth.account.from_key(seller_priv)
+
+ZERO_ADDRESS = "0x" + "00" * 20
+
+
+# --- HELPER FUNCTIONS ---
+def manifest_rows(count):
+    return [{
+        "seller": seller.address, "timeout": 3600 + i,
+        "beneficiary": buyer.address, "required_amount": 1000 + i
+    } for i in range(count)]
+
+def check_on_chain(cv_address, row):
+    escrow = w3.eth.contract(address=row['escrow'], abi=load_abi('contracts/Escrow.abi'))
+    assert escrow.functions.seller().call() == seller.address
+    assert escrow.functions.buyer().call() == deployer.address
+    assert escrow.functions.timeout().call() == row['timeout']
+    assert escrow.functions.condition_verifier().call() == cv_address
+    assert escrow.functions.external_condition_id().call() == row['condition_id']
+    cv = w3.eth.contract(address=cv_address, abi=load_abi('contracts/ConditionVerifier.abi'))
+    assert cv.functions.verify_condition_for_parties(row['condition_id'], deployer.address, buyer.address).call() is False
+
+# --- TEST 1: CSV manifest, invalid rows reported, escrows recorded for the keeper ---
+def test_csv_manifest():
+    with workdir():
+        rows = manifest_rows(4)
+        rows.insert(1, {"seller": seller.address, "timeout": 3600, "beneficiary": buyer.address, "required_amount": 0})
+        rows.insert(3, {"seller": "0x1234", "timeout": 3600, "beneficiary": buyer.address, "required_amount": 1})
+        rows.append({"seller": seller.address, "timeout": 3600, "beneficiary": ZERO_ADDRESS, "required_amount": 1})
+        with open('escrows.csv', 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=bulkDeploy.MANIFEST_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+
+        result = bulkDeploy.run(w3, deployer_priv, 'escrows.csv', sign_workers=0)
+        errors = {row['row']: row['error'] for row in result if row['error']}
+        assert set(errors) == {2, 4, 7}, errors
+        assert "positive" in errors[2] and "seller" in errors[4] and "beneficiary" in errors[7]
+
+        deployed = [row for row in result if row['error'] is None]
+        assert [row['condition_id'] for row in deployed] == [0, 1, 2, 3]
+        with open('deployments/testnet.json') as f:
+            data = json.load(f)
+        cv_address = data['deployments'][0]['address']
+        # Hashes are recorded as deploy.py records them: hex without 0x
+        assert all(len(d['txHash']) == 64 for d in data['deployments']), [d['txHash'] for d in data['deployments']]
+        for row in deployed:
+            check_on_chain(cv_address, row)
+
+        deployments = load_deployments()
+        assert [e['address'] for e in deployments['escrow_contracts']] == [row['escrow'] for row in deployed]
+        assert deployments['condition_verifier']['address'] == cv_address
+        print(f"✅ {len(deployed)} escrows deployed, {len(errors)} invalid rows reported, all recorded for the keeper")
+
+# --- TEST 2: Process pool signing and a failed broadcast ---
+def test_pool_and_send_failure():
+    with workdir():
+        rows = manifest_rows(40)  # 81 transactions: signed in a process pool
+        with open('escrows.json', 'w') as f:
+            json.dump({"escrows": rows}, f)
+
+        nonces = NonceManager(w3)
+        manifest = bulkDeploy.load_manifest('escrows.json')
+        send = w3.eth.send_raw_transaction
+        sent = []
+        def flaky_send(raw):
+            if len(sent) == 11:  # verifier + 5 rows, then the 6th row's condition fails
+                raise ConnectionError("node unreachable")
+            sent.append(raw)
+            return send(raw)
+        w3.eth.send_raw_transaction = flaky_send
+        try:
+            cv_address, _ = bulkDeploy.deploy_manifest(w3, deployer_priv, manifest, sign_workers=2, nonces=nonces)
+        finally:
+            del w3.eth.send_raw_transaction
+
+        assert cv_address is not None
+        assert all(row['error'] is None for row in manifest[:5])
+        assert manifest[5]['error'].startswith("Condition: Send failed"), manifest[5]['error']
+        assert all(row['error'].startswith("Condition: Not sent") for row in manifest[6:])
+        for row in manifest[:5]:
+            check_on_chain(cv_address, row)
+        print(f"✅ Signed 81 transactions in a process pool; send failure at row 6 reported, {len(manifest) - 6} rows left unsent")
+
+        # The nonce counter was resynced: rerunning the failed rows works
+        retry = [row for row in manifest if row['error']]
+        rerun = [bulkDeploy.parse_row(row['row'], {field: row[field] for field in bulkDeploy.MANIFEST_FIELDS}) for row in retry]
+        cv_address, _ = bulkDeploy.deploy_manifest(w3, deployer_priv, rerun, sign_workers=2, nonces=nonces)
+        assert all(row['error'] is None for row in rerun), [row['error'] for row in rerun if row['error']]
+        check_on_chain(cv_address, rerun[-1])
+        print(f"✅ Rerun of the {len(rerun)} failed rows deployed them all")
+
+if __name__ == "__main__":
+    print("---TEST 1: CSV manifest---")
+    test_csv_manifest()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 2: Process pool signing and send failure---")
+    test_pool_and_send_failure()
+    print("---------------------------------------------------------------------------------")
@@ -0,0 +1,94 @@
+import os, sys, tracemalloc
+from workdir import workdir
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from conditionBitmap import ConditionBitmap, ProcessedConditions
+from keeperStore import KeeperCheckpointStore
+
+VERIFIER_A = "0x3E093cBC61e9801bd1e70C0D16Bb0B59cBa2A885"
+VERIFIER_B = "0x5FbDB2315678afecb367f032d93F642f64180aa3"
+TX_HASH = "0x" + "ab" * 32
+
+# --- TEST 1: Bitmap set operations and raw bytes round trip ---
+def test_bitmap():
+    bitmap = ConditionBitmap()
+    for condition_id in (0, 7, 8, 1000):
+        bitmap.add(condition_id)
+    bitmap.add(7)
+    bitmap.discard(8)
+    bitmap.discard(5000)
+    assert list(bitmap) == [0, 7, 1000] and len(bitmap) == 3
+    assert 1000 in bitmap and 8 not in bitmap and 10 ** 9 not in bitmap
+
+    data = bitmap.to_bytes()
+    assert len(data) == 1000 // 8 + 1
+    restored = ConditionBitmap.from_bytes(data)
+    assert list(restored) == [0, 7, 1000] and len(restored) == 3
+    print(f"✅ 3 condition ids round-tripped through {len(data)} bytes")
+
+# --- TEST 2: Conditions are tracked per verifier ---
+def test_per_verifier():
+    processed = ProcessedConditions()
+    processed.add(VERIFIER_A, 0)
+    assert (VERIFIER_A.lower(), 0) in processed
+    assert (VERIFIER_B, 0) not in processed, "condition 0 of another verifier is a different condition"
+
+    processed.add(VERIFIER_B, 3)
+    restored = ProcessedConditions(processed.to_bytes())
+    assert (VERIFIER_A, 0) in restored and (VERIFIER_B, 3) in restored and len(restored) == 2
+    print("✅ Same condition id kept apart for two verifiers")
+
+# --- TEST 3: A million conditions stay in a few hundred KB ---
+def test_million_conditions():
+    count = 1_000_000
+    tracemalloc.start()
+    processed = ProcessedConditions()
+    for condition_id in range(count):
+        processed.add(VERIFIER_A, condition_id)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert len(processed) == count
+    assert len(processed.to_bytes()[VERIFIER_A.lower()]) == count // 8
+    assert peak < 512 * 1024, f"peak {peak} bytes"
+    print(f"✅ {count} processed conditions in {count // 8 // 1024} KB (peak {peak // 1024} KB while adding)")
+
+# --- TEST 4: The store persists bitmaps and keeps retractions ---
+def test_store_roundtrip():
+    with workdir():
+        store = KeeperCheckpointStore('keeper_state.db')
+        store.mark_processed(TX_HASH, 0, (VERIFIER_A, 5))
+        store.mark_processed(TX_HASH, 1, (VERIFIER_A, 6))
+        store.mark_processed(TX_HASH, 2, (VERIFIER_B, 5))
+        assert (VERIFIER_A, 5) in store.processed_conditions(), "pending bits not visible before flush"
+        store.close()
+
+        # A second process sharing the file adds its own bits
+        other = KeeperCheckpointStore('keeper_state.db')
+        other.mark_processed(TX_HASH, 3, (VERIFIER_A, 9))
+        other.unmark_processed(TX_HASH, 1, (VERIFIER_A, 6))
+        other.close()
+
+        store = KeeperCheckpointStore('keeper_state.db')
+        processed = store.processed_conditions()
+        store.close()
+    assert (VERIFIER_A, 5) in processed and (VERIFIER_A, 9) in processed and (VERIFIER_B, 5) in processed
+    assert (VERIFIER_A, 6) not in processed, "retracted condition still marked"
+    print("✅ Bitmaps restored from the store, merged across writers, retraction kept")
+
+if __name__ == "__main__":
+    print("---TEST 1: Bitmap operations---")
+    test_bitmap()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 2: Per-verifier tracking---")
+    test_per_verifier()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 3: Memory for a million conditions---")
+    test_million_conditions()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 4: Store persistence---")
+    test_store_roundtrip()
+    print("---------------------------------------------------------------------------------")
@@ -0,0 +1,78 @@
+import os, sys
+from web3 import Web3
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from contractCache import ContractCache, load_abi
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+ESCROW_ABI_PATH = os.path.join(REPO_ROOT, 'contracts', 'Escrow.abi')
+
+
+# --- HELPER FUNCTIONS ---
+def escrow_address(i):
+    return Web3.to_checksum_address(f"0x{i + 1:040x}")
+
+class CountingEth:
+    """w3.eth stand-in that counts the contract objects built"""
+    def __init__(self):
+        self.w3 = Web3()
+        self.built = 0
+
+    def contract(self, address, abi):
+        self.built += 1
+        return self.w3.eth.contract(address=address, abi=abi)
+
+class CountingWeb3:
+    def __init__(self):
+        self.eth = CountingEth()
+
+# --- TEST 1: An ABI is parsed once and shared ---
+def test_abi_shared():
+    abi = load_abi(ESCROW_ABI_PATH)
+    assert load_abi(ESCROW_ABI_PATH) is abi, "ABI parsed again"
+    assert any(entry.get('name') == 'release' for entry in abi)
+    print(f"✅ Escrow ABI parsed once, {len(abi)} entries shared by every caller")
+
+# --- TEST 2: Hits return the cached instance, case-insensitively ---
+def test_cache_hit():
+    w3 = CountingWeb3()
+    cache = ContractCache(w3)
+    abi = load_abi(ESCROW_ABI_PATH)
+    address = escrow_address(0)
+
+    contract = cache.get(address, abi)
+    assert cache.get(address, abi) is contract
+    assert cache.get(address.lower(), abi) is contract
+    assert w3.eth.built == 1 and len(cache) == 1, f"{w3.eth.built} contracts built"
+    print("✅ Repeated lookups reuse one contract instance")
+
+# --- TEST 3: The least recently used instance is evicted first ---
+def test_lru_eviction():
+    w3 = CountingWeb3()
+    cache = ContractCache(w3, maxsize=2)
+    abi = load_abi(ESCROW_ABI_PATH)
+    a, b, c = (escrow_address(i) for i in range(3))
+
+    first_a = cache.get(a, abi)
+    cache.get(b, abi)
+    assert cache.get(a, abi) is first_a  # a is now the most recently used
+    cache.get(c, abi)  # evicts b
+    assert len(cache) == 2
+    assert cache.get(a, abi) is first_a, "recently used entry evicted"
+    built = w3.eth.built
+    cache.get(b, abi)
+    assert w3.eth.built == built + 1, "evicted entry still cached"
+    print(f"✅ LRU keeps {cache.maxsize} instances and evicts the least recently used")
+
+if __name__ == "__main__":
+    print("---TEST 1: Shared ABI---")
+    test_abi_shared()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 2: Cache hits---")
+    test_cache_hit()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 3: LRU eviction---")
+    test_lru_eviction()
+    print("---------------------------------------------------------------------------------")
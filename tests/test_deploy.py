@@ -1,5 +1,6 @@
 import os, sys, json
 from web3 import Web3
+from web3.logs import DISCARD
 from datetime import datetime, timezone
 
 NETWORK_NAME = "ganache"
@@ -78,9 +79,30 @@ def create_eth_deposit_condition(cv_address, cv_abi, beneficiary_address, requir
     return condition_id
 
 
-def deploy_escrow_with_verifier(seller_address, timeout, beneficiary_address, required_amount):
+def deploy_escrow_factory():
+    """
+    Deploy an Escrow implementation and an EscrowFactory pointing at it
+
+    Returns: (factory_address, implementation_address)
+    """
+    deployer_private_key = os.environ.get('DEPLOYER_PRIVATE_KEY')
+    if not deployer_private_key:
+        raise Exception("DEPLOYER_PRIVATE_KEY not set in environment")
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+    from escrowFactory import deploy_factory
+
+    w3 = Web3(Web3.HTTPProvider("http://127.0.0.1:8545"))
+    factory_address, implementation, _ = deploy_factory(w3, deployer_private_key)
+
+    print(f"EscrowFactory deployed at: {factory_address}")
+    return factory_address, implementation
+
+
+def deploy_escrow_with_verifier(seller_address, timeout, beneficiary_address, required_amount, factory_address=None):
     """
     Deploy full escrow system: ConditionVerifier + Condition + Escrow
+    With factory_address the Escrow is a minimal proxy created by that EscrowFactory
     
     Returns: (escrow_address, escrow_abi, cv_address, cv_abi, condition_id, w3)
     """
@@ -103,10 +125,17 @@ def deploy_escrow_with_verifier(seller_address, timeout, beneficiary_address, re
     deployer_account = w3.eth.account.from_key(deployer_private_key)
     deployer_address = deployer_account.address
     
-    Escrow = w3.eth.contract(abi=escrow_abi, bytecode=escrow_bytecode)
+    if factory_address:
+        with open('contracts/EscrowFactory.abi') as f:
+            factory = w3.eth.contract(address=factory_address, abi=json.load(f))
+        escrow_call = factory.functions.create_escrow
+        gas = 400000
+    else:
+        escrow_call = w3.eth.contract(abi=escrow_abi, bytecode=escrow_bytecode).constructor
+        gas = 4000000
     nonce = w3.eth.get_transaction_count(deployer_address)
     
-    escrow_tx = Escrow.constructor(
+    escrow_tx = escrow_call(
         seller_address,
         timeout,
         cv_address,
@@ -115,14 +144,17 @@ def deploy_escrow_with_verifier(seller_address, timeout, beneficiary_address, re
     ).build_transaction({
         "from": deployer_address,
         "nonce": nonce,
-        "gas": 4000000,
+        "gas": gas,
         "gasPrice": w3.to_wei("20", "gwei"),
     })
     
     signed_escrow_tx = w3.eth.account.sign_transaction(escrow_tx, private_key=deployer_private_key)
     escrow_tx_hash = w3.eth.send_raw_transaction(signed_escrow_tx.raw_transaction)
     escrow_receipt = w3.eth.wait_for_transaction_receipt(escrow_tx_hash)
-    escrow_address = escrow_receipt.contractAddress
+    if factory_address:
+        escrow_address = factory.events.EscrowCreated().process_receipt(escrow_receipt, errors=DISCARD)[0]['args']['escrow']
+    else:
+        escrow_address = escrow_receipt.contractAddress
     
     print(f"Escrow deployed at: {escrow_address}")
     
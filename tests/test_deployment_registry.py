@@ -0,0 +1,184 @@
+import os, sys, time, multiprocessing
+from workdir import workdir
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+import deploymentRegistry
+from deploymentRegistry import (DeploymentRegistry, append_deployments, import_registry, latest_deployment,
+                                read_json, registry_enabled)
+from keeperBot import load_deployments
+
+VERIFIER = "0x2a524794D5884ba6b9E65e5Dab7Ba3a92aDF7C2F"
+SELLERS = ["0x3b958F4E8489b3540c56d87121aB597D6ECef05d", "0x946A84AD0C7952D5D03BB8D43e894cc069DC5157"]
+
+
+def escrow_record(i, verifier=VERIFIER):
+    return {
+        "contract": "Escrow",
+        "address": "0x" + format(i + 1, "040x"),
+        "txHash": format(i, "064x"),
+        "blockNumber": i,
+        "deployer": SELLERS[1],
+        "seller": SELLERS[i % 2],
+        "timestamp": f"2026-01-{1 + i % 28:02d}T00:00:00Z",
+        "constructorArgs": [SELLERS[i % 2], 3600, verifier, i, SELLERS[1]],
+        "factory": None,
+        "linkedContracts": {
+            "conditionVerifier": verifier,
+            "externalConditionId": i,
+            "beneficiary": SELLERS[1],
+            "requiredAmount": 1000 + i
+        }
+    }
+
+def append_batch(path, start, count):
+    registry = DeploymentRegistry(path)
+    for i in range(start, start + count):
+        registry.append([escrow_record(i)])
+    registry.close()
+
+def append_json_batch(start, count):
+    for i in range(start, start + count):
+        append_deployments([escrow_record(i)])
+
+# --- TEST 1: testnet.json round-trips through the registry ---
+def test_import_export():
+    with workdir():
+        append_deployments([{"contract": "ConditionVerifier", "address": VERIFIER, "txHash": "01",
+                             "deployer": SELLERS[1], "timestamp": "2026-01-01T00:00:00Z", "constructorArgs": []}])
+        append_deployments([escrow_record(i) for i in range(30)])
+        with open(deploymentRegistry.DEPLOYMENTS_PATH) as f:
+            original = f.read()
+        assert latest_deployment("Escrow")['address'] == escrow_record(29)['address']
+
+        # A missing or broken file creates no registry
+        with open('broken.json', 'w') as f:
+            f.write(original[:100])
+        for path in ('missing.json', 'broken.json'):
+            try:
+                import_registry(path)
+                raise AssertionError(f"importing {path} succeeded")
+            except (OSError, ValueError):
+                pass
+            assert not registry_enabled()
+            assert not [name for name in os.listdir('deployments') if 'registry' in name], os.listdir('deployments')
+
+        assert import_registry() == 31
+        registry = DeploymentRegistry()
+        os.remove(deploymentRegistry.DEPLOYMENTS_PATH)
+        assert registry.export_json() == 31
+        with open(deploymentRegistry.DEPLOYMENTS_PATH) as f:
+            assert f.read() == original, "export differs from the imported file"
+
+        assert registry.find_address(escrow_record(7)['address']) == [escrow_record(7)]
+        assert len(registry.find_seller(SELLERS[0].lower())) == 15
+        assert registry.find_condition(VERIFIER.lower(), 12) == [escrow_record(12)]
+        assert len(registry.between("2026-01-02T00:00:00Z", "2026-01-03T00:00:00Z")) == 3
+        registry.close()
+
+        # With the registry in place, appends and lookups go to it and testnet.json is left alone
+        append_deployments([escrow_record(30)])
+        assert latest_deployment("Escrow")['address'] == escrow_record(30)['address']
+        assert len(read_json()['deployments']) == 31
+        print("✅ Missing and broken files rejected without creating a registry")
+        print("✅ testnet.json exported byte for byte after import; lookups by address, seller, condition and time")
+
+# --- TEST 2: Concurrent appends from several processes ---
+def test_concurrent_appends():
+    with workdir():
+        DeploymentRegistry().close()
+        workers, per_worker = 4, 250
+        processes = [multiprocessing.Process(target=append_batch, args=(deploymentRegistry.REGISTRY_PATH, w * per_worker, per_worker))
+                     for w in range(workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            assert process.exitcode == 0
+
+        registry = DeploymentRegistry()
+        condition_ids = sorted(r['linkedContracts']['externalConditionId'] for r in registry.latest("Escrow"))
+        assert condition_ids == list(range(workers * per_worker)), "records lost or duplicated"
+        registry.close()
+        print(f"✅ {workers} processes appended {workers * per_worker} records one at a time, none lost")
+
+    # The testnet.json fallback serialises writers on its lock file (POSIX)
+    if deploymentRegistry.fcntl is None:
+        return
+    with workdir():
+        per_worker = 25
+        processes = [multiprocessing.Process(target=append_json_batch, args=(w * per_worker, per_worker))
+                     for w in range(workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            assert process.exitcode == 0
+        condition_ids = sorted(r['linkedContracts']['externalConditionId'] for r in read_json()['deployments'])
+        assert condition_ids == list(range(workers * per_worker)), "testnet.json records lost or duplicated"
+        assert not [name for name in os.listdir('deployments') if name.startswith('.testnet-')], "temporary file left behind"
+        print(f"✅ {workers} processes appended {workers * per_worker} records to testnet.json, none lost")
+
+# --- TEST 3: Appends and lookups stay flat as the registry grows ---
+def test_scaling():
+    with workdir():
+        registry = DeploymentRegistry()
+        timings = []
+        for size in (1000, 100000):
+            registry.append(escrow_record(i) for i in range(registry.last_id(), size))
+            began = time.perf_counter()
+            for i in range(200):
+                registry.append([escrow_record(size + i)])
+            append_ms = (time.perf_counter() - began) * 1000 / 200
+            began = time.perf_counter()
+            for i in range(200):
+                assert registry.find_condition(VERIFIER, i * (size // 200))
+            lookup_ms = (time.perf_counter() - began) * 1000 / 200
+            timings.append((size, append_ms, lookup_ms))
+
+        (_, small_append, small_lookup), (_, large_append, large_lookup) = timings
+        assert large_lookup < small_lookup * 5 + 0.5, timings
+        assert large_append < small_append * 5 + 1, timings
+        for query in ("SELECT record FROM deployments WHERE address = ?",
+                      "SELECT record FROM deployments WHERE seller = ?",
+                      "SELECT record FROM deployments WHERE verifier = ? AND condition_id = ?",
+                      "SELECT record FROM deployments WHERE timestamp BETWEEN ? AND ?",
+                      "SELECT record FROM deployments WHERE contract = ? ORDER BY id DESC"):
+            plan = " ".join(row[-1] for row in registry.conn.execute("EXPLAIN QUERY PLAN " + query, (None,) * query.count("?")))
+            assert "USING INDEX" in plan or "USING COVERING INDEX" in plan, (query, plan)
+        registry.close()
+        for size, append_ms, lookup_ms in timings:
+            print(f"✅ {size} records: append {append_ms:.3f} ms, condition lookup {lookup_ms:.3f} ms")
+
+# --- TEST 4: The keeper reads only new rows from the registry ---
+def test_keeper_incremental():
+    with workdir():
+        registry = DeploymentRegistry()
+        registry.append([escrow_record(i) for i in range(3)])
+        registry.close()
+
+        deployments = load_deployments()
+        assert len(deployments['escrow_contracts']) == 3
+        assert load_deployments(deployments) is deployments and len(deployments['escrow_contracts']) == 3
+        append_deployments([escrow_record(3), escrow_record(4)])
+        deployments = load_deployments(deployments)
+        assert [e['condition_id'] for e in deployments['escrow_contracts']] == [0, 1, 2, 3, 4]
+        assert deployments['by_condition'][(VERIFIER.lower(), 4)][0]['address'] == escrow_record(4)['address']
+        assert deployments['by_address'][escrow_record(4)['address'].lower()]['condition_id'] == 4
+        print("✅ Keeper picked up 2 appended escrows without re-reading the first 3")
+
+if __name__ == "__main__":
+    print("---TEST 1: Import and export---")
+    test_import_export()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 2: Concurrent appends---")
+    test_concurrent_appends()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 3: Scaling---")
+    test_scaling()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 4: Keeper incremental loading---")
+    test_keeper_incremental()
+    print("---------------------------------------------------------------------------------")
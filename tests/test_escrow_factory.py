@@ -0,0 +1,139 @@
+import os, sys, json
+from web3 import Web3
+from web3.logs import DISCARD
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+import bulkDeploy
+from escrowFactory import record_deployment, latest_factory_address, load_factory
+from contractCache import load_abi
+from test_deploy import deploy_escrow_factory, deploy_escrow_with_verifier
+from workdir import workdir
+
+w3 = Web3(Web3.HTTPProvider("http://127.0.0.1:8545"))
+assert w3.is_connected(), "Web3 connection failed!"
+deployer_priv = os.environ.get("DEPLOYER_PRIVATE_KEY")
+seller_priv = os.environ.get("SELLER_PRIVATE_KEY")
+deployer = w3.eth.account.from_key(deployer_priv)
+seller = w3.eth.account.from_key(seller_priv)
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+os.chdir(REPO_ROOT)
+ESCROW_ABI = load_abi('contracts/Escrow.abi')
+CV_ABI = load_abi('contracts/ConditionVerifier.abi')
+ZERO_ADDRESS = "0x" + "00" * 20
+
+
+# --- HELPER FUNCTIONS ---
+def send(fn, priv, value=0, gas=500000):
+    """Send a contract call and return its receipt"""
+    sender = w3.eth.account.from_key(priv).address
+    tx = fn.build_transaction({
+        'from': sender, 'value': value, 'gas': gas,
+        'nonce': w3.eth.get_transaction_count(sender), 'gasPrice': w3.to_wei('1', 'gwei')
+    })
+    signed = w3.eth.account.sign_transaction(tx, priv)
+    return w3.eth.wait_for_transaction_receipt(w3.eth.send_raw_transaction(signed.raw_transaction))
+
+def escrow_creation_cost(factory_address=None):
+    """(gas used, calldata bytes) of the transaction that creates the escrow"""
+    escrow_address, _, _, _, _, _ = deploy_escrow_with_verifier(seller.address, 3600, seller.address, 1000, factory_address)
+    block = w3.eth.get_block('latest', full_transactions=True)
+    tx = block.transactions[-1]
+    receipt = w3.eth.get_transaction_receipt(tx['hash'])
+    return escrow_address, receipt.gasUsed, len(tx.get('input', tx.get('data')))
+
+# --- TEST 1: A proxy costs a fraction of a full deployment ---
+def test_creation_cost():
+    factory_address, _ = deploy_escrow_factory()
+    _, full_gas, full_bytes = escrow_creation_cost()
+    _, proxy_gas, proxy_bytes = escrow_creation_cost(factory_address)
+    assert proxy_gas * 4 < full_gas, (proxy_gas, full_gas)
+    assert proxy_bytes * 10 < full_bytes, (proxy_bytes, full_bytes)
+    print(f"✅ Full Escrow: {full_gas} gas, {full_bytes} bytes of calldata")
+    print(f"✅ Proxy Escrow: {proxy_gas} gas ({full_gas / proxy_gas:.1f}x less), "
+          f"{proxy_bytes} bytes ({full_bytes / proxy_bytes:.0f}x less)")
+    return factory_address
+
+# --- TEST 2: A proxy escrow works end to end ---
+def test_proxy_lifecycle(factory_address):
+    escrow_address, _, cv_address, _, condition_id, _ = \
+        deploy_escrow_with_verifier(seller.address, 3600, seller.address, 1000, factory_address)
+    escrow = w3.eth.contract(address=escrow_address, abi=ESCROW_ABI)
+    cv = w3.eth.contract(address=cv_address, abi=CV_ABI)
+    assert w3.eth.get_code(escrow_address).hex().startswith("363d3d373d3d3d363d73"), "not an EIP-1167 proxy"
+    assert escrow.functions.buyer().call() == deployer.address
+    assert escrow.functions.seller().call() == seller.address
+    assert escrow.functions.external_condition_id().call() == condition_id
+    factory = load_factory(w3, factory_address)
+    assert factory.functions.escrow_count().call() == 2
+
+    assert send(escrow.functions.deposit(), deployer_priv, value=w3.to_wei(1, 'ether')).status == 1
+    assert send(cv.functions.deposit_eth(condition_id), seller_priv, value=1000).status == 1
+    balance = w3.eth.get_balance(seller.address)
+    receipt = send(escrow.functions.release(), seller_priv)
+    assert receipt.status == 1
+    released = escrow.events.Released().process_receipt(receipt, errors=DISCARD)
+    assert released and released[0]['address'] == escrow_address, "event not emitted by the proxy"
+    assert w3.eth.get_balance(escrow_address) == 0
+    assert w3.eth.get_balance(seller.address) > balance
+    print(f"✅ Proxy {escrow_address}: deposit, external condition and release all work")
+
+# --- TEST 3: initialize() only ever runs once ---
+def test_initialize_once(factory_address):
+    factory = load_factory(w3, factory_address)
+    implementation = factory.functions.implementation().call()
+    escrow_address, _, _, _, _, _ = \
+        deploy_escrow_with_verifier(seller.address, 3600, seller.address, 1000, factory_address)
+    for address in (escrow_address, implementation):
+        escrow = w3.eth.contract(address=address, abi=ESCROW_ABI)
+        try:
+            escrow.functions.initialize(seller.address, seller.address, 0, ZERO_ADDRESS, 0, seller.address).call(
+                {'from': seller.address})
+            reason = None
+        except Exception as e:
+            reason = str(e)
+        assert reason and "already initialized" in reason, f"{address} initialized twice"
+        assert escrow.functions.buyer().call() == deployer.address
+    print("✅ initialize() reverts on the proxy and on the implementation")
+
+# --- TEST 4: Bulk deployment through the recorded factory ---
+def test_bulk_through_factory(factory_address):
+    with workdir():
+        assert latest_factory_address(w3) is None
+        record_deployment(factory_address, ZERO_ADDRESS, b'\x00' * 32, deployer.address)
+        assert latest_factory_address(w3) == factory_address
+        # A later record without code (a restarted chain) is passed over
+        record_deployment(deployer.address, ZERO_ADDRESS, b'\x00' * 32, deployer.address)
+        assert latest_factory_address(w3) == factory_address
+        with open('escrows.json', 'w') as f:
+            json.dump([{"seller": seller.address, "timeout": 3600, "beneficiary": seller.address,
+                        "required_amount": 1000 + i} for i in range(5)], f)
+
+        rows = bulkDeploy.run(w3, deployer_priv, 'escrows.json', sign_workers=0)
+        assert all(row['error'] is None for row in rows), [row['error'] for row in rows]
+        for row in rows:
+            escrow = w3.eth.contract(address=row['escrow'], abi=ESCROW_ABI)
+            assert len(w3.eth.get_code(row['escrow'])) == 45
+            assert escrow.functions.external_condition_id().call() == row['condition_id']
+        with open('deployments/testnet.json') as f:
+            records = [d for d in json.load(f)['deployments'] if d['contract'] == "Escrow"]
+        assert [d['address'] for d in records] == [row['escrow'] for row in rows]
+        assert all(d['factory'] == factory_address for d in records)
+        print(f"✅ {len(rows)} proxy escrows deployed from a manifest and recorded")
+
+if __name__ == "__main__":
+    print("---TEST 1: Creation cost---")
+    factory_address = test_creation_cost()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 2: Proxy escrow lifecycle---")
+    test_proxy_lifecycle(factory_address)
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 3: Initialize only once---")
+    test_initialize_once(factory_address)
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 4: Bulk deployment through the factory---")
+    test_bulk_through_factory(factory_address)
+    print("---------------------------------------------------------------------------------")
@@ -0,0 +1,76 @@
+import os, sys, json
+from workdir import workdir
+from keeper_setup import (w3, deployer, deployer_priv, seller, seller_priv, ESCROW_DEPOSIT, REQUIRED_AMOUNT,
+                          send_tx, setup_escrows, fulfil, release_count)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from keeperBot import EscrowKeeperBot, load_deployments, find_escrows
+
+SHARING_ESCROWS = 3  # escrows linked to the same condition
+
+
+# --- HELPER FUNCTIONS ---
+def add_escrow(cv_address, condition_id):
+    """Deploy and fund another escrow on an existing condition and record it in testnet.json"""
+    with open('contracts/Escrow.abi') as f:
+        escrow_abi = json.load(f)
+    with open('contracts/Escrow.bin') as f:
+        escrow_bytecode = f.read().strip()
+    receipt = send_tx(
+        w3.eth.contract(abi=escrow_abi, bytecode=escrow_bytecode).constructor(
+            seller.address, 3600, cv_address, condition_id, seller.address
+        ),
+        deployer_priv
+    )
+    escrow = w3.eth.contract(address=receipt.contractAddress, abi=escrow_abi)
+    send_tx(escrow.functions.deposit(), deployer_priv, value=ESCROW_DEPOSIT, gas=500000)
+
+    with open('deployments/testnet.json') as f:
+        data = json.load(f)
+    data['deployments'].append({
+        "contract": "Escrow", "address": escrow.address, "txHash": "",
+        "blockNumber": receipt.blockNumber, "deployer": deployer.address, "seller": seller.address,
+        "timestamp": "", "constructorArgs": [],
+        "linkedContracts": {
+            "conditionVerifier": cv_address,
+            "externalConditionId": condition_id,
+            "beneficiary": seller.address,
+            "requiredAmount": REQUIRED_AMOUNT
+        }
+    })
+    with open('deployments/testnet.json', 'w') as f:
+        json.dump(data, f)
+    return escrow
+
+# --- TEST 1: Every escrow sharing a condition is indexed and released ---
+def test_shared_condition():
+    with workdir():
+        cv_contract, [(first, condition_id), (other, other_condition)] = setup_escrows([{}, {}])
+        sharing = [first] + [add_escrow(cv_contract.address, condition_id) for _ in range(SHARING_ESCROWS - 1)]
+
+        deployments = load_deployments()
+        found = find_escrows(deployments, cv_contract.address.lower(), condition_id)
+        assert [escrow['address'] for escrow in found] == [escrow.address for escrow in sharing], found
+        assert [escrow['address'] for escrow in find_escrows(deployments, cv_contract.address, other_condition)] == [other.address]
+        assert find_escrows(deployments, cv_contract.address, other_condition + 1) == []
+        print(f"✅ Index maps one condition to its {len(found)} escrows")
+
+        start_block = w3.eth.block_number
+        bot = EscrowKeeperBot(seller_priv, state_path='keeper_state.db')
+        bot.check_new_fulfilled_conditions()
+        fulfil(cv_contract, condition_id)
+        bot.check_new_fulfilled_conditions()
+        bot.wait_for_releases()
+        for escrow in sharing:
+            assert release_count(escrow, start_block) == 1, f"escrow {escrow.address} not released"
+        assert release_count(other, start_block) == 0, "escrow of another condition released"
+        print(f"✅ One ConditionFulfilled event released all {len(sharing)} escrows sharing it")
+
+        bot.stop_workers()
+        bot.receipts.stop()
+        bot.store.close()
+
+if __name__ == "__main__":
+    print("---TEST 1: Escrows sharing a condition---")
+    test_shared_condition()
+    print("---------------------------------------------------------------------------------")
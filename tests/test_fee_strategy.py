@@ -0,0 +1,48 @@
+import os, sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from feeStrategy import FeeStrategy, BUMP_PERCENT
+
+GWEI = 10**9
+
+
+def fee_strategy(base_fee, tip, max_fee_per_gas=500 * GWEI):
+    """FeeStrategy over a stand-in node whose fee history is one block at base_fee/tip"""
+    eth = SimpleNamespace(
+        fee_history=lambda blocks, newest, percentiles: {'baseFeePerGas': [base_fee], 'reward': [[tip]]},
+        gas_price=base_fee + tip
+    )
+    return FeeStrategy(SimpleNamespace(eth=eth), max_fee_per_gas)
+
+def raised(old, new):
+    return all(new[field] * 100 >= old[field] * BUMP_PERCENT for field in old)
+
+# --- TEST 1: A replacement raises every fee field ---
+def test_bump():
+    fees = fee_strategy(10 * GWEI, 2 * GWEI)
+    sent = fees.current()
+    assert sent == {'maxFeePerGas': 22 * GWEI, 'maxPriorityFeePerGas': 2 * GWEI}
+    bumped = fees.bump(sent)
+    assert bumped is not None and raised(sent, bumped), bumped
+    print(f"✅ {sent} bumped to {bumped}")
+
+# --- TEST 2: No replacement once the cap stops one field rising enough ---
+def test_bump_at_cap():
+    fees = fee_strategy(10 * GWEI, 2 * GWEI, max_fee_per_gas=25 * GWEI)
+    sent = fees.current()
+    # maxFeePerGas can only go from 22 to 25 gwei while the tip could still rise
+    assert fees.bump(sent) is None, "a capped maxFeePerGas went out with a raised tip"
+    assert fees.bump({'maxFeePerGas': 25 * GWEI, 'maxPriorityFeePerGas': 25 * GWEI}) is None
+    assert fees.bump({'gasPrice': 24 * GWEI}) is None
+    assert fees.bump({'gasPrice': 16 * GWEI}) == {'gasPrice': 20 * GWEI + 1}
+    print("✅ Bumps that would leave a field short of the increase are refused")
+
+if __name__ == "__main__":
+    print("---TEST 1: Bump---")
+    test_bump()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 2: Bump at the fee cap---")
+    test_bump_at_cap()
+    print("---------------------------------------------------------------------------------")
@@ -0,0 +1,57 @@
+import os, sys, urllib.request
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from keeperMetrics import KeeperMetrics, Histogram
+
+# --- TEST 1: Histogram buckets are cumulative and labelled ---
+def test_histogram_render():
+    histogram = Histogram("rpc_seconds", "RPC latency", (0.1, 1), ("method",))
+    for seconds in (0.05, 0.5, 0.5, 3):
+        histogram.observe(seconds, method="eth_call")
+    lines = histogram.render()
+
+    assert 'rpc_seconds_bucket{method="eth_call",le="0.1"} 1' in lines
+    assert 'rpc_seconds_bucket{method="eth_call",le="1"} 3' in lines
+    assert 'rpc_seconds_bucket{method="eth_call",le="+Inf"} 4' in lines
+    assert 'rpc_seconds_count{method="eth_call"} 4' in lines
+    assert 'rpc_seconds_sum{method="eth_call"} 4.05' in lines
+    print("✅ Histogram rendered with cumulative buckets")
+
+# --- TEST 2: The endpoint serves what the keeper recorded ---
+def test_metrics_endpoint():
+    metrics = KeeperMetrics()
+    metrics.events.inc()
+    metrics.releases.inc(result="success")
+    metrics.release_gas.observe(72478)
+    metrics.observe_rpc("eth_getLogs", 0.02)
+    metrics.observe_rpc("eth_getLogs", 0.03, failed=True)
+    metrics.queue_depth.set_function(lambda: 7)
+
+    port = metrics.serve(0, host="127.0.0.1")
+    try:
+        response = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5)
+        assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+        body = response.read().decode()
+    finally:
+        metrics.close()
+
+    for line in (
+        "keeper_events_total 1",
+        'keeper_releases_total{result="success"} 1',
+        "keeper_release_gas_used_sum 72478",
+        'keeper_rpc_requests_total{method="eth_getLogs"} 2',
+        'keeper_rpc_errors_total{method="eth_getLogs"} 1',
+        'keeper_rpc_request_duration_seconds_count{method="eth_getLogs"} 2',
+        "keeper_release_queue_depth 7",
+    ):
+        assert line in body.splitlines(), f"missing: {line}"
+    print(f"✅ /metrics served {len(body.splitlines())} lines")
+
+if __name__ == "__main__":
+    print("---TEST 1: Histogram rendering---")
+    test_histogram_render()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 2: Metrics endpoint---")
+    test_metrics_endpoint()
+    print("---------------------------------------------------------------------------------")
@@ -0,0 +1,103 @@
+import os, sys, time, threading
+from workdir import workdir
+from keeper_setup import w3, seller, seller_priv, setup_escrows, fulfil, release_count
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+import keeperBot
+from keeperBot import EscrowKeeperBot
+
+NUM_ESCROWS = 3
+
+
+# --- TEST 1: Slow receipts do not hold up event ingestion ---
+def test_slow_receipts():
+    with workdir():
+        cv_contract, escrows = setup_escrows([{}] * NUM_ESCROWS)
+        start_block = w3.eth.block_number
+        bot = EscrowKeeperBot(seller_priv, state_path='keeper_state.db', release_workers=2)
+        bot.check_new_fulfilled_conditions()
+
+        # Receipts "take forever" until the gate opens
+        gate = threading.Event()
+        settle_release = bot.settle_release
+        bot.settle_release = lambda release: gate.wait() and settle_release(release)
+
+        fulfilled_block = None
+        for _, condition_id in escrows:
+            receipt = fulfil(cv_contract, condition_id)
+            fulfilled_block = fulfilled_block or receipt.blockNumber
+        bot.nonces.resync(seller.address)
+        bot.check_new_fulfilled_conditions()
+        give_up = time.time() + 10
+        while len(bot.inflight_escrows) < 2 and time.time() < give_up:
+            time.sleep(0.1)
+        assert len(bot.inflight_escrows) == 2, "each worker should be waiting on one receipt"
+        assert bot.release_queue.qsize() == NUM_ESCROWS - 2
+
+        # Keeps tailing while both workers wait
+        began = time.monotonic()
+        bot.check_new_fulfilled_conditions()
+        elapsed = time.monotonic() - began
+        assert bot.last_block == w3.eth.block_number, "ingestion stalled behind the releases"
+        assert bot.checkpoint_block() < fulfilled_block, "checkpoint moved past releases still running"
+        print(f"✅ Polled to the head in {elapsed:.2f}s with 2 receipts outstanding and 1 release queued, "
+              f"checkpoint held at {bot.checkpoint_block()}")
+
+        gate.set()
+        bot.wait_for_releases()
+        for escrow, _ in escrows:
+            assert release_count(escrow, start_block) == 1, f"escrow {escrow.address} not released exactly once"
+        assert bot.checkpoint_block() == bot.last_block
+        print(f"✅ {NUM_ESCROWS} escrows released once the receipts arrived, checkpoint caught up")
+
+        bot.stop_workers()
+        bot.receipts.stop()
+        bot.store.close()
+
+# --- TEST 2: A full release queue blocks ingestion instead of growing ---
+def test_backpressure():
+    with workdir():
+        setup_escrows([{}] * NUM_ESCROWS)
+        queue_size = keeperBot.RELEASE_QUEUE_SIZE
+        keeperBot.RELEASE_QUEUE_SIZE = 4
+        try:
+            bot = EscrowKeeperBot(seller_priv, state_path='keeper_state.db', release_workers=1)
+        finally:
+            keeperBot.RELEASE_QUEUE_SIZE = queue_size
+
+        gate = threading.Event()
+        ran = []
+        bot.attempt_release = lambda escrow, condition_id, prescreened=False: gate.wait() and ran.append(condition_id)
+        jobs = [{'escrow': {'address': f"0x{i + 1:040x}"}, 'condition_id': i, 'block': 1, 'log': None,
+                 'fulfilled_at': None, 'prescreened': True} for i in range(10)]
+
+        def ingest():
+            for job in jobs:
+                bot.open_job(job)
+                bot.enqueue_release(job)
+        ingester = threading.Thread(target=ingest, daemon=True)
+        ingester.start()
+        time.sleep(0.5)
+        assert ingester.is_alive(), "ingestion did not block on the full queue"
+        assert bot.release_queue.qsize() == 4, bot.release_queue.qsize()
+        print(f"✅ Ingestion blocked with {bot.release_queue.qsize()} releases queued and 1 running")
+
+        gate.set()
+        ingester.join(timeout=5)
+        bot.wait_for_releases()
+        assert ran == list(range(10)), ran
+        assert not bot.open_blocks
+        print("✅ Queue drained in order once the worker moved on")
+
+        bot.stop_workers()
+        bot.receipts.stop()
+        bot.store.close()
+
+if __name__ == "__main__":
+    print("---TEST 1: Slow receipts do not stall ingestion---")
+    test_slow_receipts()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 2: Backpressure from a full release queue---")
+    test_backpressure()
+    print("---------------------------------------------------------------------------------")
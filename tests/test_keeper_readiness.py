@@ -0,0 +1,116 @@
+import os, sys, json, itertools
+from workdir import workdir
+from keeper_setup import (w3, seller, seller_priv, REPO_ROOT, send_tx, setup_escrows, fulfil,
+                          release_count)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from keeperBot import EscrowKeeperBot
+from readinessTracker import ReadinessTracker
+
+
+# --- HELPER FUNCTIONS ---
+def setup_escrow(internal_conditions):
+    """
+    One funded escrow (seller is the keeper account) with an ETH deposit
+    condition and the given internal conditions, recorded in the
+    working directory
+    Returns: (cv_contract, escrow_contract, condition_id)
+    """
+    cv_contract, [(escrow, condition_id)] = setup_escrows([{'conditions': internal_conditions}])
+    return cv_contract, escrow, condition_id
+
+# --- TEST 1: Internal conditions completed after the external one still release ---
+def test_internal_after_external():
+    with workdir():
+        cv_contract, escrow, condition_id = setup_escrow(["inspection", "delivery"])
+        start_block = w3.eth.block_number
+        bot = EscrowKeeperBot(seller_priv, state_path='keeper_state.db')
+        bot.check_new_fulfilled_conditions()
+        bot.wait_for_releases()
+
+        fulfil(cv_contract, condition_id)
+        send_tx(escrow.functions.fulfill_condition(0), seller_priv, gas=500000)
+        calls_before = bot.metrics.rpc_requests.value(method='eth_call')
+        bot.check_new_fulfilled_conditions()
+        bot.wait_for_releases()
+        assert release_count(escrow, start_block) == 0, "released with an internal condition open"
+        assert bot.metrics.rpc_requests.value(method='eth_call') == calls_before, "readiness read from storage"
+        print("✅ External condition met, escrow waits for its last internal condition (no eth_call)")
+
+        send_tx(escrow.functions.fulfill_condition(1), seller_priv, gas=500000)
+        bot.nonces.resync(seller.address)  # the test sent from the keeper's account
+        bot.check_new_fulfilled_conditions()
+        bot.wait_for_releases()
+        assert release_count(escrow, start_block) == 1, "not released once the last internal condition was met"
+        print("✅ Released on the Escrow's own ConditionFulfilled event")
+
+        bot.receipts.stop()
+        bot.store.close()
+
+# --- TEST 2: A restarted keeper restores readiness without reading history ---
+def test_history_on_restart():
+    with workdir():
+        cv_contract, escrow, condition_id = setup_escrow(["inspection"])
+        start_block = w3.eth.block_number
+        bot = EscrowKeeperBot(seller_priv, state_path='keeper_state.db')
+        bot.check_new_fulfilled_conditions()
+        bot.wait_for_releases()
+        fulfil(cv_contract, condition_id)
+        bot.check_new_fulfilled_conditions()
+        bot.wait_for_releases()
+        bot.receipts.stop()
+        bot.store.close()
+        assert release_count(escrow, start_block) == 0
+
+        # Down while the seller completes the internal condition
+        send_tx(escrow.functions.fulfill_condition(0), seller_priv, gas=500000)
+        bot = EscrowKeeperBot(seller_priv, state_path='keeper_state.db')
+        bot.check_new_fulfilled_conditions()
+        bot.wait_for_releases()
+        assert release_count(escrow, start_block) == 1, "not released after the restart"
+        # One eth_getLogs from the checkpoint on; none for the escrow's history
+        assert bot.metrics.rpc_requests.value(method='eth_getLogs') == 1, "history read again on restart"
+        print("✅ External condition from before the restart restored from the store, escrow released")
+
+        bot.receipts.stop()
+        bot.store.close()
+
+# --- TEST 3: Event order does not matter ---
+def test_any_order():
+    escrow = {'address': '0x' + '11' * 20, 'condition_verifier': '0x' + '22' * 20, 'condition_id': 7}
+    # The buyer adds the conditions up front; everything else may come in any order
+    added = [('ConditionAdded', 0), ('ConditionAdded', 1)]
+    steps = [('ConditionFulfilled', 0), ('ConditionFulfilled', 1), ('Deposited', None), ('external', None)]
+    with open(os.path.join(REPO_ROOT, 'contracts', 'Escrow.abi')) as f:
+        escrow_abi = json.load(f)
+    orders = 0
+    for rest in itertools.permutations(steps):
+        order = added + list(rest)
+        readiness = ReadinessTracker(w3, escrow_abi)
+        readiness.track(escrow)
+        ready_at = []
+        for position, (name, index) in enumerate(order):
+            event = {'address': escrow['address'], 'event': name, 'args': {'index': index},
+                     'blockNumber': position, 'logIndex': 0}
+            if name == 'external':
+                became_ready = readiness.set_external(escrow['address'], event)
+            else:
+                became_ready = readiness.apply(event)
+            if became_ready:
+                ready_at.append(position)
+        assert ready_at == [len(order) - 1], (order, ready_at)
+        orders += 1
+    print(f"✅ Ready exactly once, on the last event, in all {orders} possible orders")
+
+if __name__ == "__main__":
+    print("---TEST 1: Internal conditions after the external one---")
+    test_internal_after_external()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 2: Readiness restored on restart---")
+    test_history_on_restart()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 3: Readiness independent of event order---")
+    test_any_order()
+    print("---------------------------------------------------------------------------------")
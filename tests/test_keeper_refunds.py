@@ -0,0 +1,102 @@
+import os, sys, time
+from web3 import Web3
+from workdir import workdir
+from keeper_setup import w3, deployer_priv, buyer, seller_priv, setup_escrows, mine
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from keeperBot import EscrowKeeperBot, POLL_INTERVAL
+
+SHORT_TIMEOUT = 20  # seconds; longer than setting up the escrows
+LONG_TIMEOUT = 3600
+LIVE_ESCROWS = 100000
+
+
+# --- HELPER FUNCTIONS ---
+def refunded(escrow):
+    return len(escrow.events.Refunded().get_logs(from_block=0)) > 0
+
+def refund_timestamp(escrow):
+    log = escrow.events.Refunded().get_logs(from_block=0)[0]
+    return w3.eth.get_block(log['blockNumber'])['timestamp']
+
+# --- TEST 1: The keeper wakes at the deadline and refunds only what it should ---
+def test_refund_at_deadline():
+    with workdir():
+        _, escrows = setup_escrows([
+            {'timeout': SHORT_TIMEOUT},                                            # refund due
+            {'seller': buyer.address, 'timeout': SHORT_TIMEOUT, 'fulfilled': True},  # conditions met: not refundable
+            {'timeout': LONG_TIMEOUT},                                             # not due yet
+            {'timeout': SHORT_TIMEOUT, 'funded': False},                           # never funded
+        ])
+        expiring, fulfilled, long_lived, unfunded = [escrow for escrow, _ in escrows]
+        bot = EscrowKeeperBot(seller_priv, state_path='keeper_state.db', buyer_private_key=deployer_priv)
+        bot.check_new_fulfilled_conditions()
+
+        scheduled = set(bot.refunds.due)
+        assert scheduled == {e.address.lower() for e in (expiring, fulfilled, long_lived)}, scheduled
+        deadline = expiring.functions.start().call() + SHORT_TIMEOUT
+        assert bot.sleep_interval() <= POLL_INTERVAL
+        print(f"✅ {len(scheduled)} funded escrows scheduled, next wake-up in {bot.sleep_interval():.1f}s")
+
+        give_up = time.time() + 2 * SHORT_TIMEOUT
+        while not refunded(expiring) and time.time() < give_up:
+            time.sleep(bot.sleep_interval())
+            mine(1)  # a dev chain only mines on demand; keep its clock moving
+            bot.check_new_fulfilled_conditions()
+        assert refunded(expiring), "expired escrow was not refunded"
+        late = refund_timestamp(expiring) - deadline
+        assert late < POLL_INTERVAL, f"refund mined {late}s after the deadline"
+        print(f"✅ Expired escrow refunded {late}s after its deadline")
+
+        # Let the other short deadlines pass as well
+        last_deadline = max(e.functions.start().call() for e in (fulfilled, unfunded)) + SHORT_TIMEOUT
+        while bot.refunds.now() <= last_deadline + 1 and time.time() < give_up:
+            time.sleep(bot.sleep_interval())
+            mine(1)
+            bot.check_new_fulfilled_conditions()
+        assert not refunded(fulfilled), "escrow with fulfilled conditions was refunded"
+        assert not refunded(long_lived) and not refunded(unfunded)
+        assert set(bot.refunds.due) == {long_lived.address.lower()}
+        print("✅ Fulfilled, unexpired and unfunded escrows left alone")
+
+        bot.receipts.stop()
+        bot.store.close()
+
+# --- TEST 2: A wake-up only touches the escrows that are due ---
+def test_wakeup_cost():
+    with workdir():
+        setup_escrows([])
+        bot = EscrowKeeperBot(seller_priv, state_path='keeper_state.db', buyer_private_key=deployer_priv)
+        refunds = bot.refunds
+        now = refunds.now()
+        for i in range(LIVE_ESCROWS):
+            address = Web3.to_checksum_address(f"0x{i + 1:040x}")
+            refunds.deadlines[address.lower()] = (address, int(now) + 3600 + i)
+        due_soon = [address for address, _ in list(refunds.deadlines.values())[:3]]
+        for address, _ in refunds.deadlines.values():
+            refunds.schedule(address)
+        for i, address in enumerate(due_soon):
+            refunds.schedule(address, now - 1 - i)
+
+        attempted = []
+        refunds.attempt_refund = lambda address: attempted.append(address) or 0
+        began = time.perf_counter()
+        refunds.run_due()
+        elapsed = time.perf_counter() - began
+
+        assert sorted(attempted) == sorted(due_soon), attempted
+        assert 0 < refunds.seconds_until_due() <= 3600 + 1
+        assert elapsed < 0.05, f"wake-up took {elapsed * 1000:.1f}ms with {LIVE_ESCROWS} live escrows"
+        print(f"✅ Wake-up handled {len(attempted)} due of {LIVE_ESCROWS} live escrows in {elapsed * 1000:.2f}ms")
+
+        bot.receipts.stop()
+        bot.store.close()
+
+if __name__ == "__main__":
+    print("---TEST 1: Refund at the deadline---")
+    test_refund_at_deadline()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 2: Wake-up cost with many live escrows---")
+    test_wakeup_cost()
+    print("---------------------------------------------------------------------------------")
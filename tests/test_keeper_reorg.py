@@ -0,0 +1,114 @@
+import os, sys
+from workdir import workdir
+from keeper_setup import w3, buyer, seller, seller_priv, nonces, setup_escrows, fulfil, mine, release_count
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from keeperBot import EscrowKeeperBot
+from reorgTracker import ReorgTracker
+
+CONFIRMATIONS = 3
+
+
+# --- HELPER FUNCTIONS ---
+def setup_escrow():
+    """
+    One funded escrow (seller is the keeper account) with its ETH deposit
+    condition, recorded in the working directory
+    Returns: (cv_contract, escrow_contract, condition_id)
+    """
+    cv_contract, [(escrow, condition_id)] = setup_escrows([{}])
+    return cv_contract, escrow, condition_id
+
+# --- TEST 1: Events wait for the confirmation depth ---
+def test_confirmation_depth():
+    with workdir():
+        cv_contract, escrow, condition_id = setup_escrow()
+        start_block = w3.eth.block_number
+        bot = EscrowKeeperBot(seller_priv, confirmations=CONFIRMATIONS, state_path='keeper_state.db')
+        bot.check_new_fulfilled_conditions()
+        bot.wait_for_releases()
+
+        fulfil(cv_contract, condition_id)
+        for _ in range(CONFIRMATIONS - 1):
+            mine(1)
+            bot.check_new_fulfilled_conditions()
+            bot.wait_for_releases()
+            assert release_count(escrow, start_block) == 0, "released before the confirmation depth"
+        print(f"✅ No release while the event has fewer than {CONFIRMATIONS} confirmations")
+
+        mine(1)
+        bot.check_new_fulfilled_conditions()
+        bot.wait_for_releases()
+        assert release_count(escrow, start_block) == 1, "not released once confirmed"
+        print(f"✅ Released once the event reached {CONFIRMATIONS} confirmations")
+
+        bot.receipts.stop()
+        bot.store.close()
+
+# --- TEST 2: A reorg retracts the orphaned event and the canonical one is handled ---
+def test_reorg_retracts_event():
+    with workdir():
+        cv_contract, escrow, condition_id = setup_escrow()
+        start_block = w3.eth.block_number
+        bot = EscrowKeeperBot(seller_priv, state_path='keeper_state.db')
+        bot.check_new_fulfilled_conditions()
+        bot.wait_for_releases()
+
+        # Fork A: fulfilled and released, then orphaned by reverting to the snapshot
+        snapshot = w3.provider.make_request("evm_snapshot", [])['result']
+        orphaned = fulfil(cv_contract, condition_id)
+        bot.check_new_fulfilled_conditions()
+        bot.wait_for_releases()
+        assert release_count(escrow, start_block) == 1
+        assert (cv_contract.address, condition_id) in bot.processed_conditions
+        w3.provider.make_request("evm_revert", [snapshot])
+
+        # Fork B: a different block at the same height, the fulfilment lands later
+        # and the chain grows past fork A's head
+        nonces.resync(buyer.address)
+        bot.nonces.resync(seller.address)  # the orphaned release is gone, not back in the mempool
+        mine(1)
+        canonical = fulfil(cv_contract, condition_id)
+        mine(2)
+        assert w3.eth.get_block(orphaned.blockNumber)['hash'] != orphaned.blockHash
+        print(f"🔀 Fulfilment moved from block {orphaned.blockNumber} to {canonical.blockNumber}")
+
+        bot.check_new_fulfilled_conditions()
+
+        bot.wait_for_releases()
+        assert bot.metrics.reorgs.value() == 1, "reorg not detected"
+        assert release_count(escrow, start_block) == 1, "escrow not released on the canonical chain"
+        fulfilled = cv_contract.events.ConditionFulfilled().process_receipt(canonical)[0]
+        assert bot.store.is_processed(fulfilled['transactionHash'], fulfilled['logIndex'])
+        assert (cv_contract.address, condition_id) in bot.store.processed_conditions()
+        print("✅ Orphaned event retracted, canonical event released")
+
+        bot.receipts.stop()
+        bot.store.close()
+
+# --- TEST 3: The block hash buffer stays bounded ---
+def test_ring_bounded():
+    recent = ReorgTracker(size=8)
+    for block_number in range(10000):
+        recent.record(block_number, block_number.to_bytes(32, 'big'))
+    assert len(recent) == 8
+    assert recent.find_fork(lambda n: n.to_bytes(32, 'big')) is None
+
+    # Blocks from 9996 on replaced: fork at 9995, everything above forgotten
+    fork = recent.find_fork(lambda n: n.to_bytes(32, 'big') if n < 9996 else b'\xff' * 32)
+    assert fork == (9995, []), fork
+    assert len(recent) == 4
+    print("✅ Block hash buffer capped at its size over 10000 blocks")
+
+if __name__ == "__main__":
+    print("---TEST 1: Confirmation depth---")
+    test_confirmation_depth()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 2: Reorg retracts orphaned events---")
+    test_reorg_retracts_event()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 3: Bounded block hash buffer---")
+    test_ring_bounded()
+    print("---------------------------------------------------------------------------------")
@@ -0,0 +1,58 @@
+import os, sys
+from workdir import workdir
+from keeper_setup import w3, seller, seller_priv, setup_escrows, fulfil, mine, release_count
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from keeperBot import EscrowKeeperBot, find_escrow
+
+
+# --- HELPER FUNCTIONS ---
+def crash(bot):
+    """Stop the bot's threads without settling anything or flushing its store"""
+    bot.stop_workers()
+    bot.receipts.stop()
+    bot.store.conn.close()
+
+# --- TEST 1: A release sent before a crash is waited for, not sent again ---
+def test_restart_after_crash():
+    with workdir():
+        cv_contract, [(escrow, condition_id)] = setup_escrows([{}])
+        start_block = w3.eth.block_number
+        bot = EscrowKeeperBot(seller_priv, state_path='keeper_state.db', release_workers=0)
+        bot.check_new_fulfilled_conditions()
+        mine(1)
+        bot.check_new_fulfilled_conditions()  # tracks the escrow's readiness
+        checkpoint = bot.store.last_block()
+        assert checkpoint is not None
+
+        # The release is sent and saved as in flight, then the keeper dies
+        # before its receipt or the event's checkpoint is recorded
+        fulfil(cv_contract, condition_id)
+        release = bot.attempt_release(find_escrow(bot.deployments, escrow.address), condition_id)
+        assert release is not None, "release not sent"
+        bot.store.flush()
+        crash(bot)
+        sent = w3.eth.get_transaction_count(seller.address)
+
+        bot = EscrowKeeperBot(seller_priv, state_path='keeper_state.db', release_workers=0)
+        assert bot.last_block == checkpoint, f"resumed from {bot.last_block}, not the checkpoint {checkpoint}"
+        assert [row[1] for row in bot.store.inflight()] == [escrow.address], "in-flight release not saved"
+        bot.recover_inflight_releases()
+        bot.check_new_fulfilled_conditions()
+        bot.wait_for_releases()
+
+        assert w3.eth.get_transaction_count(seller.address) == sent, "release sent again after the restart"
+        assert release_count(escrow, start_block) == 1
+        assert not bot.store.inflight()
+        assert (cv_contract.address, condition_id) in bot.processed_conditions
+        assert bot.metrics.rpc_requests.value(method='eth_getLogs') == 1, "history rescanned on restart"
+        print(f"✅ Restarted from block {checkpoint + 1}: in-flight release waited for, nothing resent")
+
+        bot.stop_workers()
+        bot.receipts.stop()
+        bot.store.close()
+
+if __name__ == "__main__":
+    print("---TEST 1: Restart after a crash---")
+    test_restart_after_crash()
+    print("---------------------------------------------------------------------------------")
@@ -0,0 +1,208 @@
+import os, sys, time, asyncio, threading, subprocess
+from workdir import workdir
+from keeper_setup import w3, seller, seller_priv, REPO_ROOT, setup_escrows, fulfil, release_count
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from keeperBot import EscrowKeeperBot
+from asyncKeeperBot import AsyncEscrowKeeperBot
+
+NUM_ESCROWS = 2
+RETRY_BASE = 0.2  # seconds, instead of RETRY_BASE_SECONDS
+
+RETRY_CLI = os.path.join(REPO_ROOT, 'scripts', 'retryScheduler.py')
+
+
+# --- HELPER FUNCTIONS ---
+def wait_until(predicate, timeout=10):
+    give_up = time.time() + timeout
+    while not predicate():
+        if time.time() > give_up:
+            return False
+        time.sleep(0.05)
+    return True
+
+async def wait_until_async(predicate, timeout=10):
+    """wait_until() that keeps the event loop running"""
+    give_up = time.time() + timeout
+    while not predicate():
+        if time.time() > give_up:
+            return False
+        await asyncio.sleep(0.05)
+    return True
+
+def retry_cli(*args):
+    result = subprocess.run([sys.executable, RETRY_CLI, *args, '--state-db', 'keeper_state.db'],
+                            capture_output=True, text=True, check=True)
+    return result.stdout
+
+# --- TEST 1: A transient RPC error is retried without holding up new events ---
+def test_transient_error():
+    with workdir():
+        cv_contract, escrows = setup_escrows([{}] * NUM_ESCROWS)
+        start_block = w3.eth.block_number
+        bot = EscrowKeeperBot(seller_priv, state_path='keeper_state.db', release_workers=1)
+        bot.retries.base = RETRY_BASE
+        bot.check_new_fulfilled_conditions()
+
+        # The node drops the first send of the first escrow
+        (flaky, flaky_condition), (fresh, fresh_condition) = escrows
+        send = bot.nonces.send
+        failures = []
+        def flaky_send(call, tx, private_key):
+            if call.address == flaky.address and not failures:
+                failures.append(call.address)
+                raise ConnectionError("node unreachable")
+            return send(call, tx, private_key)
+        bot.nonces.send = flaky_send
+
+        # Hold the retry until the fresh event has been handled
+        gate = threading.Event()
+        run_retry = bot.run_retry
+        bot.retries.run = lambda escrow, condition_id: gate.wait() and run_retry(escrow, condition_id)
+
+        fulfil(cv_contract, flaky_condition)
+        bot.check_new_fulfilled_conditions()
+        bot.wait_for_releases()
+        assert failures and release_count(flaky, start_block) == 0
+        assert [row[0] for row in bot.store.retries()] == [flaky.address.lower()], "failed release not saved for a retry"
+        print(f"✅ RPC error on send saved for a retry: {bot.store.retries()[0][4]}")
+
+        fulfil(cv_contract, fresh_condition)
+        bot.check_new_fulfilled_conditions()
+        bot.wait_for_releases()
+        assert release_count(fresh, start_block) == 1, "fresh event waited for the retry"
+        print("✅ New event released while the retry was pending")
+
+        gate.set()
+        assert wait_until(lambda: release_count(flaky, start_block) == 1), "retry did not release the escrow"
+        assert wait_until(lambda: not bot.store.retries()), "retry not cleared after the release"
+        print(f"✅ Retry released {flaky.address} after the backoff")
+
+        bot.stop_workers()
+        bot.receipts.stop()
+        bot.store.close()
+
+# --- TEST 2: A release that keeps failing is dead-lettered and can be replayed ---
+def test_dead_letter_replay():
+    with workdir():
+        cv_contract, escrows = setup_escrows([{}] * NUM_ESCROWS)
+        start_block = w3.eth.block_number
+        bot = EscrowKeeperBot(seller_priv, state_path='keeper_state.db')
+        bot.retries.base = RETRY_BASE
+        bot.retries.max_attempts = 3
+        escrow, condition_id = escrows[0]
+        record = next(e for e in bot.deployments['escrow_contracts'] if e['address'] == escrow.address)
+
+        # External condition never met: every pre-check reverts
+        bot.attempt_release(record, condition_id)
+        assert wait_until(lambda: bot.store.dead_letters()), "release never dead-lettered"
+        escrow_key, _, attempts, reason, _ = bot.store.dead_letters()[0]
+        assert escrow_key == escrow.address.lower() and attempts == 3
+        assert reason == "External condition not fulfilled!", reason
+        assert not bot.store.retries()
+        listing = retry_cli('dead')
+        assert escrow_key in listing and reason in listing, listing
+        print(f"✅ Dead-lettered after {attempts} attempts with reason: {reason}")
+
+        # Fixed on chain, then replayed from the CLI
+        fulfil(cv_contract, condition_id)
+        print(retry_cli('replay', escrow.address).strip())
+        assert not bot.store.dead_letters()
+        bot.retries.reload()  # a running keeper does this every RETRY_RELOAD_SECONDS
+        assert wait_until(lambda: release_count(escrow, start_block) == 1), "replayed release did not run"
+        assert wait_until(lambda: not bot.store.retries())
+        print("✅ Replayed dead letter released the escrow")
+
+        bot.stop_workers()
+        bot.receipts.stop()
+        bot.store.close()
+
+# --- TEST 3: A release the multicall pre-screen rejects is retried, not dropped ---
+def test_prescreen_rejected():
+    with workdir():
+        cv_contract, escrows = setup_escrows([{}])
+        start_block = w3.eth.block_number
+        bot = EscrowKeeperBot(seller_priv, state_path='keeper_state.db', release_workers=1)
+        bot.retries.base = RETRY_BASE
+        bot.check_new_fulfilled_conditions()
+        escrow, condition_id = escrows[0]
+
+        # A node lagging behind the event still reports the external condition unmet
+        prescreen = bot.prescreen
+        def lagging_prescreen(addresses):
+            bot.prescreen = prescreen
+            return {address.lower(): {'seller': seller.address, 'state': 1, 'internal_fulfilled': True,
+                                      'external_fulfilled': False, 'ready': False} for address in addresses}
+        bot.prescreen = lagging_prescreen
+
+        fulfil(cv_contract, condition_id)
+        bot.check_new_fulfilled_conditions()
+        bot.wait_for_releases()
+        assert release_count(escrow, start_block) == 0
+        assert [(row[0], row[4]) for row in bot.store.retries()] == [
+            (escrow.address.lower(), "external condition not fulfilled")
+        ], bot.store.retries()
+        print(f"✅ Pre-screen rejection saved for a retry: {bot.store.retries()[0][4]}")
+
+        assert wait_until(lambda: release_count(escrow, start_block) == 1), "retry did not release the escrow"
+        assert wait_until(lambda: not bot.store.retries())
+        print("✅ Retry released the escrow once the node caught up")
+
+        bot.stop_workers()
+        bot.receipts.stop()
+        bot.store.close()
+
+# --- TEST 4: The async keeper retries a failed release before checkpointing past it ---
+async def _test_async_retry():
+    with workdir():
+        cv_contract, escrows = setup_escrows([{}])
+        start_block = w3.eth.block_number
+        bot = AsyncEscrowKeeperBot(seller_priv, state_path='keeper_state.db')
+        bot.retries.base = RETRY_BASE
+        await bot.setup()
+        escrow, condition_id = escrows[0]
+        try:
+            # The node drops the first send
+            send = bot.w3.eth.send_raw_transaction
+            failures = []
+            async def flaky_send(raw_transaction):
+                if not failures:
+                    failures.append(raw_transaction)
+                    raise ConnectionError("node unreachable")
+                return await send(raw_transaction)
+            bot.w3.eth.send_raw_transaction = flaky_send
+
+            fulfil(cv_contract, condition_id)
+            await bot.poll_once()
+            assert failures and release_count(escrow, start_block) == 0
+            assert [row[0] for row in bot.store.retries()] == [escrow.address.lower()], "failed release not saved for a retry"
+            assert (cv_contract.address, condition_id) in bot.processed_conditions
+            assert bot.store.last_block() == bot.last_block
+            print(f"✅ Failed async release saved for a retry, then checkpointed: {bot.store.retries()[0][4]}")
+
+            assert await wait_until_async(lambda: release_count(escrow, start_block) == 1), "retry did not release the escrow"
+            assert await wait_until_async(lambda: not bot.store.retries()), "retry not cleared after the release"
+            print(f"✅ Async retry released {escrow.address} after the backoff")
+        finally:
+            await asyncio.to_thread(bot.retries.stop)
+            bot.store.close()
+
+def test_async_retry():
+    asyncio.run(_test_async_retry())
+
+if __name__ == "__main__":
+    print("---TEST 1: Transient error retried off the main loop---")
+    test_transient_error()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 2: Dead letters and replay---")
+    test_dead_letter_replay()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 3: Pre-screen rejection retried---")
+    test_prescreen_rejected()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 4: Async keeper retry---")
+    test_async_retry()
+    print("---------------------------------------------------------------------------------")
@@ -0,0 +1,79 @@
+import os, sys, time, threading
+from workdir import workdir
+from keeper_setup import w3, buyer, buyer_priv, seller, seller_priv, setup_escrows, fulfil
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from keeperBot import EscrowKeeperBot
+from sellerKeystore import save_key, load_keystore
+
+PASSWORD = "keeper-test"
+ITERATIONS = 2 ** 10  # cheap scrypt for tests
+
+
+# --- HELPER FUNCTIONS ---
+def release_senders(escrow, from_block):
+    return [w3.eth.get_transaction(log['transactionHash'])['from']
+            for log in escrow.events.Released().get_logs(from_block=from_block)]
+
+# --- TEST 1: Keystore directory round trip ---
+def test_keystore():
+    with workdir():
+        for private_key in (seller_priv, buyer_priv):
+            save_key('keystore', private_key, PASSWORD, iterations=ITERATIONS)
+        accounts = load_keystore('keystore', PASSWORD)
+        assert {a.address for a in accounts} == {seller.address, buyer.address}
+        print(f"✅ {len(accounts)} seller accounts decrypted from {len(os.listdir('keystore'))} keystore files")
+
+        try:
+            load_keystore('keystore', "wrong password")
+            assert False, "wrong password accepted"
+        except ValueError as e:
+            print(f"✅ Wrong password rejected: {e}")
+
+# --- TEST 2: One keeper, two sellers, parallel lanes ---
+def test_two_sellers():
+    # The buyer key doubles as a second seller here
+    sellers = [seller.address, buyer.address, seller.address, buyer.address]
+    with workdir():
+        cv_contract, escrows = setup_escrows([{'seller': escrow_seller} for escrow_seller in sellers])
+        start_block = w3.eth.block_number
+        for private_key in (seller_priv, buyer_priv):
+            save_key('keystore', private_key, PASSWORD, iterations=ITERATIONS)
+        bot = EscrowKeeperBot(load_keystore('keystore', PASSWORD), state_path='keeper_state.db', release_workers=2)
+        bot.check_new_fulfilled_conditions()
+
+        # Receipts hold each worker until the gate opens
+        gate = threading.Event()
+        settle_release = bot.settle_release
+        bot.settle_release = lambda release: gate.wait() and settle_release(release)
+
+        for _, condition_id in escrows:
+            fulfil(cv_contract, condition_id)
+        bot.nonces.resync(buyer.address)  # the test sent from a keeper account
+        bot.check_new_fulfilled_conditions()
+        give_up = time.time() + 10
+        while len(bot.inflight_escrows) < 2 and time.time() < give_up:
+            time.sleep(0.1)
+        inflight = {escrow.address.lower(): seller_address for (escrow, _), seller_address in zip(escrows, sellers)
+                    if escrow.address.lower() in bot.inflight_escrows}
+        assert len(set(inflight.values())) == 2, f"releases in flight from {set(inflight.values())}"
+        print("✅ Both sellers had a release in flight at once")
+
+        gate.set()
+        bot.wait_for_releases()
+        for (escrow, _), escrow_seller in zip(escrows, sellers):
+            assert release_senders(escrow, start_block) == [escrow_seller], f"escrow {escrow.address} not released by its seller"
+        print(f"✅ {len(escrows)} escrows of 2 sellers released by one keeper, each signed by its seller")
+
+        bot.stop_workers()
+        bot.receipts.stop()
+        bot.store.close()
+
+if __name__ == "__main__":
+    print("---TEST 1: Seller keystore directory---")
+    test_keystore()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 2: Two sellers on one keeper---")
+    test_two_sellers()
+    print("---------------------------------------------------------------------------------")
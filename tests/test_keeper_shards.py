@@ -0,0 +1,136 @@
+import os, sys, time, signal, multiprocessing
+from workdir import workdir
+from keeper_setup import w3, seller, seller_priv, setup_escrows, fulfil, release_count
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from keeperShards import ShardedKeeperBot, shard_for
+from keeperBot import RELEASE_WORKERS
+
+NUM_ESCROWS = 16
+NUM_SHARDS = 4
+LEASE_SECONDS = 2
+
+
+
+# --- HELPER FUNCTIONS ---
+def start_workers(workdir, start_block, *worker_ids, release_workers=RELEASE_WORKERS):
+    state_path = os.path.join(workdir, 'keeper_state.db')
+    return [
+        ShardedKeeperBot(seller_priv, worker_id, num_shards=NUM_SHARDS,
+                         lease_seconds=LEASE_SECONDS, start_block=start_block, state_path=state_path,
+                         release_workers=release_workers)
+        for worker_id in worker_ids
+    ]
+
+def run_killed_worker(workdir, start_block):
+    """
+    Worker a in a process of its own, releasing inline. Right after sending
+    its first release it gets SIGKILL, before confirming the release or
+    committing anything else.
+    """
+    worker, = start_workers(workdir, start_block, 'worker-a', release_workers=0)
+    def killed_track(tx_hash, timeout=120):
+        os.kill(os.getpid(), signal.SIGKILL)
+    worker.nonces.track = killed_track
+    while True:
+        worker.poll_once()
+        time.sleep(0.2)
+
+def leased_to(store, worker_id):
+    """Shards whose unexpired lease worker_id holds, read from the shared state file"""
+    with store.lock:
+        return [row[0] for row in store.conn.execute(
+            "SELECT shard FROM shard_leases WHERE owner = ? AND expires_at > ? ORDER BY shard",
+            (worker_id, time.time())
+        )]
+
+def balance_workers(workers):
+    """Poll every worker until the shards are split evenly"""
+    for _ in range(3):
+        for worker in workers:
+            worker.poll_once()
+    return [sorted(worker.leases) for worker in workers]
+
+# --- TEST 1: Two workers split the shards and never overlap ---
+def test_shard_split():
+    with workdir() as path:
+        cv_contract, escrows = setup_escrows([{}] * NUM_ESCROWS)
+        start_block = w3.eth.block_number + 1
+        a, b = start_workers(path, start_block, 'worker-a', 'worker-b')
+
+        shards_a, shards_b = balance_workers([a, b])
+        assert len(shards_a) == len(shards_b) == NUM_SHARDS // 2, f"uneven split: {shards_a} / {shards_b}"
+        assert not set(shards_a) & set(shards_b), "a shard is leased to both workers"
+        print(f"✅ Shards split evenly: a={shards_a} b={shards_b}")
+
+        released_before = w3.eth.get_transaction_count(seller.address)
+        for _, condition_id in escrows:
+            fulfil(cv_contract, condition_id)
+        a.poll_once()
+        b.poll_once()
+
+        for escrow, condition_id in escrows:
+            assert release_count(escrow, start_block) == 1, f"escrow {escrow.address} not released exactly once"
+        assert w3.eth.get_transaction_count(seller.address) - released_before == NUM_ESCROWS
+        print(f"✅ {NUM_ESCROWS} escrows released exactly once across 2 workers")
+
+        for worker in (a, b):
+            worker.stop_workers()
+            worker.store.close()
+
+# --- TEST 2: A worker process is killed mid-run; its shards move without loss or duplicates ---
+def test_worker_killed():
+    with workdir() as path:
+        cv_contract, escrows = setup_escrows([{}] * NUM_ESCROWS)
+        start_block = w3.eth.block_number + 1
+        # Worker a runs in its own (spawned) process, so the kill is a real SIGKILL
+        worker_a = multiprocessing.get_context('spawn').Process(target=run_killed_worker, args=(path, start_block))
+        worker_a.start()
+        b, = start_workers(path, start_block, 'worker-b')
+
+        deadline = time.time() + 60
+        while True:
+            b.poll_once()
+            shards_a = leased_to(b.store, 'worker-a')
+            if len(shards_a) == len(b.leases) == NUM_SHARDS // 2:
+                break
+            assert time.time() < deadline, f"shards never split: a={shards_a} b={sorted(b.leases)}"
+            time.sleep(0.2)
+
+        cv_address = cv_contract.address
+        owned_by_a = [cid for _, cid in escrows if shard_for(cv_address, cid, NUM_SHARDS) in shards_a]
+        assert len(owned_by_a) >= 2, "need at least two of worker a's conditions for this test"
+
+        released_before = w3.eth.get_transaction_count(seller.address)
+        for _, condition_id in escrows:
+            fulfil(cv_contract, condition_id)
+
+        worker_a.join(timeout=120)
+        assert worker_a.exitcode == -signal.SIGKILL, f"worker a exited with {worker_a.exitcode}"
+        print("💀 Worker a process killed (SIGKILL) after sending one release")
+
+        # Survivor handles its own shards, then takes over a's once the leases expire
+        b.poll_once()
+        time.sleep(LEASE_SECONDS + 0.5)
+        b.poll_once()
+        assert sorted(b.leases) == list(range(NUM_SHARDS)), f"survivor holds {sorted(b.leases)}"
+        assert not b.store.inflight(), "in-flight release left unsettled"
+
+        for escrow, condition_id in escrows:
+            count = release_count(escrow, start_block)
+            assert count == 1, f"escrow {escrow.address} (condition {condition_id}) released {count} times"
+        # One transaction per escrow: no duplicate release was even attempted
+        assert w3.eth.get_transaction_count(seller.address) - released_before == NUM_ESCROWS
+        print(f"✅ Survivor took over all shards; {NUM_ESCROWS} escrows released exactly once")
+
+        b.stop_workers()
+        b.store.close()
+
+if __name__ == "__main__":
+    print("---TEST 1: Shard split between two workers---")
+    test_shard_split()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 2: Worker process killed mid-run---")
+    test_worker_killed()
+    print("---------------------------------------------------------------------------------")
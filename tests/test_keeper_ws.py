@@ -0,0 +1,114 @@
+import os, sys, json, asyncio
+from eth_account import Account
+from ws_standin import StandinNode
+from workdir import workdir
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+import asyncKeeperBot
+from asyncKeeperBot import AsyncEscrowKeeperBot
+
+VERIFIER = "0x3E093cBC61e9801bd1e70C0D16Bb0B59cBa2A885"
+
+# --- HELPER FUNCTIONS ---
+def record_verifier():
+    """
+    testnet.json in the working directory that only records a
+    ConditionVerifier (no escrows, so nothing is ever released)
+    """
+    with open(os.path.join('deployments', 'testnet.json'), 'w') as f:
+        json.dump({"network": "ganache", "deployments": [{
+            "contract": "ConditionVerifier",
+            "address": VERIFIER,
+            "txHash": "",
+            "deployer": "",
+            "timestamp": "",
+            "constructorArgs": []
+        }]}, f)
+
+async def wait_for(predicate, timeout=10):
+    """Poll predicate() until it is true or timeout seconds pass"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            return False
+        await asyncio.sleep(0.05)
+    return True
+
+def processed(bot, *condition_ids):
+    return all((VERIFIER, condition_id) in bot.processed_conditions for condition_id in condition_ids)
+
+async def start_keeper(node):
+    record_verifier()
+    bot = AsyncEscrowKeeperBot(Account.create().key, state_path='keeper_state.db')
+    task = asyncio.create_task(bot.run_subscribed(node.url))
+    assert await wait_for(lambda: len(node.subscriptions) == 1), "keeper never subscribed"
+    return bot, task
+
+async def stop_keeper(task):
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+# --- TEST 1: Blocks are processed as soon as their header is pushed ---
+async def _test_push_latency():
+    with workdir():
+        node = StandinNode()
+        await node.start()
+        bot, task = await start_keeper(node)
+        try:
+            await node.mine([0, 1], verifier=VERIFIER)
+            # Well under POLL_INTERVAL: only a push can explain it
+            assert await wait_for(lambda: processed(bot, 0, 1), timeout=1), \
+                "conditions 0/1 not processed after newHeads push"
+            assert bot.last_block == node.block_number
+            assert bot.fees.w3 is bot.w3, "fees priced over another connection"
+            print("✅ newHeads push processed in < 1s")
+        finally:
+            await stop_keeper(task)
+            await node.stop()
+
+def test_push_latency():
+    asyncio.run(_test_push_latency())
+
+# --- TEST 2: Dropped socket reconnects and backfills the gap ---
+async def _test_reconnect_backfill():
+    asyncKeeperBot.RECONNECT_MIN_DELAY = 0.1
+    with workdir():
+        node = StandinNode()
+        await node.start()
+        bot, task = await start_keeper(node)
+        try:
+            await node.mine([0], verifier=VERIFIER)
+            assert await wait_for(lambda: processed(bot, 0))
+
+            # Node restarts; two blocks are mined while the keeper is disconnected
+            await node.drop_connections()
+            await node.mine([1], verifier=VERIFIER, notify=False)
+            await node.mine([2], verifier=VERIFIER, notify=False)
+
+            assert await wait_for(lambda: len(node.subscriptions) == 1), "keeper did not reconnect"
+            assert await wait_for(lambda: processed(bot, 1, 2)), "gap was not backfilled"
+            assert bot.fees.w3 is bot.w3, "fee strategy left on the dropped connection"
+            print("✅ Reconnected and backfilled blocks mined while disconnected")
+
+            await node.mine([3], verifier=VERIFIER)
+            assert await wait_for(lambda: processed(bot, 3), timeout=1), "live tailing did not resume"
+            assert bot.last_block == node.block_number
+            print("✅ Live tailing resumed after reconnect")
+        finally:
+            await stop_keeper(task)
+            await node.stop()
+
+def test_reconnect_backfill():
+    asyncio.run(_test_reconnect_backfill())
+
+if __name__ == "__main__":
+    print("---TEST 1: newHeads push latency---")
+    test_push_latency()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 2: Reconnect and backfill---")
+    test_reconnect_backfill()
+    print("---------------------------------------------------------------------------------")
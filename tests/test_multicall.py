@@ -0,0 +1,60 @@
+import os, sys
+from workdir import workdir
+from keeper_setup import w3, deployer, deployer_priv, seller, nonces, setup_escrows
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from multicall import deploy_multicall, load_multicall, check_release_ready, not_ready_reason, aggregate
+
+
+# --- HELPER FUNCTIONS ---
+def setup_multicall(specs):
+    """Escrows from specs (see setup_escrows) and a fresh EscrowMulticall"""
+    cv_contract, escrows = setup_escrows(specs)
+    address, _ = deploy_multicall(w3, deployer_priv)
+    nonces.resync(deployer.address)
+    return load_multicall(w3, address), [escrow for escrow, _ in escrows]
+
+# --- TEST 1: Readiness of escrows in every state from batched eth_calls ---
+def test_check_release_ready():
+    with workdir():
+        multicall, escrows = setup_multicall([
+            {'fulfilled': True},                                 # ready
+            {},                                                  # external condition unmet
+            {'funded': False, 'fulfilled': True},                # not funded
+            {'conditions': ["inspection"], 'fulfilled': True},   # internal condition open
+        ])
+        statuses = check_release_ready(multicall, [escrow.address for escrow in escrows], batch_size=3)
+
+        assert list(statuses) == [escrow.address for escrow in escrows], "escrows missing or out of order"
+        ready, unmet, unfunded, inspected = (statuses[escrow.address] for escrow in escrows)
+        assert ready['ready'] and ready['state'] == 1 and ready['seller'] == seller.address
+        assert not_ready_reason(unmet) == "external condition not fulfilled", unmet
+        assert not_ready_reason(unfunded) == "escrow not funded", unfunded
+        assert not_ready_reason(inspected) == "internal conditions not fulfilled", inspected
+        print(f"✅ {len(statuses)} escrows screened across 2 eth_calls, each with the right verdict")
+
+# --- TEST 2: aggregate() decodes every call and maps a revert to None ---
+def test_aggregate():
+    with workdir():
+        multicall, (escrow, other) = setup_multicall([{}, {'conditions': ["inspection"]}])
+        results = aggregate(multicall, [
+            escrow.functions.state(),
+            escrow.functions.seller(),
+            escrow.functions.get_condition(0),  # no internal conditions: reverts
+            other.functions.get_condition(0),
+            other.functions.get_num_conditions(),
+        ], batch_size=2)
+
+        assert results[0] == 1 and results[1].lower() == seller.address.lower(), results
+        assert results[2] is None, f"reverting call decoded as {results[2]}"
+        assert list(results[3]) == ["inspection", False] and results[4] == 1, results
+        print(f"✅ {len(results)} view calls aggregated, the reverting one returned None")
+
+if __name__ == "__main__":
+    print("---TEST 1: Batched release readiness---")
+    test_check_release_ready()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 2: Aggregated view calls---")
+    test_aggregate()
+    print("---------------------------------------------------------------------------------")
@@ -0,0 +1,106 @@
+import os, sys
+from web3 import Web3
+from workdir import workdir
+from keeper_setup import deployer, deployer_priv, seller, REQUIRED_AMOUNT
+from test_deploy import deploy_condition_verifier
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from nonceManager import NonceManager
+from keeperMetrics import KeeperMetrics
+
+NUM_TXS = 5
+
+
+# --- HELPER FUNCTIONS ---
+def counted_web3():
+    """Web3 whose JSON-RPC requests are counted per method in metrics.rpc_requests"""
+    metrics = KeeperMetrics()
+    w3 = Web3(Web3.HTTPProvider("http://127.0.0.1:8545"))
+    w3.middleware_onion.add(metrics.middleware(), name='metrics')
+    return w3, metrics
+
+def setup_verifier(w3):
+    cv_address, cv_abi, _ = deploy_condition_verifier()
+    return w3.eth.contract(address=cv_address, abi=cv_abi)
+
+def create_condition(manager, cv_contract):
+    """Send a create_eth_deposit_condition without waiting; returns (tx_hash, nonce)"""
+    return manager.send(cv_contract.functions.create_eth_deposit_condition(seller.address, REQUIRED_AMOUNT), {
+        'from': deployer.address, 'gas': 500000, 'gasPrice': Web3.to_wei('20', 'gwei')
+    }, deployer_priv)
+
+# --- TEST 1: A run of sends reads the nonce once and is confirmed afterwards ---
+def test_pipelined_sends():
+    with workdir():
+        w3, metrics = counted_web3()
+        cv_contract = setup_verifier(w3)
+        manager = NonceManager(w3)
+
+        sent = [create_condition(manager, cv_contract) for _ in range(NUM_TXS)]
+        nonce_reads = metrics.rpc_requests.value(method='eth_getTransactionCount')
+        assert nonce_reads == 1, f"{nonce_reads} eth_getTransactionCount calls for {NUM_TXS} sends"
+        first = sent[0][1]
+        assert [nonce for _, nonce in sent] == list(range(first, first + NUM_TXS))
+        assert metrics.rpc_requests.value(method='eth_getTransactionReceipt') == 0, "a send waited for a receipt"
+
+        receipts = [manager.wait(tx_hash) for tx_hash, _ in sent]
+        assert all(receipt.status == 1 for receipt in receipts)
+        assert not any(manager._sent.values()), "confirmed transactions still tracked"
+        print(f"✅ {NUM_TXS} transactions sent back-to-back on nonces {first}..{first + NUM_TXS - 1} with 1 nonce read")
+
+# --- TEST 2: A failed send leaves no nonce gap ---
+def test_resync_after_send_error():
+    with workdir():
+        w3, _ = counted_web3()
+        cv_contract = setup_verifier(w3)
+        manager = NonceManager(w3)
+        tx_hash, nonce = create_condition(manager, cv_contract)
+        manager.wait(tx_hash)
+
+        # The node drops the next send after its nonce was reserved
+        send_raw_transaction = w3.eth.send_raw_transaction
+        def failing_send(raw_transaction):
+            w3.eth.send_raw_transaction = send_raw_transaction
+            raise ConnectionError("node unreachable")
+        w3.eth.send_raw_transaction = failing_send
+        try:
+            create_condition(manager, cv_contract)
+            assert False, "send error swallowed"
+        except ConnectionError:
+            pass
+
+        tx_hash, next_nonce = create_condition(manager, cv_contract)
+        assert next_nonce == nonce + 1, f"nonce {nonce + 1} skipped after the failed send"
+        assert manager.wait(tx_hash).status == 1
+        print(f"✅ Nonce {next_nonce} reused after the failed send, no gap")
+
+# --- TEST 3: A nonce taken by another sender is detected and skipped ---
+def test_resync_after_nonce_error():
+    with workdir():
+        w3, _ = counted_web3()
+        cv_contract = setup_verifier(w3)
+        manager = NonceManager(w3)
+        tx_hash, nonce = create_condition(manager, cv_contract)
+        manager.wait(tx_hash)
+
+        # Another process sends from the same account
+        other = NonceManager(w3)
+        other.wait(create_condition(other, cv_contract)[0])
+
+        tx_hash, next_nonce = create_condition(manager, cv_contract)
+        assert next_nonce == nonce + 2, f"sent on nonce {next_nonce}"
+        assert manager.wait(tx_hash).status == 1
+        print(f"✅ Stale nonce {nonce + 1} rejected by the node, resent on {next_nonce}")
+
+if __name__ == "__main__":
+    print("---TEST 1: Pipelined sends---")
+    test_pipelined_sends()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 2: Resync after a send error---")
+    test_resync_after_send_error()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 3: Resync after a nonce error---")
+    test_resync_after_nonce_error()
+    print("---------------------------------------------------------------------------------")
@@ -0,0 +1,51 @@
+import os, sys, threading
+from web3 import Web3
+from workdir import workdir
+from keeper_setup import w3, deployer, deployer_priv, seller, REQUIRED_AMOUNT
+from test_deploy import deploy_condition_verifier
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from nonceManager import NonceManager
+from receiptTracker import ReceiptTracker
+
+NUM_TXS = 10
+
+
+# --- TEST 1: One batched poll resolves every tracked transaction ---
+def test_batched_poll():
+    with workdir():
+        cv_address, cv_abi, _ = deploy_condition_verifier()
+        cv_contract = w3.eth.contract(address=cv_address, abi=cv_abi)
+        manager = NonceManager(w3)
+        tx_hashes = [manager.send(cv_contract.functions.create_eth_deposit_condition(seller.address, REQUIRED_AMOUNT), {
+            'from': deployer.address, 'gas': 500000, 'gasPrice': Web3.to_wei('20', 'gwei')
+        }, deployer_priv)[0] for _ in range(NUM_TXS)]
+
+        tracker = ReceiptTracker(w3)
+        # Hold the first poll until every transaction is tracked
+        gate = threading.Event()
+        polls = []
+        poll = tracker._poll
+        def counted_poll():
+            gate.wait()
+            polls.append(tracker.pending())
+            poll()
+        tracker._poll = counted_poll
+        mined = []
+        futures = [tracker.track(tx_hash, callback=lambda tx_hash, receipt: mined.append(tx_hash))
+                   for tx_hash in tx_hashes]
+        gate.set()
+
+        receipts = [future.result(timeout=30) for future in futures]
+        tracker.stop()
+        assert [receipt.transactionHash for receipt in receipts] == tx_hashes
+        assert all(receipt.status == 1 for receipt in receipts)
+        assert polls == [NUM_TXS], f"polls with pending counts {polls}"
+        assert tracker._batch_supported, "receipts fetched one request at a time"
+        assert len(mined) == NUM_TXS and tracker.pending() == 0
+        print(f"✅ {NUM_TXS} receipts resolved by 1 batched poll")
+
+if __name__ == "__main__":
+    print("---TEST 1: Batched receipt polling---")
+    test_batched_poll()
+    print("---------------------------------------------------------------------------------")
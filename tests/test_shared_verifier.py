@@ -0,0 +1,154 @@
+import os, sys, json
+from web3 import Web3
+from workdir import workdir
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+import bulkDeploy
+from sharedVerifier import find_shared_verifier, shared_verifier, record_shared_verifier
+from keeperBot import EscrowKeeperBot, load_deployments
+from contractCache import load_abi
+
+w3 = Web3(Web3.HTTPProvider("http://127.0.0.1:8545"))
+assert w3.is_connected(), "Web3 connection failed!"
+deployer_priv = os.environ.get("DEPLOYER_PRIVATE_KEY")
+buyer_priv = os.environ.get("BUYER_PRIVATE_KEY")
+seller_priv = os.environ.get("SELLER_PRIVATE_KEY")
+deployer = w3.eth.account.from_key(deployer_priv)
+buyer = w3.eth.account.from_key(buyer_priv)
+seller = w3.eth.account.from_key(seller_priv)
+
+
+# --- HELPER FUNCTIONS ---
+def write_manifest(path, count, first_amount=1000):
+    with open(path, 'w') as f:
+        json.dump([{"seller": seller.address, "timeout": 3600, "beneficiary": buyer.address,
+                    "required_amount": first_amount + i} for i in range(count)], f)
+
+def send(fn, priv, value=0):
+    """Send a contract call and return its receipt"""
+    sender = w3.eth.account.from_key(priv).address
+    tx = fn.build_transaction({
+        'from': sender, 'value': value, 'gas': 500000,
+        'nonce': w3.eth.get_transaction_count(sender), 'gasPrice': w3.to_wei('20', 'gwei')
+    })
+    receipt = w3.eth.wait_for_transaction_receipt(
+        w3.eth.send_raw_transaction(w3.eth.account.sign_transaction(tx, priv).raw_transaction))
+    assert receipt.status == 1
+    return receipt
+
+def verifier_records():
+    with open('deployments/testnet.json') as f:
+        return [d for d in json.load(f)['deployments'] if d['contract'] == "ConditionVerifier"]
+
+# --- TEST 1: Manifests reuse one verifier, and the keeper watches it ---
+def test_reuse_across_runs():
+    with workdir():
+        write_manifest('first.json', 3)
+        write_manifest('second.json', 4, first_amount=2000)
+
+        first = bulkDeploy.run(w3, deployer_priv, 'first.json', use_shared_verifier=True)
+        cv_address = find_shared_verifier(w3)
+        assert cv_address is not None
+        blocks = w3.eth.block_number
+        second = bulkDeploy.run(w3, deployer_priv, 'second.json', use_shared_verifier=True)
+        assert all(row['error'] is None for row in first + second), [row['error'] for row in first + second if row['error']]
+        assert [row['condition_id'] for row in first + second] == list(range(7))
+        assert w3.eth.block_number - blocks == 2 * len(second), "second run deployed more than conditions and escrows"
+
+        records = verifier_records()
+        assert len(records) == 1 and records[0]['shared'] and records[0]['address'] == cv_address
+        cv = w3.eth.contract(address=cv_address, abi=load_abi('contracts/ConditionVerifier.abi'))
+        assert cv.functions.condition_count().call() == 7
+        for row in first + second:
+            escrow = w3.eth.contract(address=row['escrow'], abi=load_abi('contracts/Escrow.abi'))
+            assert escrow.functions.condition_verifier().call() == cv_address
+            assert escrow.functions.external_condition_id().call() == row['condition_id']
+
+        deployments = load_deployments()
+        assert deployments['condition_verifier']['address'] == cv_address
+        assert list(deployments['verifiers'].values()) == [cv_address]
+        assert set(deployments['by_condition']) == {(cv_address.lower(), i) for i in range(7)}
+        print(f"✅ 7 escrows over two manifests share ConditionVerifier {cv_address}; the keeper watches that one address")
+
+# --- TEST 2: Stale records are skipped, and a racing condition cannot take over an escrow ---
+def test_stale_record_and_race():
+    with workdir():
+        # A verifier recorded on another chain, and one whose contract is gone (restarted chain)
+        record_shared_verifier(deployer.address, b'\x01' * 32, deployer.address, w3.eth.chain_id + 1)
+        record_shared_verifier(seller.address, b'\x02' * 32, deployer.address, w3.eth.chain_id)
+        assert find_shared_verifier(w3) is None
+        cv_address, deployed = shared_verifier(w3, deployer_priv)
+        assert deployed and find_shared_verifier(w3) == cv_address
+        assert shared_verifier(w3, deployer_priv) == (cv_address, False)
+        print(f"✅ Records from another chain or without code ignored; {cv_address} deployed once and reused")
+
+        # Another account creates a condition just before the batch's first one
+        write_manifest('escrows.json', 3)
+        rows = bulkDeploy.load_manifest('escrows.json')
+        cv = w3.eth.contract(address=cv_address, abi=load_abi('contracts/ConditionVerifier.abi'))
+        send = w3.eth.send_raw_transaction
+        def racing_send(raw):
+            w3.eth.send_raw_transaction = send
+            tx = cv.functions.create_eth_deposit_condition(seller.address, 1).build_transaction({
+                'from': seller.address, 'nonce': w3.eth.get_transaction_count(seller.address),
+                'gas': 500000, 'gasPrice': w3.to_wei('20', 'gwei')
+            })
+            w3.eth.wait_for_transaction_receipt(send(w3.eth.account.sign_transaction(tx, seller_priv).raw_transaction))
+            return send(raw)
+        w3.eth.send_raw_transaction = racing_send
+        try:
+            bulkDeploy.deploy_manifest(w3, deployer_priv, rows, sign_workers=0, cv_address=cv_address)
+        finally:
+            if 'send_raw_transaction' in vars(w3.eth):
+                del w3.eth.send_raw_transaction
+        assert all(row['error'] is None for row in rows), [row['error'] for row in rows]
+        assert [row['condition_id'] for row in rows] == [1, 2, 3], "escrows not built from the emitted ids"
+        for row in rows:
+            escrow = w3.eth.contract(address=row['escrow'], abi=load_abi('contracts/Escrow.abi'))
+            assert escrow.functions.external_condition_id().call() == row['condition_id']
+            _, creator, beneficiary, required_amount, _, _, _, _, _ = \
+                cv.functions.get_condition_details(row['condition_id']).call()
+            assert (creator, beneficiary, required_amount) == (deployer.address, buyer.address, row['required_amount'])
+        print("✅ A condition created by someone else mid-batch is skipped; every escrow is linked to its own condition")
+
+# --- TEST 3: The keeper releases escrows of the shared verifier after a per-escrow deploy ---
+def test_keeper_watches_every_verifier():
+    with workdir():
+        write_manifest('shared.json', 2)
+        write_manifest('own.json', 2, first_amount=2000)
+        shared_rows = bulkDeploy.run(w3, deployer_priv, 'shared.json', use_shared_verifier=True)
+        own_rows = bulkDeploy.run(w3, deployer_priv, 'own.json')  # records a newer, unshared verifier
+        rows = shared_rows + own_rows
+        assert all(row['error'] is None for row in rows), [row['error'] for row in rows]
+        records = verifier_records()
+        assert len(records) == 2 and records[0]['shared'] and not records[1].get('shared')
+
+        bot = EscrowKeeperBot(seller_priv, state_path='keeper_state.db', release_workers=0)
+        bot.check_new_fulfilled_conditions()
+        start_block = w3.eth.block_number
+        for row, record in zip(rows, [records[0]] * 2 + [records[1]] * 2):
+            escrow = w3.eth.contract(address=row['escrow'], abi=load_abi('contracts/Escrow.abi'))
+            cv = w3.eth.contract(address=record['address'], abi=load_abi('contracts/ConditionVerifier.abi'))
+            send(escrow.functions.deposit(), deployer_priv, value=w3.to_wei(1, 'ether'))
+            send(cv.functions.deposit_eth(row['condition_id']), buyer_priv, value=row['required_amount'])
+        bot.check_new_fulfilled_conditions()
+        for row in rows:
+            escrow = w3.eth.contract(address=row['escrow'], abi=load_abi('contracts/Escrow.abi'))
+            assert len(escrow.events.Released().get_logs(from_block=start_block)) == 1, f"{row['escrow']} not released"
+        bot.stop_workers()
+        bot.receipts.stop()
+        bot.store.close()
+        print("✅ Escrows on the shared verifier and on a newer per-run verifier all released by one keeper")
+
+if __name__ == "__main__":
+    print("---TEST 1: Reuse across runs---")
+    test_reuse_across_runs()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 2: Stale records and racing conditions---")
+    test_stale_record_and_race()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 3: Keeper watches every verifier---")
+    test_keeper_watches_every_verifier()
+    print("---------------------------------------------------------------------------------")
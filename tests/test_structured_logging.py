@@ -0,0 +1,97 @@
+import os, sys, io, json, time, logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from structuredLogging import setup_logging, stop_logging, parse_levels
+
+TX_HASH = bytes.fromhex("ab" * 32)
+ESCROW = "0x2a524794D5884ba6b9E65e5Dab7Ba3a92aDF7C2F"
+
+
+class SlowStream(io.StringIO):
+    """A terminal or pipe that takes `delay` seconds per write"""
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+        self.writes = 0
+
+    def write(self, text):
+        time.sleep(self.delay)
+        self.writes += 1
+        return super().write(text)
+
+
+def records(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+# --- TEST 1: Records are JSON lines with the extra fields ---
+def test_json_lines():
+    stream = io.StringIO()
+    setup_logging("INFO", stream=stream)
+    log = logging.getLogger("keeperBot")
+    log.info("Release sent", extra={'escrow': ESCROW, 'tx_hash': TX_HASH, 'nonce': 7})
+    try:
+        raise ValueError("node unreachable")
+    except ValueError:
+        log.error("Error checking events", exc_info=True)
+    stop_logging()
+
+    sent, failed = records(stream)
+    assert sent['level'] == "INFO" and sent['logger'] == "keeperBot" and sent['msg'] == "Release sent"
+    assert sent['escrow'] == ESCROW and sent['nonce'] == 7
+    assert sent['tx_hash'] == "0x" + "ab" * 32, "bytes not written as hex"
+    assert sent['ts'].endswith('Z')
+    assert failed['level'] == "ERROR" and "ValueError: node unreachable" in failed['exc']
+    print(f"✅ JSON line: {stream.getvalue().splitlines()[0]}")
+
+# --- TEST 2: Levels can be set per logger ---
+def test_per_logger_levels():
+    assert parse_levels("WARNING,nonceManager=debug") == ("WARNING", {'nonceManager': "DEBUG"})
+    assert parse_levels("") == ("INFO", {})
+    try:
+        parse_levels("LOUD")
+        assert False, "unknown level accepted"
+    except ValueError:
+        pass
+
+    stream = io.StringIO()
+    setup_logging("WARNING,nonceManager=DEBUG", stream=stream)
+    logging.getLogger("keeperBot").info("hidden")
+    logging.getLogger("keeperBot").warning("shown")
+    logging.getLogger("nonceManager").debug("shown")
+    stop_logging()
+    logging.getLogger("nonceManager").setLevel(logging.NOTSET)
+
+    assert [(r['logger'], r['msg']) for r in records(stream)] == [("keeperBot", "shown"), ("nonceManager", "shown")]
+    print("✅ keeperBot at WARNING, nonceManager at DEBUG")
+
+# --- TEST 3: A slow writer never holds up the caller ---
+def test_non_blocking():
+    count = 50
+    stream = SlowStream(delay=0.02)  # 1s to write everything
+    setup_logging("INFO", stream=stream)
+    log = logging.getLogger("keeperBot")
+
+    began = time.monotonic()
+    for i in range(count):
+        log.info("Release sent", extra={'seq': i})
+    elapsed = time.monotonic() - began
+    assert elapsed < 0.2, f"logging {count} records took {elapsed:.3f}s"
+    assert stream.writes < count, "records written on the caller's thread"
+
+    stop_logging()  # flushes the queue
+    assert [r['seq'] for r in records(stream)] == list(range(count))
+    print(f"✅ {count} records logged in {elapsed * 1000:.1f} ms against a {count * stream.delay:.0f}s writer")
+
+if __name__ == "__main__":
+    print("---TEST 1: JSON lines---")
+    test_json_lines()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 2: Per-logger levels---")
+    test_per_logger_levels()
+    print("---------------------------------------------------------------------------------")
+
+    print("---TEST 3: Non-blocking writes---")
+    test_non_blocking()
+    print("---------------------------------------------------------------------------------")
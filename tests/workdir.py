@@ -0,0 +1,27 @@
+"""
+Temporary working directory for the tests that write deployments/
+"""
+
+import os, shutil, tempfile
+from contextlib import contextmanager
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+@contextmanager
+def workdir():
+    """
+    Fresh working directory with a copy of the compiled contracts and an
+    empty deployments/. On exit the previous working directory is restored
+    and the temporary one deleted.
+    """
+    previous = os.getcwd()
+    path = tempfile.mkdtemp()
+    try:
+        shutil.copytree(os.path.join(REPO_ROOT, 'contracts'), os.path.join(path, 'contracts'))
+        os.makedirs(os.path.join(path, 'deployments'))
+        os.chdir(path)
+        yield path
+    finally:
+        os.chdir(previous)
+        shutil.rmtree(path, ignore_errors=True)
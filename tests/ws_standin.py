@@ -0,0 +1,150 @@
+"""
+Local WebSocket stand-in for an Ethereum node
+Serves just enough JSON-RPC (eth_chainId, eth_blockNumber, eth_getLogs,
+eth_subscribe('newHeads')) over a real WebSocket for the keeper's push mode
+to be tested without Ganache. Blocks are "mined" by the test, which can also
+drop every open connection to simulate a node restart.
+"""
+
+import json
+import asyncio
+from web3 import Web3
+from eth_abi import encode
+from websockets.asyncio.server import serve
+
+CHAIN_ID = 1337
+ZERO_HASH = "0x" + "00" * 32
+FULFILLED_TOPIC = Web3.keccak(text="ConditionFulfilled(uint256,uint256,uint256)").to_0x_hex()
+
+
+def _block_hash(number):
+    return Web3.keccak(text=f"standin-block-{number}").to_0x_hex()
+
+
+class StandinNode:
+    def __init__(self):
+        self.block_number = 0
+        self.logs = []
+        self.subscriptions = {}  # subscription id -> websocket
+        self.connections = set()
+        self.server = None
+        self.url = None
+
+    # ----- test controls -----
+    async def start(self):
+        self.server = await serve(self._handle, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        self.url = f"ws://127.0.0.1:{port}"
+        return self.url
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def mine(self, fulfilled_condition_ids=(), verifier=None, notify=True):
+        """Add a block, optionally with ConditionFulfilled logs, and push its header"""
+        self.block_number += 1
+        for log_index, condition_id in enumerate(fulfilled_condition_ids):
+            self.logs.append({
+                "address": verifier,
+                "topics": [FULFILLED_TOPIC],
+                "data": "0x" + encode(["uint256", "uint256", "uint256"], [condition_id, 1, self.block_number]).hex(),
+                "blockNumber": hex(self.block_number),
+                "blockHash": _block_hash(self.block_number),
+                "transactionHash": Web3.keccak(text=f"standin-tx-{self.block_number}-{log_index}").to_0x_hex(),
+                "transactionIndex": hex(log_index),
+                "logIndex": hex(log_index),
+                "removed": False,
+            })
+        if notify:
+            await self._notify_new_head()
+
+    async def drop_connections(self):
+        """Close every client socket, as a restarting node would"""
+        for websocket in list(self.connections):
+            await websocket.close(code=1012, reason="standin restart")
+        self.subscriptions.clear()
+
+    # ----- JSON-RPC -----
+    def _header(self, number):
+        return {
+            "number": hex(number),
+            "hash": _block_hash(number),
+            "parentHash": _block_hash(number - 1) if number else ZERO_HASH,
+            "timestamp": hex(1700000000 + number),
+            "miner": "0x" + "00" * 20,
+            "gasLimit": hex(30000000),
+            "gasUsed": "0x0",
+            "difficulty": "0x0",
+            "extraData": "0x",
+            "logsBloom": "0x" + "00" * 256,
+            "nonce": "0x" + "00" * 8,
+            "stateRoot": ZERO_HASH,
+            "transactionsRoot": ZERO_HASH,
+            "receiptsRoot": ZERO_HASH,
+            "sha3Uncles": ZERO_HASH,
+            "mixHash": ZERO_HASH,
+            "baseFeePerGas": "0x1",
+        }
+
+    async def _notify_new_head(self):
+        header = self._header(self.block_number)
+        for sub_id, websocket in list(self.subscriptions.items()):
+            try:
+                await websocket.send(json.dumps({
+                    "jsonrpc": "2.0",
+                    "method": "eth_subscription",
+                    "params": {"subscription": sub_id, "result": header},
+                }))
+            except Exception:
+                self.subscriptions.pop(sub_id, None)
+
+    def _get_logs(self, flt):
+        from_block = int(flt.get("fromBlock", "0x0"), 16)
+        to_block = int(flt.get("toBlock", hex(self.block_number)), 16)
+        addresses = flt.get("address")
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        addresses = {a.lower() for a in addresses} if addresses else None
+        return [
+            log for log in self.logs
+            if from_block <= int(log["blockNumber"], 16) <= to_block
+            and (addresses is None or log["address"].lower() in addresses)
+        ]
+
+    def _dispatch(self, method, params, websocket):
+        if method == "eth_chainId":
+            return hex(CHAIN_ID)
+        if method == "net_version":
+            return str(CHAIN_ID)
+        if method == "web3_clientVersion":
+            return "StandinNode/v0"
+        if method == "eth_blockNumber":
+            return hex(self.block_number)
+        if method == "eth_getLogs":
+            return self._get_logs(params[0])
+        if method == "eth_subscribe" and params[0] == "newHeads":
+            sub_id = "0x" + f"{len(self.subscriptions) + 1:032x}"
+            self.subscriptions[sub_id] = websocket
+            return sub_id
+        if method == "eth_unsubscribe":
+            return self.subscriptions.pop(params[0], None) is not None
+        raise NotImplementedError(method)
+
+    async def _handle(self, websocket):
+        self.connections.add(websocket)
+        try:
+            async for raw in websocket:
+                request = json.loads(raw)
+                response = {"jsonrpc": "2.0", "id": request["id"]}
+                try:
+                    response["result"] = self._dispatch(request["method"], request.get("params", []), websocket)
+                except NotImplementedError as e:
+                    response["error"] = {"code": -32601, "message": f"method not supported by stand-in: {e}"}
+                await websocket.send(json.dumps(response))
+        except Exception:
+            pass
+        finally:
+            self.connections.discard(websocket)
+            for sub_id in [s for s, ws in self.subscriptions.items() if ws is websocket]:
+                del self.subscriptions[sub_id]